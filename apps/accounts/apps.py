@@ -5,3 +5,8 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.accounts'
     verbose_name = 'Accounts'
+
+    def ready(self):
+        from apps.common.images import register_image_field
+        from .models import User
+        register_image_field(User, 'profile_photo')
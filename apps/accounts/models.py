@@ -51,6 +51,7 @@ class User(AbstractUser):
         validators=[RegexValidator(regex=r'^\+\d{1,15}$', message='Phone number must be in format: +999999999')]
     )
     profile_photo = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    profile_photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='customer')
     is_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
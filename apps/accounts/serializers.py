@@ -1,15 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.common.serializers import ImageVariantsField
 from .models import User, Address, SellerRegistration
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
     address = serializers.SerializerMethodField()
+    profile_photo_variants = ImageVariantsField(source='profile_photo')
 
     class Meta:
         model = User
-        fields = ['id', 'full_name', 'phone_number', 'profile_photo', 'role', 'address', 'created_at']
+        fields = ['id', 'full_name', 'phone_number', 'profile_photo', 'profile_photo_variants', 'role', 'address',
+                  'created_at']
         read_only_fields = ['id', 'role', 'created_at']
 
     def get_address(self, obj):
@@ -56,6 +60,8 @@ class UserProfileEditSerializer(serializers.ModelSerializer):
 class UserLoginSerializer(serializers.Serializer):
     phone_number = serializers.CharField()
     password = serializers.CharField()
+    device_id = serializers.CharField(max_length=255, required=False, allow_blank=True,
+                                      help_text="Mehmon sifatidagi like lar shu foydalanuvchiga o'tkaziladi")
 
     def validate(self, attrs):
         phone_number = attrs.get('phone_number')
@@ -76,10 +82,12 @@ class UserLoginSerializer(serializers.Serializer):
 
 class UserRegisterSerializer(serializers.ModelSerializer):
     password_confirm = serializers.CharField(write_only=True)
+    device_id = serializers.CharField(max_length=255, write_only=True, required=False, allow_blank=True,
+                                      help_text="Mehmon sifatidagi like lar shu foydalanuvchiga o'tkaziladi")
 
     class Meta:
         model = User
-        fields = ['full_name', 'phone_number', 'password', 'password_confirm']
+        fields = ['full_name', 'phone_number', 'password', 'password_confirm', 'device_id']
         extra_kwargs = {
             'password': {'write_only': True, 'min_length': 8}
         }
@@ -91,6 +99,7 @@ class UserRegisterSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password_confirm')
+        validated_data.pop('device_id', None)
         validated_data['role'] = 'customer'
         user = User.objects.create_user(**validated_data)
         return user
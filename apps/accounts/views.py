@@ -6,6 +6,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
 from django.contrib.auth import authenticate
+from django.contrib.auth.signals import user_logged_in
 
 from .models import User, SellerRegistration
 from .permissions import IsSuperAdmin, IsAdmin, CanManageSellers, CanApplyForSeller
@@ -170,6 +171,7 @@ def login_view(request):
     if serializer.is_valid():
         user = serializer.validated_data['user']
         refresh = RefreshToken.for_user(user)
+        user_logged_in.send(sender=user.__class__, request=request, user=user)
 
         return Response({
             'access_token': str(refresh.access_token),
@@ -194,6 +196,7 @@ def register_view(request):
     if serializer.is_valid():
         user = serializer.save()
         refresh = RefreshToken.for_user(user)
+        user_logged_in.send(sender=user.__class__, request=request, user=user)
 
         return Response({
             'access_token': str(refresh.access_token),
@@ -5,3 +5,15 @@ class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.common'
     verbose_name = 'Common'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .models import District, Region, Setting
+        from .regions import invalidate_regions
+        from .stamps import REGIONS_STAMP, SETTINGS_STAMP, track_changes
+        track_changes(REGIONS_STAMP, Region, District)
+        track_changes(SETTINGS_STAMP, Setting)
+        for model in (Region, District):
+            uid = f'region_cache_{model._meta.label}'
+            post_save.connect(invalidate_regions, sender=model, dispatch_uid=f'{uid}_save')
+            post_delete.connect(invalidate_regions, sender=model, dispatch_uid=f'{uid}_delete')
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .stamps import bump_stamp, get_stamps
+
+logger = logging.getLogger(__name__)
+
+
+def run_in_background(func):
+    """func ni daemon thread da ishga tushirish (thread o'z DB ulanishini yopadi)"""
+    def target():
+        try:
+            func()
+        except Exception:
+            logger.exception('Background cache refresh failed')
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=target, daemon=True).start()
+
+
+class StaleWhileRevalidateCache:
+    """Versiyali cache: eskirgan qiymat darhol qaytariladi, yangisi fon thread da quriladi.
+
+    stamp berilsa versiya bazadagi ChangeStamp dan o'qiladi - cache worker ga xos (LocMem) bo'lsa ham
+    boshqa worker lardagi va queryset.update() bilan qilingan (stamp ni oshiradigan) o'zgarishlar ko'rinadi.
+    """
+
+    def __init__(self, key, builder, stamp=None, fresh_timeout=60, stale_timeout=60 * 60 * 24, lock_timeout=30):
+        self.key = key
+        self.builder = builder
+        self.stamp = stamp
+        self.fresh_timeout = fresh_timeout
+        self.stale_timeout = stale_timeout
+        self.lock_timeout = lock_timeout
+
+    @property
+    def version_key(self):
+        return f'{self.key}:version'
+
+    @property
+    def lock_key(self):
+        return f'{self.key}:lock'
+
+    def get_version(self):
+        if self.stamp:
+            return get_stamps([self.stamp])[self.stamp][0]
+        return cache.get_or_set(self.version_key, uuid.uuid4().hex, timeout=None)
+
+    def get(self):
+        entry = cache.get(self.key)
+        if entry is None:
+            return self.refresh()
+
+        if entry['version'] != self.get_version() or entry['expires_at'] <= time.time():
+            if cache.add(self.lock_key, True, timeout=self.lock_timeout):
+                run_in_background(self._refresh_and_unlock)
+        return entry['data']
+
+    def refresh(self):
+        version = self.get_version()
+        data = self.builder()
+        cache.set(self.key, {
+            'data': data,
+            'version': version,
+            'expires_at': time.time() + self.fresh_timeout,
+        }, timeout=self.stale_timeout)
+        return data
+
+    def _refresh_and_unlock(self):
+        try:
+            self.refresh()
+        finally:
+            cache.delete(self.lock_key)
+
+    def invalidate(self):
+        """Versiyani almashtirish - mavjud qiymat keyingi so'rovda stale sifatida qaytadi va yangilanadi"""
+        if self.stamp:
+            bump_stamp(self.stamp)
+        else:
+            cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+
+
+# Javobga ta'sir qilmaydigan parametrlar (cache buster, tracking) va default qiymatlar
+IGNORED_QUERY_PARAMS = {'_', 'fbclid', 'gclid'}
+IGNORED_QUERY_PREFIXES = ('utm_',)
+DEFAULT_QUERY_VALUES = {'page': '1'}
+
+
+def normalize_query_string(query_params):
+    """Saralangan, bo'sh va no-op parametrlarsiz query string - bir xil so'rovlar bitta cache kalitiga tushadi"""
+    items = []
+    for key in sorted(query_params):
+        if key in IGNORED_QUERY_PARAMS or key.startswith(IGNORED_QUERY_PREFIXES):
+            continue
+        values = sorted(value for value in query_params.getlist(key) if value != '')
+        if not values or values == [DEFAULT_QUERY_VALUES.get(key)]:
+            continue
+        items.extend((key, value) for value in values)
+    return urlencode(items)
+
+
+def response_cache_key(prefix, *parts):
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'{prefix}:{digest}'
@@ -0,0 +1,163 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# variant nomi -> (maksimal eni, maksimal bo'yi); proporsiya saqlanadi, kichik rasm kattalashtirilmaydi
+IMAGE_VARIANTS = {
+    'thumb': (200, 200),
+    'card': (600, 600),
+    'full': (1600, 1600),
+}
+
+# Ro'yxatdan o'tgan (model, image field) juftlari; variantlar '<field>_variants' JSONField da saqlanadi
+_registry = []
+_executor = None
+
+# Variantlar queryset.update() bilan yoziladi (post_save yo'q) - cache/ETag lar shu signal bilan yangilanadi
+variants_generated = Signal()
+
+
+def get_variant_format():
+    """WebP (Pillow libwebp bilan yig'ilgan bo'lsa), aks holda JPEG"""
+    image_format = settings.IMAGE_VARIANT_FORMAT.upper()
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def variants_field_name(field_name):
+    return f'{field_name}_variants'
+
+
+def is_local_file(name):
+    """AdPhoto.image ga URL ham yoziladi - bunday tashqi rasmlar qayta ishlanmaydi"""
+    return bool(name) and '://' not in name
+
+
+def is_variant_name(name):
+    return posixpath.basename(posixpath.dirname(name)) == 'variants'
+
+
+def variant_name(name, variant, image_format):
+    directory, filename = posixpath.split(name)
+    root = posixpath.splitext(filename)[0]
+    extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+    return posixpath.join(directory, 'variants', f'{root}_{variant}.{extension}')
+
+
+def get_field_storage(model, field_name):
+    return model._meta.get_field(field_name).storage
+
+
+def process_image(name, image_format=None, storage=None):
+    """Storage dagi rasmdan barcha variantlarni yaratish; {'source': name, variant: variant_name} qaytaradi"""
+    image_format = image_format or get_variant_format()
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as source:
+        with Image.open(source) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+            if image_format == 'JPEG' and original.mode == 'RGBA':
+                original = original.convert('RGB')
+
+            variants = {'source': name}
+            for variant, size in IMAGE_VARIANTS.items():
+                image = original.copy()
+                image.thumbnail(size, Image.LANCZOS)
+                buffer = BytesIO()
+                image.save(buffer, format=image_format, quality=settings.IMAGE_VARIANT_QUALITY, optimize=True)
+                target = variant_name(name, variant, image_format)
+                if storage.exists(target):
+                    storage.delete(target)
+                variants[variant] = storage.save(target, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def generate_variants(model, pk, field_name):
+    """Bitta obyekt uchun variantlar; rasm shu orada almashtirilgan bo'lsa natija yozilmaydi"""
+    from .models import StoredFile
+
+    name = model.objects.filter(pk=pk).values_list(field_name, flat=True).first()
+    if not is_local_file(name):
+        return None
+    # Content-addressed fayl boshqa yozuvlarda ham bo'lishi mumkin - variantlari StoredFile da (unique name
+    # index i bo'yicha) saqlanadi va qayta ishlatiladi; StoredFile siz fayllar har doim qayta ishlanadi
+    stored = StoredFile.objects.filter(name=name).values_list('variants', flat=True).first()
+    if stored and stored.get('source') == name:
+        variants = stored
+    else:
+        variants = process_image(name, storage=get_field_storage(model, field_name))
+        if stored is not None:
+            StoredFile.objects.filter(name=name).update(variants=variants)
+    if model.objects.filter(pk=pk, **{field_name: name}).update(**{variants_field_name(field_name): variants}):
+        variants_generated.send(sender=model, pks=[pk])
+    return variants
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image-variants')
+    return _executor
+
+
+def _run_job(model, pk, field_name):
+    try:
+        generate_variants(model, pk, field_name)
+    except Exception:
+        logger.exception('Image variant generation failed for %s %s', model._meta.label, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(model, pk, field_name):
+    """Commit dan keyin worker pool ga topshirish (Pillow resize paytida GIL ni qo'yib yuboradi)"""
+    transaction.on_commit(lambda: get_executor().submit(_run_job, model, pk, field_name))
+
+
+def image_changed(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    for model, field_name in _registry:
+        if not isinstance(instance, model):
+            continue
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        name = getattr(instance, field_name).name
+        variants = getattr(instance, variants_field_name(field_name)) or {}
+        if is_local_file(name) and variants.get('source') != name:
+            schedule_variants(model, instance.pk, field_name)
+
+
+def register_image_field(model, field_name):
+    """Model rasm maydonini variantlar pipeline iga qo'shish (AppConfig.ready da chaqiriladi)"""
+    if (model, field_name) not in _registry:
+        _registry.append((model, field_name))
+    post_save.connect(image_changed, sender=model, dispatch_uid=f'image_variants_{model._meta.label}')
+
+
+def get_registered_fields():
+    return list(_registry)
+
+
+def get_variant_urls(name, variants, storage=None):
+    """Serializer lar uchun {variant: url} (maydon storage i orqali); variant hali tayyor bo'lmasa original rasm URL i"""
+    if not name:
+        return None
+    storage = storage or default_storage
+    if not variants or variants.get('source') != name:
+        original = storage.url(name)
+        return {variant: original for variant in IMAGE_VARIANTS}
+    return {variant: storage.url(variants[variant]) for variant in IMAGE_VARIANTS}
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.common.images import (
+    get_field_storage, get_registered_fields, is_local_file, process_image, variants_field_name, variants_generated,
+)
+from apps.common.models import StoredFile
+
+
+def _process(model_label, field_name, name):
+    try:
+        storage = get_field_storage(apps.get_model(model_label), field_name)
+        return name, process_image(name, storage=storage), None
+    except Exception as exc:
+        return name, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Generate thumb/card/full variants for existing uploaded images using all CPU cores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes; 0 or 1 processes images in this process')
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist')
+        parser.add_argument('--chunk-size', type=int, default=16)
+
+    def handle(self, *args, **options):
+        for model, field_name in get_registered_fields():
+            jobs = self.collect_jobs(model, field_name, options['force'])
+            label = f'{model._meta.label}.{field_name}'
+            if not jobs:
+                self.stdout.write(f'{label}: nothing to do')
+                continue
+
+            done = failed = 0
+            process = partial(_process, model._meta.label, field_name)
+            for name, variants, error in self.run_jobs(process, list(jobs), options):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{label} {name}: {error}')
+                    continue
+                model.objects.filter(pk__in=jobs[name], **{field_name: name}).update(
+                    **{variants_field_name(field_name): variants}
+                )
+                StoredFile.objects.filter(name=name).update(variants=variants)
+                done += 1
+            variants_generated.send(sender=model, pks=[pk for pks in jobs.values() for pk in pks])
+            self.stdout.write(self.style.SUCCESS(f'{label}: {done} images processed, {failed} failed'))
+
+    def run_jobs(self, process, names, options):
+        """(name, variants, error) lar; --workers 0/1 da shu jarayonning o'zida (pool siz)"""
+        if options['workers'] <= 1:
+            yield from map(process, names)
+            return
+        # Worker jarayonlar faqat fayl bilan ishlaydi, bazaga natijani asosiy jarayon yozadi
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+            yield from executor.map(process, names, chunksize=options['chunk_size'])
+
+    def collect_jobs(self, model, field_name, force):
+        """{fayl nomi: [pk, ...]} - bir xil fayl bir marta qayta ishlanadi"""
+        jobs = {}
+        rows = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''}).values_list(
+            'pk', field_name, variants_field_name(field_name)
+        )
+        for pk, name, variants in rows.iterator():
+            if not is_local_file(name) or (not force and (variants or {}).get('source') == name):
+                continue
+            jobs.setdefault(name, []).append(pk)
+        return jobs
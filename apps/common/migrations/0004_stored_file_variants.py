@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0003_change_stamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
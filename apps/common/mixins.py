@@ -77,3 +77,77 @@ class BulkActionMixin:
         return Response({
             'message': f'{count} items updated successfully'
         }, status=status.HTTP_200_OK)
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified bo'yicha 304 Not Modified uchun mixin (query va serialization o'tkazib yuboriladi)"""
+    validators_private = False
+
+    def get_validators(self, request, *args, **kwargs):
+        """(etag, last_modified) - arzon hisoblanishi kerak"""
+        return None, None
+
+    def get(self, request, *args, **kwargs):
+        from .utils import conditional_response, set_validators
+
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        response = conditional_response(request, etag, last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified, private=self.validators_private)
+
+
+class VersionedCacheMixin:
+    """Anonim foydalanuvchilar uchun render qilingan javobni cache lash uchun mixin.
+
+    Kalit: URL, normallashtirilgan query string va cache_stamps (version, updated_at) lari - model
+    saqlanganda/o'chirilganda versiya oshadi va eski javoblar o'z-o'zidan ishlatilmay qoladi.
+    """
+    cache_stamps = []
+    cache_timeout = None
+    cache_bypass_params = []
+
+    def get_cache_stamps(self):
+        """{stamp: (version, updated_at)} - so'rov davomida bir marta o'qiladi (ETag uchun ham)"""
+        from .stamps import get_stamps
+
+        if not hasattr(self, '_cache_stamps'):
+            self._cache_stamps = get_stamps(self.cache_stamps)
+        return self._cache_stamps
+
+    def get(self, request, *args, **kwargs):
+        from django.conf import settings
+        from django.core.cache import cache
+        from django.http import HttpResponse
+        from .cache import normalize_query_string, response_cache_key
+
+        self._response_cache_key = None
+        if request.user.is_authenticated or any(request.query_params.get(p) for p in self.cache_bypass_params):
+            return super().get(request, *args, **kwargs)
+
+        stamps = self.get_cache_stamps()
+        key = response_cache_key(
+            'response', request.build_absolute_uri(request.path), request.accepted_renderer.format,
+            normalize_query_string(request.query_params), *(stamps[stamp] for stamp in self.cache_stamps),
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        self._response_cache_key = key
+        self._response_cache_timeout = self.cache_timeout or settings.RESPONSE_CACHE_TIMEOUT
+        return super().get(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        from django.core.cache import cache
+
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_response_cache_key', None)
+        if key and response.status_code == 200 and hasattr(response, 'render'):
+            response.render()
+            cache.set(key, (response.content, response['Content-Type']), self._response_cache_timeout)
+            response['X-Cache'] = 'MISS'
+        return response
@@ -27,7 +27,10 @@ class District(models.Model):
         ordering = ['name']
 
     def __str__(self):
-        return f"{self.region.name} - {self.name}"
+        from .regions import get_region
+
+        region = get_region(self.region_id)
+        return f"{region['name'] if region else self.region.name} - {self.name}"
 
 
 class StaticPage(models.Model):
@@ -61,3 +64,36 @@ class Setting(models.Model):
 
     def __str__(self):
         return "Application Settings"
+
+
+class StoredFile(models.Model):
+    """Content-addressed storage dagi fayl va unga murojaatlar soni"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    # Shu fayl uchun yaratilgan rasm variantlari - bir xil fayldagi barcha yozuvlar uchun umumiy
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stored_files'
+        verbose_name = 'Stored File'
+        verbose_name_plural = 'Stored Files'
+
+    def __str__(self):
+        return self.name
+
+
+class ChangeStamp(models.Model):
+    """Jadval darajasidagi o'zgarish belgisi - ETag lar uchun arzon validator"""
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'change_stamps'
+        verbose_name = 'Change Stamp'
+        verbose_name_plural = 'Change Stamps'
+
+    def __str__(self):
+        return f'{self.key}:{self.version}'
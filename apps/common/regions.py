@@ -0,0 +1,90 @@
+import threading
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from .stamps import REGIONS_STAMP, get_stamps
+
+
+class RegionSnapshot:
+    """Region va tumanlarning o'zgarmas nusxasi hamda oldindan render qilingan JSON javobi"""
+    __slots__ = ('version', 'updated_at', 'regions', 'districts', 'content')
+
+    def __init__(self, version, updated_at, regions, districts):
+        self.version = version
+        self.updated_at = updated_at
+        self.regions = MappingProxyType({
+            region['id']: MappingProxyType({**region, 'districts': tuple(
+                MappingProxyType(district) for district in region['districts']
+            )})
+            for region in regions
+        })
+        self.districts = MappingProxyType({district['id']: MappingProxyType(district) for district in districts})
+        self.content = JSONRenderer().render([
+            {'id': region['id'], 'name': region['name'], 'districts': [
+                {'id': district['id'], 'name': district['name']} for district in region['districts']
+            ]}
+            for region in regions
+        ])
+
+    @property
+    def etag(self):
+        return f'{REGIONS_STAMP}:{self.version}'
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def load_regions():
+    """Ikki query: regionlar va tumanlar (stamp avval o'qiladi - parallel o'zgarish keyingi tekshiruvda ko'rinadi)"""
+    from .models import District, Region
+
+    version, updated_at = get_stamps([REGIONS_STAMP])[REGIONS_STAMP]
+    regions = [dict(region, districts=[]) for region in Region.objects.values('id', 'name')]
+    by_id = {region['id']: region for region in regions}
+    districts = list(District.objects.values('id', 'name', 'region_id'))
+    for district in districts:
+        if district['region_id'] in by_id:
+            by_id[district['region_id']]['districts'].append(district)
+    return RegionSnapshot(version, updated_at, regions, districts)
+
+
+def get_regions():
+    """Worker dagi snapshot; boshqa worker dagi o'zgarishlar REGION_CACHE_CHECK_INTERVAL da bir stamp tekshiruvi bilan"""
+    global _snapshot, _checked_at
+
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < settings.REGION_CACHE_CHECK_INTERVAL:
+        return snapshot
+    with _lock:
+        if _snapshot is not snapshot and _snapshot is not None:
+            return _snapshot
+        if snapshot is None or get_stamps([REGIONS_STAMP])[REGIONS_STAMP][0] != snapshot.version:
+            snapshot = load_regions()
+        _snapshot, _checked_at = snapshot, time.monotonic()
+    return snapshot
+
+
+def get_region(pk):
+    return get_regions().regions.get(pk)
+
+
+def get_district(pk):
+    return get_regions().districts.get(pk)
+
+
+def invalidate_regions(**kwargs):
+    """Region/District saqlanganda/o'chirilganda - commit (va stamp bump) dan keyingi murojaatda qayta yuklanadi"""
+    transaction.on_commit(_clear_snapshot)
+
+
+def _clear_snapshot():
+    global _snapshot
+
+    with _lock:
+        _snapshot = None
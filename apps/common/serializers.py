@@ -1,7 +1,31 @@
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+
+from .images import IMAGE_VARIANTS, get_variant_urls, variants_field_name
 from .models import Region, District, StaticPage, Setting
 
 
+@extend_schema_field({
+    'type': 'object', 'nullable': True,
+    'properties': {variant: {'type': 'string', 'format': 'uri'} for variant in IMAGE_VARIANTS},
+})
+class ImageVariantsField(serializers.Field):
+    """Rasm maydoni variantlari (thumb/card/full) URL lari: ImageVariantsField(source='icon')"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        field_file = super().get_attribute(instance)
+        if not field_file:
+            return None, None, None
+        return field_file.name, getattr(instance, variants_field_name(self.source_attrs[-1]), None), field_file.storage
+
+    def to_representation(self, value):
+        return get_variant_urls(*value)
+
+
 class DistrictSerializer(serializers.ModelSerializer):
     class Meta:
         model = District
@@ -0,0 +1,67 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Subquery
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .images import variants_generated
+from .models import ChangeStamp
+
+REGIONS_STAMP = 'common:regions'
+SETTINGS_STAMP = 'common:settings'
+
+
+def get_stamps(keys):
+    """{key: (version, updated_at)} bitta query bilan; hali yo'q stamp lar yaratiladi"""
+    stamps = {
+        key: (version, updated_at)
+        for key, version, updated_at in ChangeStamp.objects.filter(key__in=keys).values_list(
+            'key', 'version', 'updated_at'
+        )
+    }
+    for key in keys:
+        if key not in stamps:
+            stamps[key] = _create_stamp(key)
+    return stamps
+
+
+def _create_stamp(key):
+    try:
+        with transaction.atomic():
+            stamp = ChangeStamp.objects.create(key=key)
+        return stamp.version, stamp.updated_at
+    except IntegrityError:
+        return ChangeStamp.objects.filter(key=key).values_list('version', 'updated_at').get()
+
+
+def stamp_validators(key, stamps=None):
+    """ConditionalGetMixin uchun (etag, last_modified)"""
+    version, updated_at = (stamps or get_stamps([key]))[key]
+    return f'{key}:{version}', updated_at
+
+
+def stamp_version(key):
+    """Boshqa query ichida ishlatish uchun version subquery si"""
+    return Subquery(ChangeStamp.objects.filter(key=key).values('version')[:1])
+
+
+def bump_stamp(key):
+    """Stamp commit dan keyin oshiriladi (autocommit da darhol) - bitta ChangeStamp qatori yozuvchi
+    tranzaksiyalar davomida lock lanib qolmasligi uchun; rollback bo'lsa bump ham bo'lmaydi"""
+    transaction.on_commit(lambda: _bump_stamp(key))
+
+
+def _bump_stamp(key):
+    if not ChangeStamp.objects.filter(key=key).update(version=F('version') + 1, updated_at=timezone.now()):
+        _create_stamp(key)
+
+
+def track_changes(key, *models):
+    """Model lar saqlanganda/o'chirilganda (va rasm variantlari tayyor bo'lganda) stamp ni yangilash"""
+    def receiver(sender, **kwargs):
+        bump_stamp(key)
+
+    for model in models:
+        uid = f'change_stamp_{key}_{model._meta.label}'
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f'{uid}_save')
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f'{uid}_delete')
+        variants_generated.connect(receiver, sender=model, weak=False, dispatch_uid=f'{uid}_variants')
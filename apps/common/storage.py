@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .images import IMAGE_VARIANTS, is_local_file, is_variant_name, variant_name
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Fayl nomi = sha256(content), 'ads/ab/cd/abcd...jpg' kabi shard lanadi.
+
+    Bir xil baytlar bir marta yoziladi, StoredFile.ref_count orqali hisoblanadi. Murojaatlarni
+    model yozuvlari oladi/bo'shatadi (track_references) - hisoblagich yozuv bilan bir tranzaksiyada
+    o'zgaradi; fayl (va variantlari) oxirgi murojaat commit bo'lgandan keyin, StoredFile qatori lock
+    ostida qayta tekshirilib o'chiriladi.
+    """
+
+    def get_content_name(self, name, content):
+        directory, filename = posixpath.split(name)
+        digest = content_hash(content)
+        shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, *shards, f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if is_variant_name(name):
+            # Variant nomi asl fayl nomidan hosil qilinadi (images.variant_name) - hash lanmaydi va sanalmaydi
+            return super().save(name, content, max_length)
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if not self.exists(name):
+            self._save(name, content)
+        return name
+
+    def _save(self, name, content):
+        """Vaqtinchalik faylga yozib os.replace - parallel yuklashda ham yarim yozilgan fayl ko'rinmaydi"""
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as destination:
+                for chunk in content.chunks():
+                    destination.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def _lock(self, name):
+        """StoredFile qatorini lock qilib olish (yo'q bo'lsa ref_count=0 bilan yaratiladi)"""
+        from .models import StoredFile
+
+        stored = StoredFile.objects.select_for_update().filter(name=name).first()
+        if stored is not None:
+            return stored
+        try:
+            with transaction.atomic():
+                return StoredFile.objects.create(name=name)
+        except IntegrityError:
+            return StoredFile.objects.select_for_update().get(name=name)
+
+    def retain(self, name, content=None, count=1):
+        """count ta murojaat qo'shish; fayl oxirgi murojaat bilan birga o'chirilgan bo'lsa content dan qayta yoziladi"""
+        from .models import StoredFile
+
+        if count < 1:
+            return
+        with transaction.atomic():
+            stored = self._lock(name)
+            if not self.exists(name):
+                if content is None:
+                    logger.warning('Stored file %s is missing and cannot be rewritten', name)
+                else:
+                    self._save(name, content)
+            size = self.size(name) if self.exists(name) else stored.size
+            StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') + count, size=size)
+
+    def delete(self, name):
+        from .models import StoredFile
+
+        if is_variant_name(name):
+            return super().delete(name)
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is not None and stored.ref_count > 0:
+                StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') - 1)
+            if stored is None or stored.ref_count <= 1:
+                transaction.on_commit(lambda: self._remove_unreferenced(name))
+
+    def _remove_unreferenced(self, name):
+        # Commit va o'chirish orasida yangi yuklash murojaat olgan bo'lishi mumkin - lock ostida qayta tekshiriladi
+        from .models import StoredFile
+
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is not None and stored.ref_count > 0:
+                return
+            if stored is not None:
+                stored.delete()
+            self._remove(name)
+
+    def _remove(self, name):
+        super().delete(name)
+        for variant in IMAGE_VARIANTS:
+            for image_format in ('WEBP', 'JPEG'):
+                super().delete(variant_name(name, variant, image_format))
+
+
+def track_references(model, field_name):
+    """Model yozuvi saqlanganda fayl murojaatini oladi, fayl almashganda/yozuv o'chirilganda bo'shatadi
+    (AppConfig.ready da chaqiriladi). Murojaat yozuv bilan bir tranzaksiyada olinadi - rollback bo'lsa sanalmaydi."""
+    previous_attr = f'_stored_{field_name}'
+
+    def remember_name(sender, instance, raw=False, **kwargs):
+        setattr(instance, previous_attr, None)
+        if instance.pk and not raw:
+            setattr(instance, previous_attr, model.objects.filter(pk=instance.pk).values_list(
+                field_name, flat=True
+            ).first())
+
+    def retain_saved(sender, instance, raw=False, **kwargs):
+        field_file = getattr(instance, field_name)
+        previous = getattr(instance, previous_attr, None)
+        if raw or field_file.name == previous:
+            return
+        if is_local_file(field_file.name):
+            # Yangi yuklangan content - parallel o'chirilgan faylni qayta yozish uchun
+            field_file.storage.retain(field_file.name, getattr(field_file, '_file', None))
+        if is_local_file(previous):
+            field_file.storage.delete(previous)
+
+    def release_deleted(sender, instance, **kwargs):
+        field_file = getattr(instance, field_name)
+        if is_local_file(field_file.name):
+            field_file.storage.delete(field_file.name)
+
+    uid = f'stored_file_{model._meta.label}_{field_name}'
+    pre_save.connect(remember_name, sender=model, weak=False, dispatch_uid=f'{uid}_pre_save')
+    post_save.connect(retain_saved, sender=model, weak=False, dispatch_uid=f'{uid}_save')
+    post_delete.connect(release_deleted, sender=model, weak=False, dispatch_uid=f'{uid}_delete')
+
+
+def ad_photo_storage():
+    return storages['media']
@@ -52,10 +52,10 @@ class CommonAPITest(APITestCase):
         url = reverse('common:regions-with-districts')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data['results']), 1)
+        self.assertGreaterEqual(len(response.json()), 1)
 
         # District mavjudligini tekshirish
-        region_data = response.data['results'][0]
+        region_data = response.json()[0]
         self.assertIn('districts', region_data)
         self.assertGreaterEqual(len(region_data['districts']), 1)
 
@@ -81,3 +81,47 @@ class CommonAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['phone'], '+998712345678')
         self.assertEqual(response.data['app_version'], '1.0.0')
+
+
+class RegionCacheTest(APITestCase):
+    """Region/district larning worker xotirasidagi nusxasi testlari"""
+
+    def setUp(self):
+        self.url = reverse('common:regions-with-districts')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.regions = [Region.objects.create(name=f'Region {i:02d}') for i in range(25)]
+            self.district = District.objects.create(region=self.regions[0], name='Chilonzor tumani')
+
+    def test_all_regions_without_pagination(self):
+        """Barcha regionlar bitta ro'yxatda (20 tadan sahifalanmaydi) testi"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([region['name'] for region in data], [region.name for region in self.regions])
+        self.assertEqual(data[0]['districts'], [{'id': self.district.id, 'name': 'Chilonzor tumani'}])
+
+    def test_cached_requests_skip_database(self):
+        """Yuklangandan keyin endpoint va District.__str__ bazaga murojaat qilmasligi testi"""
+        first = self.client.get(self.url)
+        district = District.objects.get(pk=self.district.pk)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+            self.assertEqual(str(district), 'Region 00 - Chilonzor tumani')
+        self.assertEqual(response.content, first.content)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+    def test_reloaded_on_change(self):
+        """Region/District saqlanganda/o'chirilganda nusxa va ETag yangilanishi testi"""
+        first = self.client.get(self.url)
+        self.district.name = 'Yunusobod tumani'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.district.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['districts'][0]['name'], 'Yunusobod tumani')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.regions[-1].delete()
+        self.assertEqual(len(self.client.get(self.url).json()), 24)
@@ -1,4 +1,7 @@
+import re
+
 from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from rest_framework.response import Response
 from rest_framework import status
@@ -49,20 +52,107 @@ def format_phone_number(phone):
     return phone
 
 
-def generate_slug(text, model_class, field_name='slug'):
-    """Unique slug yaratish"""
+SLUG_SUFFIX_MAX_LENGTH = 11  # '-' + suffix raqami uchun joy
+
+
+def make_base_slug(text, model_class, field_name='slug', fallback='item'):
     from django.utils.text import slugify
     import uuid
 
-    base_slug = slugify(text)
-    if not base_slug:
-        base_slug = f'item-{uuid.uuid4().hex[:8]}'
-
-    slug = base_slug
-    counter = 1
+    max_length = model_class._meta.get_field(field_name).max_length - SLUG_SUFFIX_MAX_LENGTH
+    return slugify(text or '')[:max_length].strip('-') or f'{fallback}-{uuid.uuid4().hex[:8]}'
+
+
+def _suffix_query(base_slug, field_name):
+    return Q(**{field_name: base_slug}) | Q(**{
+        f'{field_name}__startswith': f'{base_slug}-',
+        f'{field_name}__regex': rf'^{re.escape(base_slug)}-[0-9]+$',
+    })
+
+
+def _suffix_of(slug, base_slug):
+    return 0 if slug == base_slug else int(slug[len(base_slug) + 1:])
+
+
+def next_free_slug(model_class, base_slug, field_name='slug'):
+    """base_slug yoki base_slug-N dan keyingi bo'sh qiymat - bitta indexli prefix query bilan"""
+    from django.db.models.functions import Length
+
+    last = model_class.objects.filter(_suffix_query(base_slug, field_name)).order_by(
+        Length(field_name).desc(), f'-{field_name}'
+    ).values_list(field_name, flat=True).first()
+    if last is None:
+        return base_slug
+    return f'{base_slug}-{_suffix_of(last, base_slug) + 1}'
+
+
+def allocate_slugs(model_class, texts, field_name='slug', fallback='item', chunk_size=100):
+    """Ko'p obyekt uchun bir vaqtda unique slug lar (har chunk uchun bitta query)"""
+    bases = [make_base_slug(text, model_class, field_name, fallback) for text in texts]
+    distinct = list(dict.fromkeys(bases))
+    next_suffix = {}
+    for start in range(0, len(distinct), chunk_size):
+        chunk = distinct[start:start + chunk_size]
+        condition = Q()
+        for base_slug in chunk:
+            condition |= _suffix_query(base_slug, field_name)
+        for slug in model_class.objects.filter(condition).values_list(field_name, flat=True).iterator():
+            for base_slug in chunk:
+                if slug == base_slug or (slug.startswith(f'{base_slug}-') and slug[len(base_slug) + 1:].isdigit()):
+                    next_suffix[base_slug] = max(next_suffix.get(base_slug, 0), _suffix_of(slug, base_slug) + 1)
+
+    slugs = []
+    for base_slug in bases:
+        suffix = next_suffix.get(base_slug, 0)
+        slugs.append(f'{base_slug}-{suffix}' if suffix else base_slug)
+        next_suffix[base_slug] = suffix + 1
+    return slugs
+
+
+def save_with_unique_slug(instance, save, text, field_name='slug', fallback='item', max_attempts=5):
+    """Slug ni ajratib saqlash; parallel insert da IntegrityError bo'lsa keyingi suffix bilan qayta urinish"""
+    model_class = type(instance)
+    base_slug = make_base_slug(text, model_class, field_name, fallback)
+    for attempt in range(max_attempts):
+        setattr(instance, field_name, next_free_slug(model_class, base_slug, field_name))
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            taken = model_class.objects.filter(**{field_name: getattr(instance, field_name)}).exists()
+            if not taken or attempt == max_attempts - 1:
+                raise
 
-    while model_class.objects.filter(**{field_name: slug}).exists():
-        slug = f'{base_slug}-{counter}'
-        counter += 1
 
-    return slug
+def generate_slug(text, model_class, field_name='slug'):
+    """Unique slug yaratish"""
+    return next_free_slug(model_class, make_base_slug(text, model_class, field_name), field_name)
+
+
+def conditional_response(request, etag=None, last_modified=None):
+    """Client dagi nusxa hali yangi bo'lsa 304 javob, aks holda None (etag - qo'shtirnoqsiz qiymat)"""
+    from calendar import timegm
+    from django.utils.cache import get_conditional_response, quote_etag
+
+    return get_conditional_response(
+        request,
+        etag=quote_etag(etag) if etag else None,
+        last_modified=timegm(last_modified.utctimetuple()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag=None, last_modified=None, private=False):
+    """ETag/Last-Modified headerlari; no-cache - client har safar validator bilan qayta so'raydi"""
+    from django.utils.cache import patch_cache_control, patch_vary_headers, quote_etag
+    from django.utils.http import http_date
+
+    if etag:
+        response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+        patch_vary_headers(response, ['Authorization'])
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
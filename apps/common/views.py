@@ -1,18 +1,32 @@
+from drf_spectacular.utils import extend_schema
 from rest_framework import generics
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 
-from .models import Region, StaticPage, Setting
+from .mixins import ConditionalGetMixin
+from .models import StaticPage, Setting
+from .regions import get_regions
 from .serializers import RegionWithDistrictsSerializer, StaticPageListSerializer, StaticPageDetailSerializer, \
     SettingSerializer
+from .stamps import SETTINGS_STAMP, stamp_validators
+from .utils import conditional_response, set_validators
 
 
-class RegionWithDistrictsView(generics.ListAPIView):
-    queryset = Region.objects.all().prefetch_related('districts')
-    serializer_class = RegionWithDistrictsSerializer
+class RegionWithDistrictsView(APIView):
+    """Barcha regionlar tumanlari bilan (pagination siz) - worker xotirasidagi oldindan render qilingan JSON"""
     permission_classes = [AllowAny]
 
+    @extend_schema(responses=RegionWithDistrictsSerializer(many=True))
+    def get(self, request, *args, **kwargs):
+        snapshot = get_regions()
+        response = conditional_response(request, snapshot.etag, snapshot.updated_at)
+        if response is None:
+            response = HttpResponse(snapshot.content, content_type='application/json')
+        return set_validators(response, snapshot.etag, snapshot.updated_at)
+
 
 class StaticPageListView(generics.ListAPIView):
     queryset = StaticPage.objects.all()
@@ -20,17 +34,26 @@ class StaticPageListView(generics.ListAPIView):
     permission_classes = [AllowAny]
 
 
-class StaticPageDetailView(generics.RetrieveAPIView):
+class StaticPageDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = StaticPage.objects.all()
     serializer_class = StaticPageDetailSerializer
     lookup_field = 'slug'
     permission_classes = [AllowAny]
 
+    def get_validators(self, request, *args, **kwargs):
+        page = StaticPage.objects.filter(slug=kwargs['slug']).values('id', 'updated_at').first()
+        if page is None:
+            return None, None
+        return f"page:{page['id']}:{page['updated_at'].timestamp()}", page['updated_at']
+
 
-class SettingView(generics.RetrieveAPIView):
+class SettingView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = SettingSerializer
     permission_classes = [AllowAny]
 
+    def get_validators(self, request, *args, **kwargs):
+        return stamp_validators(SETTINGS_STAMP)
+
     def get_object(self):
         setting, created = Setting.objects.get_or_create(id=1)
         return setting
@@ -26,13 +26,21 @@ class AdAdmin(admin.ModelAdmin):
 
     actions = ['approve_ads', 'reject_ads', 'make_top']
 
+    def _set_status(self, queryset, status):
+        # save() orqali - signal lar (search index va h.k.) yangilanishi uchun
+        ads = list(queryset)
+        for ad in ads:
+            ad.status = status
+            ad.save(update_fields=['status', 'updated_at'])
+        return len(ads)
+
     def approve_ads(self, request, queryset):
-        queryset.update(status='active')
-        self.message_user(request, f'{queryset.count()} ads approved.')
+        count = self._set_status(queryset, 'active')
+        self.message_user(request, f'{count} ads approved.')
 
     def reject_ads(self, request, queryset):
-        queryset.update(status='rejected')
-        self.message_user(request, f'{queryset.count()} ads rejected.')
+        count = self._set_status(queryset, 'rejected')
+        self.message_user(request, f'{count} ads rejected.')
 
     def make_top(self, request, queryset):
         queryset.update(is_top=True)
@@ -1,7 +1,33 @@
+import atexit
+
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.store'
     verbose_name = 'Store'
+
+    def ready(self):
+        from apps.common.images import register_image_field
+        from apps.common.stamps import track_changes
+        from apps.common.storage import track_references
+        from .caches import ADS_STAMP, CATEGORIES_STAMP, POPULAR_SEARCH_STAMP
+        from .counters import search_counter, view_counter
+        from .models import Ad, AdPhoto, Category, PopularSearchTerm
+        from .search import ensure_search_triggers
+        from .search_log import search_log
+        from .signals import connect_signals
+        atexit.register(view_counter.flush_on_exit)
+        atexit.register(search_counter.flush_on_exit)
+        atexit.register(search_log.flush_on_exit)
+        connect_signals()
+        post_migrate.connect(ensure_search_triggers, sender=self)
+        register_image_field(AdPhoto, 'image')
+        track_references(AdPhoto, 'image')
+        register_image_field(Category, 'icon')
+        register_image_field(PopularSearchTerm, 'icon')
+        track_changes(CATEGORIES_STAMP, Category)
+        track_changes(ADS_STAMP, Ad, AdPhoto)
+        track_changes(POPULAR_SEARCH_STAMP, PopularSearchTerm)
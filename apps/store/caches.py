@@ -0,0 +1,49 @@
+from apps.common.cache import StaleWhileRevalidateCache
+from apps.common.images import get_field_storage, get_variant_urls
+from .models import Category
+from .serializers import format_product_count
+
+# Model o'zgarganda yangilanadigan change stamp lar (ETag va response cache kalitlari uchun)
+CATEGORIES_STAMP = 'store:categories'
+ADS_STAMP = 'store:ads'
+POPULAR_SEARCH_STAMP = 'store:popular-search-terms'
+
+
+def _icon_url(name, storage):
+    return storage.url(name) if name else None
+
+
+def build_category_tree():
+    """Butun faol kategoriya daraxtini bitta query bilan olib, xotirada yig'ish"""
+    icon_storage = get_field_storage(Category, 'icon')
+    categories = Category.objects.filter(is_active=True).order_by('name').values(
+        'id', 'name', 'icon', 'icon_variants', 'parent_id', 'product_count'
+    )
+    roots = []
+    children = {}
+    for category in categories:
+        if category['parent_id'] is None:
+            roots.append(category)
+        else:
+            children.setdefault(category['parent_id'], []).append({
+                'id': category['id'],
+                'name': category['name'],
+                'icon': _icon_url(category['icon'], icon_storage),
+                'icon_variants': get_variant_urls(category['icon'], category['icon_variants'], icon_storage),
+                'product_count': format_product_count(category['product_count']),
+            })
+
+    return [
+        {
+            'id': root['id'],
+            'name': root['name'],
+            'icon': _icon_url(root['icon'], icon_storage),
+            'icon_variants': get_variant_urls(root['icon'], root['icon_variants'], icon_storage),
+            'children': children.get(root['id'], []),
+        }
+        for root in roots
+    ]
+
+
+# Versiya CATEGORIES_STAMP dan: kategoriya saqlanishi/o'chirilishi va e'lon sonlari o'zgarishi uni oshiradi
+category_tree_cache = StaleWhileRevalidateCache('store:category-tree', build_category_tree, stamp=CATEGORIES_STAMP)
@@ -0,0 +1,235 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, Count, F, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# trending_hours hisoblanadigan qo'zg'almas nuqta
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class BufferedCounter:
+    """Increment larni worker xotirasida yig'ib, bitta batched UPDATE bilan yozish (write-behind)
+
+    Deltalar keyingi increment da, fon thread ida (COUNTER_FLUSH_THREAD, worker bo'sh turganda ham) va atexit da
+    yoziladi. Worker SIGKILL/OOM bilan o'ldirilsa oxirgi ~2 * interval soniyadagi deltalar yo'qoladi.
+    """
+
+    def __init__(self, model_label, field, interval_setting):
+        self.model_label = model_label
+        self.field = field
+        self.interval_setting = interval_setting
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher = None
+
+    @property
+    def model(self):
+        from django.apps import apps
+        return apps.get_model(self.model_label)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, self.interval_setting, 5)
+
+    def increment(self, pk, amount=1):
+        with self._lock:
+            self._pending[pk] = self._pending.get(pk, 0) + amount
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        self.ensure_flusher()
+        if due:
+            self.flush()
+
+    def flush_if_due(self):
+        with self._lock:
+            due = bool(self._pending) and time.monotonic() - self._last_flush >= self.flush_interval
+        return self.flush() if due else 0
+
+    def ensure_flusher(self):
+        """Fon flush thread i - birinchi increment da ishga tushadi (fork dan keyin worker da qayta yaratiladi)"""
+        if not settings.COUNTER_FLUSH_THREAD or (self._flusher is not None and self._flusher.is_alive()):
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(
+                    target=self._run_flusher, name=f'flush-{self.model_label}.{self.field}', daemon=True
+                )
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush_if_due()
+            except Exception:
+                logger.exception('Failed to flush %s.%s counters', self.model_label, self.field)
+            finally:
+                connections.close_all()
+
+    def pending(self, pk):
+        with self._lock:
+            return self._pending.get(pk, 0)
+
+    def flush(self):
+        """Yig'ilgan deltalarni bazaga yozish; xato bo'lsa deltalar buferga qaytariladi"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            self.write(pending)
+        except Exception:
+            with self._lock:
+                for pk, delta in pending.items():
+                    self._pending[pk] = self._pending.get(pk, 0) + delta
+            raise
+        return len(pending)
+
+    def write(self, pending):
+        """Bitta UPDATE ... CASE"""
+        model = self.model
+        cases = [When(pk=pk, then=F(self.field) + delta) for pk, delta in pending.items()]
+        model.objects.filter(pk__in=list(pending)).update(
+            **{self.field: Case(*cases, default=F(self.field), output_field=model._meta.get_field(self.field))}
+        )
+
+    def flush_on_exit(self):
+        """Worker to'xtaganda (atexit) qolgan deltalarni yozish"""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Failed to flush %s.%s counters on shutdown', self.model_label, self.field)
+
+
+def trending_hours(moment=None):
+    """TRENDING_EPOCH dan beri o'tgan soatlar - trending ball shu o'lchovda eskiradi"""
+    return ((moment or timezone.now()) - TRENDING_EPOCH).total_seconds() / 3600
+
+
+class SearchTermCounter(BufferedCounter):
+    """Kategoriya qidiruvlari: category_id bo'yicha yig'iladi, INSERT ... ON CONFLICT DO UPDATE bilan yoziladi"""
+
+    def __init__(self, interval_setting):
+        super().__init__('store.PopularSearchTerm', 'search_count', interval_setting)
+
+    def write(self, pending):
+        from apps.common.stamps import bump_stamp
+        from .caches import POPULAR_SEARCH_STAMP
+        from .models import Category
+
+        category_ids = set(Category.objects.filter(id__in=list(pending)).values_list('id', flat=True))
+        rows = [(category_id, delta) for category_id, delta in pending.items() if category_id in category_ids]
+        if not rows:
+            return
+
+        model = self.model
+        now = timezone.now()
+        hours = trending_hours(now)
+        connection = connections[router.db_for_write(model)]
+        updated_at = model._meta.get_field('updated_at').get_db_prep_value(now, connection)
+        params = []
+        for category_id, delta in sorted(rows):
+            params += [f'Category {category_id}', category_id, '', delta, delta, hours, updated_at, '{}']
+
+        table = connection.ops.quote_name(model._meta.db_table)
+        values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+        # Conflict target - popular_search_term_unique_category partial unique index;
+        # eski trending ball half-life bo'yicha eskirtiriladi va yangi delta qo'shiladi
+        sql = (
+            f'INSERT INTO {table} '
+            f'(name, category_id, phrase, search_count, trending_score, trending_hours, updated_at, icon_variants) '
+            f'VALUES {values} '
+            f'ON CONFLICT (category_id, phrase) WHERE category_id IS NOT NULL DO UPDATE SET '
+            f'search_count = {table}.search_count + EXCLUDED.search_count, '
+            f'trending_score = {table}.trending_score * POWER(0.5, '
+            f'(EXCLUDED.trending_hours - {table}.trending_hours) / %s) + EXCLUDED.trending_score, '
+            f'trending_hours = EXCLUDED.trending_hours, '
+            f'updated_at = EXCLUDED.updated_at'
+        )
+        params.append(float(settings.TRENDING_HALF_LIFE_HOURS))
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+            bump_stamp(POPULAR_SEARCH_STAMP)
+
+
+view_counter = BufferedCounter('store.Ad', 'view_count', 'VIEW_COUNT_FLUSH_INTERVAL')
+search_counter = SearchTermCounter('SEARCH_COUNT_FLUSH_INTERVAL')
+
+
+def _shift_category_counts(category_ids, delta, field='product_count'):
+    from .models import Category
+    queryset = Category.objects.filter(id__in=category_ids)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def update_category_counts(previous, current):
+    """E'lon yaratilganda/holati o'zgarganda/o'chirilganda kategoriya va ota kategoriyalar sonini yangilash"""
+    from .models import Ad, Category
+    old = previous['category_id'] if Ad.is_listed_state(previous) else None
+    new = current['category_id'] if Ad.is_listed_state(current) else None
+    if old == new:
+        return
+    for category_id, delta in ((old, -1), (new, 1)):
+        if category_id:
+            _shift_category_counts([category_id], delta, field='own_product_count')
+            _shift_category_counts(Category.get_ancestor_ids(category_id), delta)
+    _categories_changed()
+
+
+def _categories_changed():
+    # Sonlar queryset.update() bilan yoziladi - kategoriya ETag lari qo'lda yangilanadi
+    from apps.common.stamps import bump_stamp
+    from .caches import CATEGORIES_STAMP
+    bump_stamp(CATEGORIES_STAMP)
+
+
+def move_category_counts(category, previous_parent_id, product_count):
+    """Kategoriya boshqa ota kategoriyaga ko'chirilganda subtree sonini (bazadagi qiymat) ko'chirish"""
+    from .models import Category
+    if previous_parent_id == category.parent_id or not product_count:
+        return
+    if previous_parent_id:
+        _shift_category_counts(Category.get_ancestor_ids(previous_parent_id), -product_count)
+    if category.parent_id:
+        _shift_category_counts(Category.get_ancestor_ids(category.parent_id), product_count)
+
+
+def reconcile_category_counts():
+    """Saqlangan sonlarni ads jadvalidan qayta hisoblash; tuzatilgan kategoriyalar sonini qaytaradi"""
+    from .models import Ad, Category
+    own_counts = dict(
+        Ad.objects.filter(status='active', is_active=True)
+        .values('category_id').annotate(count=Count('id')).values_list('category_id', 'count')
+    )
+    categories = {category.id: category for category in Category.objects.all()}
+    totals = dict.fromkeys(categories, 0)
+    for category_id, count in own_counts.items():
+        seen = set()
+        while category_id in categories and category_id not in seen:
+            seen.add(category_id)
+            totals[category_id] += count
+            category_id = categories[category_id].parent_id
+
+    changed = []
+    for category in categories.values():
+        own = own_counts.get(category.id, 0)
+        if category.own_product_count != own or category.product_count != totals[category.id]:
+            category.own_product_count = own
+            category.product_count = totals[category.id]
+            changed.append(category)
+    Category.objects.bulk_update(changed, ['own_product_count', 'product_count'], batch_size=500)
+    if changed:
+        _categories_changed()
+    return len(changed)
@@ -1,5 +1,7 @@
 import django_filters
-from .models import Ad
+
+from apps.common.regions import get_district, get_region
+from .models import Ad, Category
 
 
 class AdFilter(django_filters.FilterSet):
@@ -15,14 +17,20 @@ class AdFilter(django_filters.FilterSet):
         model = Ad
         fields = ['price__gte', 'price__lte', 'is_top', 'seller_id', 'district_id', 'region_id', 'category_ids']
 
+    # Mavjud bo'lmagan region/district - worker xotirasidagi nusxa bo'yicha, bazaga so'rovsiz bo'sh natija
     def filter_district_id(self, queryset, name, value):
-        return queryset.filter(seller__addresses__district_id=value, seller__addresses__is_default=True)
+        if get_district(value) is None:
+            return queryset.none()
+        return queryset.filter(district_id=value)
 
     def filter_region_id(self, queryset, name, value):
-        return queryset.filter(seller__addresses__region_id=value, seller__addresses__is_default=True)
+        if get_region(value) is None:
+            return queryset.none()
+        return queryset.filter(region_id=value)
 
     def filter_category_ids(self, queryset, name, value):
         if value:
             category_ids = [int(id.strip()) for id in value.split(',') if id.strip().isdigit()]
-            return queryset.filter(category__id__in=category_ids)
+            # Subkategoriyalardagi e'lonlar ham (materialized path bo'yicha)
+            return queryset.filter(category_id__in=Category.get_descendant_ids(category_ids))
         return queryset
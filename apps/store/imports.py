@@ -0,0 +1,164 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from apps.common.utils import allocate_slugs
+from .models import Ad, AdPhoto, Category
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+CSV_PHOTO_SEPARATOR = '|'
+
+
+class AdImportRowSerializer(serializers.Serializer):
+    """Import faylidagi bitta qator (category - id, mavjudligi batch bo'yicha tekshiriladi)"""
+    name_uz = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    name_ru = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    category = serializers.IntegerField(min_value=1)
+    description_uz = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    description_ru = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    price = serializers.IntegerField(min_value=0, required=False, allow_null=True)
+    photos = serializers.ListField(child=serializers.URLField(), required=False, default=list)
+
+    def to_internal_value(self, data):
+        # CSV da bo'sh katak = qiymat yo'q, rasmlar bitta ustunda '|' bilan ajratiladi
+        data = {key: value for key, value in data.items() if key and value not in ('', None)}
+        if isinstance(data.get('photos'), str):
+            data['photos'] = [url.strip() for url in data['photos'].split(CSV_PHOTO_SEPARATOR) if url.strip()]
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if not attrs.get('name_uz') and not attrs.get('name_ru'):
+            raise serializers.ValidationError({'name_uz': "name_uz yoki name_ru kiritilishi shart"})
+        return attrs
+
+
+def read_rows(stream, file_format):
+    """Matn qatorlari oqimidan (qator raqami, dict) juftlarini o'qish - fayl xotiraga to'liq yuklanmaydi"""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                row = exc
+            yield line_number, row
+    else:
+        raise ValueError(f'Unsupported import format: {file_format}')
+
+
+class AdImporter:
+    """E'lonlarni batch lab import qilish: validatsiya, bitta category query, bulk_create, qatorlar bo'yicha xatolar
+
+    Import qilingan e'lonlar 'pending' holatda yaratiladi, shuning uchun public ro'yxat,
+    category hisoblagichlari va qidiruv takliflariga moderatsiyadan (Ad.save) keyin tushadi.
+    """
+
+    def __init__(self, seller, batch_size=IMPORT_BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS):
+        self.seller = seller
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.region_id, self.district_id = Ad.get_seller_location(seller.id)
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, stream, file_format):
+        rows = read_rows(stream, file_format)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+        return self.result
+
+    @property
+    def result(self):
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def validate_batch(self, batch):
+        valid = []
+        errors = []
+        for row_number, row in batch:
+            if not isinstance(row, dict):
+                errors.append((row_number, {'non_field_errors': ["Qator JSON obyekt emas"]}))
+                continue
+            serializer = AdImportRowSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((row_number, serializer.validated_data))
+            else:
+                errors.append((row_number, serializer.errors))
+
+        category_ids = {data['category'] for _, data in valid}
+        active_ids = set(
+            Category.objects.filter(id__in=category_ids, is_active=True).values_list('id', flat=True)
+        )
+        rows = []
+        for row_number, data in valid:
+            if data['category'] in active_ids:
+                rows.append((row_number, data))
+            else:
+                errors.append((row_number, {'category': ["Kategoriya topilmadi yoki faol emas"]}))
+
+        for row_number, row_errors in sorted(errors, key=lambda error: error[0]):
+            self.add_error(row_number, row_errors)
+        return rows
+
+    def build_ads(self, rows):
+        slugs = allocate_slugs(Ad, [data.get('name_uz') or data.get('name_ru') for _, data in rows], fallback='ad')
+        return [
+            Ad(
+                seller=self.seller,
+                category_id=data['category'],
+                name_uz=data.get('name_uz'),
+                name_ru=data.get('name_ru'),
+                description_uz=data.get('description_uz'),
+                description_ru=data.get('description_ru'),
+                price=data.get('price'),
+                slug=slug,
+                region_id=self.region_id,
+                district_id=self.district_id,
+            )
+            for (_, data), slug in zip(rows, slugs)
+        ]
+
+    def import_batch(self, batch, max_attempts=3):
+        rows = self.validate_batch(batch)
+        if not rows:
+            return
+
+        for attempt in range(max_attempts):
+            ads = self.build_ads(rows)
+            try:
+                with transaction.atomic():
+                    Ad.objects.bulk_create(ads)
+                    AdPhoto.objects.bulk_create([
+                        AdPhoto(ad=ad, image=url, is_main=(i == 0))
+                        for ad, (_, data) in zip(ads, rows)
+                        for i, url in enumerate(data['photos'])
+                    ])
+            except IntegrityError:
+                # Parallel yozuv slug ni egallab olgan bo'lishi mumkin - slug lar qayta ajratiladi
+                if attempt == max_attempts - 1:
+                    raise
+            else:
+                self.created += len(ads)
+                return
+
+
+def import_ads(stream, seller, file_format='csv', batch_size=IMPORT_BATCH_SIZE):
+    return AdImporter(seller, batch_size=batch_size).run(stream, file_format)
@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from rest_framework import serializers
+
+from .models import Ad, FavouriteProduct
+
+LIKED_IDS_MAX = 200
+SYNC_OPERATIONS_MAX = 500
+
+
+class LikedSet:
+    """So'rov egasi (JWT user va/yoki device_id) like bosgan e'lonlar - sahifa uchun bitta query.
+
+    Natijalar so'rov davomida eslab qolinadi: list serializer sahifadagi barcha id larni
+    oldindan yuklaydi, keyingi is_liked chaqiriqlari bazaga bormaydi.
+    """
+
+    def __init__(self, user=None, device_id=None):
+        self.user = user if user is not None and user.is_authenticated else None
+        self.device_id = device_id or None
+        self._known = set()
+        self._liked = set()
+
+    @classmethod
+    def for_request(cls, request):
+        liked_set = getattr(request, '_liked_set', None)
+        if liked_set is None:
+            liked_set = cls(getattr(request, 'user', None), request.query_params.get('device_id'))
+            request._liked_set = liked_set
+        return liked_set
+
+    @classmethod
+    def from_context(cls, context):
+        request = context.get('request')
+        return cls.for_request(request) if request is not None else None
+
+    @property
+    def is_empty(self):
+        return self.user is None and self.device_id is None
+
+    def owner_filter(self, prefix=''):
+        condition = Q()
+        if self.user is not None:
+            condition |= Q(**{f'{prefix}user': self.user})
+        if self.device_id is not None:
+            condition |= Q(**{f'{prefix}device_id': self.device_id})
+        return condition
+
+    def annotation(self):
+        """Querysetga qo'shish uchun Exists(...) ifodasi (faqat egasi bor bo'lsa ishlatiladi)"""
+        return Exists(FavouriteProduct.objects.filter(self.owner_filter(), product=OuterRef('pk')))
+
+    def remember(self, ad_id, liked):
+        self._known.add(ad_id)
+        if liked:
+            self._liked.add(ad_id)
+
+    def prime(self, ad_ids):
+        missing = set(ad_ids) - self._known
+        if not missing:
+            return
+        self._known |= missing
+        if self.is_empty:
+            return
+        self._liked.update(
+            FavouriteProduct.objects.filter(self.owner_filter(), product_id__in=missing)
+            .values_list('product_id', flat=True)
+        )
+
+    def is_liked(self, ad_id):
+        self.prime([ad_id])
+        return ad_id in self._liked
+
+    def filter(self, ad_ids):
+        """Berilgan id lardan like bosilganlari (tartib saqlanadi)"""
+        ad_ids = list(dict.fromkeys(ad_ids))
+        self.prime(ad_ids)
+        return [ad_id for ad_id in ad_ids if ad_id in self._liked]
+
+
+class LikedListSerializer(serializers.ListSerializer):
+    """Sahifadagi barcha e'lonlar uchun is_liked ni bitta query bilan oldindan yuklash"""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        liked_set = LikedSet.from_context(self.context)
+        if liked_set is not None:
+            liked_set.prime(item.id for item in items)
+        return super().to_representation(items)
+
+
+class LikedFieldMixin:
+    """is_liked uchun mixin (Meta.list_serializer_class = LikedListSerializer bilan ishlatiladi)"""
+
+    def get_is_liked(self, obj) -> bool:
+        liked_set = LikedSet.from_context(self.context)
+        return liked_set.is_liked(obj.id) if liked_set is not None else False
+
+
+@transaction.atomic
+def sync_favourites(liked_set, operations):
+    """add/remove operatsiyalarini bitta tranzaksiyada qo'llash; har bir e'lon uchun oxirgi operatsiya hisobga olinadi.
+
+    Qo'shish INSERT ... ON CONFLICT DO NOTHING (bulk_create ignore_conflicts), o'chirish bitta DELETE.
+    """
+    final = {}
+    for operation in operations:
+        final[operation['product']] = operation['action']
+    to_add = [product_id for product_id, action in final.items() if action == 'add']
+    to_remove = [product_id for product_id, action in final.items() if action == 'remove']
+
+    if to_remove:
+        FavouriteProduct.objects.filter(liked_set.owner_filter(), product_id__in=to_remove).delete()
+    if to_add:
+        existing = Ad.objects.filter(id__in=to_add).values_list('id', flat=True)
+        FavouriteProduct.objects.bulk_create([
+            FavouriteProduct(user=liked_set.user, device_id=None if liked_set.user else liked_set.device_id,
+                             product_id=product_id)
+            for product_id in existing
+        ], ignore_conflicts=True)
+
+    return list(
+        FavouriteProduct.objects.filter(liked_set.owner_filter()).order_by('product_id')
+        .values_list('product_id', flat=True).distinct()
+    )
+
+
+def merge_device_favourites(user, device_id):
+    """Mehmon (device_id) like larini foydalanuvchiga bitta UPDATE bilan biriktirish.
+
+    Foydalanuvchida allaqachon bor e'lonlar o'tkazilmaydi (user, product unique), ular device
+    yozuvi sifatida qoladi va LikedSet ularni baribir bitta natijaga birlashtiradi.
+    """
+    if not device_id:
+        return 0
+    return FavouriteProduct.objects.filter(device_id=device_id, user__isnull=True).exclude(
+        product_id__in=FavouriteProduct.objects.filter(user=user).values('product_id')
+    ).update(user=user)
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.store.imports import IMPORT_BATCH_SIZE, IMPORT_FORMATS, import_ads
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Bulk import ads for a seller from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file with one ad per row')
+        parser.add_argument('--seller', required=True, help='Seller phone number')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f'Cannot detect import format of {path}, pass --format')
+
+        seller = User.objects.filter(phone_number=options['seller']).first()
+        if seller is None:
+            raise CommandError(f"Seller {options['seller']} not found")
+
+        with path.open(encoding='utf-8-sig', newline='') as stream:
+            result = import_ads(stream, seller, file_format=file_format, batch_size=options['batch_size'])
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} ads, {result['error_count']} rows failed"
+        ))
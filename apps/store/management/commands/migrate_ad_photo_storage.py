@@ -0,0 +1,42 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.common.images import is_local_file
+from apps.common.models import StoredFile
+from apps.store.models import AdPhoto
+
+CONTENT_ADDRESSED_NAME_RE = re.compile(r'/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+class Command(BaseCommand):
+    help = 'Move existing ad photos into content-addressed storage, storing identical files once'
+
+    def handle(self, *args, **options):
+        storage = AdPhoto._meta.get_field('image').storage
+        moved = missing = 0
+        names = (
+            AdPhoto.objects.exclude(image='').values_list('image', flat=True).distinct().order_by('image')
+        )
+        for old_name in names.iterator():
+            if not is_local_file(old_name) or CONTENT_ADDRESSED_NAME_RE.search(old_name):
+                continue
+            if not storage.exists(old_name):
+                missing += 1
+                self.stderr.write(f'Missing file: {old_name}')
+                continue
+
+            photos = AdPhoto.objects.filter(image=old_name)
+            with storage.open(old_name, 'rb') as content:
+                new_name = storage.save(old_name, content)
+            # update() signal yubormaydi - shu fayldagi barcha yozuvlar murojaati bu yerda olinadi
+            with transaction.atomic():
+                storage.retain(new_name, count=photos.count())
+                photos.update(image=new_name, image_variants={})
+                StoredFile.objects.filter(name=old_name).delete()
+                # Eski nom StoredFile da yo'q - delete() uni (va eski variantlarini) commit dan keyin o'chiradi
+                storage.delete(old_name)
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} files, {missing} missing'))
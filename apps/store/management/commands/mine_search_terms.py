@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.store.search_log import MINE_CHUNK_SIZE, POPULAR_TERMS_PER_CATEGORY, SKETCH_CAPACITY, mine_search_log
+
+
+class Command(BaseCommand):
+    help = 'Fold new search log rows into the top-K sketches and rebuild mined popular search terms (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=MINE_CHUNK_SIZE)
+        parser.add_argument('--capacity', type=int, default=SKETCH_CAPACITY, help='Counters kept per category')
+        parser.add_argument('--top', type=int, default=POPULAR_TERMS_PER_CATEGORY, help='Terms kept per category')
+
+    def handle(self, *args, **options):
+        processed = mine_search_log(options['chunk_size'], options['capacity'], options['top'])
+        self.stdout.write(self.style.SUCCESS(f'{processed} search phrases mined'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.store.suggestions import rebuild_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the /search/complete/ suggestion index from ads and categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_suggestions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} search suggestions'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.store.counters import reconcile_category_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored Category product counts (own and subtree) from the ads table'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_category_counts()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled product counts, {fixed} categories fixed'))
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from apps.store.search import install_search_backend, uninstall_search_backend
+
+
+def install(apps, schema_editor):
+    install_search_backend(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search_backend(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_ad_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Category'), ('product', 'Product')], max_length=20)),
+                ('phrase', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('weight', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.category')),
+            ],
+            options={
+                'verbose_name': 'Search Suggestion',
+                'verbose_name_plural': 'Search Suggestions',
+                'db_table': 'search_suggestions',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchSuggestionPrefix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20)),
+                ('suggestion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prefixes', to='store.searchsuggestion')),
+            ],
+            options={
+                'db_table': 'search_suggestion_prefixes',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchsuggestion',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'product')), fields=('phrase',), name='unique_product_suggestion_phrase'),
+        ),
+        migrations.AddIndex(
+            model_name='searchsuggestionprefix',
+            index=models.Index(fields=['prefix', 'suggestion'], name='suggestion_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 09:30
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_product_counts(apps, schema_editor):
+    Ad = apps.get_model('store', 'Ad')
+    Category = apps.get_model('store', 'Category')
+    own_counts = dict(
+        Ad.objects.filter(status='active', is_active=True)
+        .values('category_id').annotate(count=Count('id')).values_list('category_id', 'count')
+    )
+    categories = {category.id: category for category in Category.objects.all()}
+    for category_id, count in own_counts.items():
+        categories[category_id].own_product_count = count
+        seen = set()
+        while category_id in categories and category_id not in seen:
+            seen.add(category_id)
+            categories[category_id].product_count += count
+            category_id = categories[category_id].parent_id
+    Category.objects.bulk_update(categories.values(), ['own_product_count', 'product_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_search_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='own_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_product_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('store', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    categories = []
+    for category_id in parents:
+        ids, current = [], category_id
+        while current and current not in ids:
+            ids.append(current)
+            current = parents.get(current)
+        categories.append(Category(id=category_id, path='/' + ''.join(f'{pk}/' for pk in reversed(ids))))
+    Category.objects.bulk_update(categories, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_category_product_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 09:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_seller_location(apps, schema_editor):
+    Ad = apps.get_model('store', 'Ad')
+    Address = apps.get_model('accounts', 'Address')
+    defaults = Address.objects.filter(is_default=True).order_by('user_id', '-created_at')
+    seen = set()
+    for user_id, region_id, district_id in defaults.values_list('user_id', 'region_id', 'district_id'):
+        if user_id in seen:
+            continue
+        seen.add(user_id)
+        Ad.objects.filter(seller_id=user_id).update(region_id=region_id, district_id=district_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+        ('store', '0005_category_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='district',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='common.district'),
+        ),
+        migrations.AddField(
+            model_name='ad',
+            name='region',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='common.region'),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(fields=['region', 'status', 'is_active', '-published_at'], name='ad_region_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(fields=['district', 'status', 'is_active', '-published_at'], name='ad_district_feed_idx'),
+        ),
+        migrations.RunPython(populate_seller_location, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 09:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+        ('store', '0006_ad_seller_location'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'active')), fields=['-published_at', '-id'], name='ad_public_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'active')), fields=['price', 'id'], name='ad_public_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'active')), fields=['view_count', 'id'], name='ad_public_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'active'), ('is_top', True)), fields=['-published_at'], name='ad_public_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'active')), fields=['category', '-published_at'], name='ad_public_category_idx'),
+        ),
+    ]
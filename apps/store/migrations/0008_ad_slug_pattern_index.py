@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+        ('store', '0007_public_ad_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(fields=['slug'], name='ad_slug_pattern_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
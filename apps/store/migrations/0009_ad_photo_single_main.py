@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 09:44
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def clear_duplicate_main_photos(apps, schema_editor):
+    # Bir nechta main rasmli e'lonlarda oxirgi qo'shilgani main bo'lib qoladi (AdPhoto.save dagi kabi)
+    AdPhoto = apps.get_model('store', 'AdPhoto')
+    ad_ids = (
+        AdPhoto.objects.filter(is_main=True).values('ad_id').annotate(count=Count('id'))
+        .filter(count__gt=1).values_list('ad_id', flat=True)
+    )
+    for ad_id in list(ad_ids):
+        main = AdPhoto.objects.filter(ad_id=ad_id, is_main=True).order_by('-created_at', '-id').first()
+        AdPhoto.objects.filter(ad_id=ad_id, is_main=True).exclude(id=main.id).update(is_main=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_ad_slug_pattern_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_main_photos, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='adphoto',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_main', True)), fields=('ad',), name='ad_photo_single_main'),
+        ),
+    ]
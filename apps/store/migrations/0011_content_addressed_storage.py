@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 09:49
+
+import apps.common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adphoto',
+            name='image',
+            field=models.ImageField(storage=apps.common.storage.ad_photo_storage, upload_to='ads/'),
+        ),
+    ]
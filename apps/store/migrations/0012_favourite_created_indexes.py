@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 10:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_content_addressed_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favouriteproduct',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='favourite_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favouriteproduct',
+            index=models.Index(fields=['device_id', '-created_at', '-id'], name='favourite_device_created_idx'),
+        ),
+    ]
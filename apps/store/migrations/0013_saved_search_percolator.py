@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.store.percolator import search_key_values
+
+
+def index_saved_searches(apps, schema_editor):
+    MySearch = apps.get_model('store', 'MySearch')
+    SavedSearchKey = apps.get_model('store', 'SavedSearchKey')
+    rows = []
+    for search in MySearch.objects.iterator():
+        rows.extend(
+            SavedSearchKey(search_id=search.id, category_key=category_key, region_key=region_key,
+                           price_bucket=bucket, token_key=token_key)
+            for category_key, region_key, bucket, token_key in search_key_values(
+                search.category_id, search.region_id, search.price_min, search.price_max, search.search_query
+            )
+        )
+    SavedSearchKey.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_favourite_created_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_key', models.PositiveIntegerField(default=0)),
+                ('region_key', models.PositiveIntegerField(default=0)),
+                ('price_bucket', models.PositiveSmallIntegerField(default=0)),
+                ('token_key', models.CharField(blank=True, default='', max_length=3)),
+                ('search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keys', to='store.mysearch')),
+            ],
+            options={
+                'db_table': 'saved_search_keys',
+                'indexes': [models.Index(fields=['category_key', 'region_key', 'price_bucket', 'token_key'], name='saved_search_key_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSearchMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('ad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_search_matches', to='store.ad')),
+                ('search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='store.mysearch')),
+            ],
+            options={
+                'verbose_name': 'Saved Search Match',
+                'verbose_name_plural': 'Saved Search Matches',
+                'db_table': 'saved_search_matches',
+                'indexes': [models.Index(condition=models.Q(('delivered_at__isnull', True)), fields=['created_at'], name='saved_search_match_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('search', 'ad'), name='unique_saved_search_match')],
+            },
+        ),
+        migrations.RunPython(index_saved_searches, migrations.RunPython.noop),
+    ]
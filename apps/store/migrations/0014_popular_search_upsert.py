@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 10:16
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_terms(apps, schema_editor):
+    # get_or_create poygasi bir kategoriyaga bir nechta qator yaratgan bo'lishi mumkin - sonlar birinchisiga qo'shiladi
+    PopularSearchTerm = apps.get_model('store', 'PopularSearchTerm')
+    duplicates = (
+        PopularSearchTerm.objects.filter(category__isnull=False).values('category_id')
+        .annotate(count=Count('id'), total=Sum('search_count')).filter(count__gt=1)
+    )
+    for row in list(duplicates):
+        terms = PopularSearchTerm.objects.filter(category_id=row['category_id']).order_by('id')
+        keep = terms.first()
+        terms.exclude(id=keep.id).delete()
+        PopularSearchTerm.objects.filter(id=keep.id).update(search_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_saved_search_percolator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='popularsearchterm',
+            name='trending_hours',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='popularsearchterm',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(merge_duplicate_terms, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='popularsearchterm',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('category',), name='popular_search_term_unique_category'),
+        ),
+    ]
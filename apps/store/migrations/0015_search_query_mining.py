@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 10:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_popular_search_upsert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQueryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phrase', models.CharField(max_length=255)),
+                ('category_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('hits', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'search_query_log',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTermSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phrase', models.CharField(max_length=255)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('error', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'search_term_sketches',
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='popularsearchterm',
+            name='popular_search_term_unique_category',
+        ),
+        migrations.AddField(
+            model_name='popularsearchterm',
+            name='phrase',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='popularsearchterm',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('category', 'phrase'), name='popular_search_term_unique_category'),
+        ),
+        migrations.AddConstraint(
+            model_name='popularsearchterm',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True), models.Q(('phrase', ''), _negated=True)), fields=('phrase',), name='popular_search_term_unique_phrase'),
+        ),
+        migrations.AddField(
+            model_name='searchtermsketch',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.category'),
+        ),
+        migrations.AddIndex(
+            model_name='searchtermsketch',
+            index=models.Index(fields=['category', '-count'], name='search_term_sketch_top_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 11:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.store.suggestions import get_ad_phrases
+
+
+def link_suggestion_ads(apps, schema_editor):
+    Ad = apps.get_model('store', 'Ad')
+    SearchSuggestion = apps.get_model('store', 'SearchSuggestion')
+    SearchSuggestion.objects.filter(kind='product', weight=0).delete()
+
+    phrase_ads = {}
+    active_ads = Ad.objects.filter(status='active', is_active=True).values(
+        'id', 'status', 'is_active', 'name_uz', 'name_ru', 'category_id'
+    )
+    for state in active_ads.iterator(chunk_size=1000):
+        for phrase in get_ad_phrases(state):
+            phrase_ads[phrase] = state['id']
+
+    suggestions = list(SearchSuggestion.objects.filter(kind='product', ad__isnull=True))
+    for suggestion in suggestions:
+        suggestion.ad_id = phrase_ads.get(suggestion.phrase)
+    SearchSuggestion.objects.bulk_update(suggestions, ['ad'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_search_query_mining'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsuggestion',
+            name='ad',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.ad'),
+        ),
+        migrations.RunPython(link_suggestion_ads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+INDEX_NAME = 'ad_public_price_desc_idx'
+
+
+def create_index(apps, schema_editor):
+    # Keyset ?ordering=-price "price DESC NULLS LAST, id DESC" beradi. PostgreSQL da ad_public_price_idx teskari
+    # o'qilganda NULL lar boshida chiqadi (DESC NULLS FIRST), shuning uchun alohida index kerak. SQLite NULL
+    # qiymatlarni index bo'yicha ham to'g'ri tartiblaydi, Meta.indexes da esa NULLS LAST ni qabul qilmaydi.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON ads (price DESC NULLS LAST, id DESC) "
+            f"WHERE status = 'active' AND is_active"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_search_suggestion_ad'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
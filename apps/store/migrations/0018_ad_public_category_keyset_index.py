@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_ad_public_price_desc_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ad',
+            name='ad_public_category_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True), ('status', 'active')), fields=['category', '-published_at', '-id'], name='ad_public_category_idx'),
+        ),
+    ]
@@ -1,16 +1,31 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Case, ExpressionWrapper, F, Prefetch, Q, Subquery, Value, When
+from django.db.models.functions import Concat, Power, Substr
 from django.contrib.auth import get_user_model
-from django.utils.text import slugify
-import uuid
+
+from apps.accounts.models import Address
+from apps.common.images import get_variant_urls
+from apps.common.storage import ad_photo_storage
+from apps.common.utils import save_with_unique_slug
 
 User = get_user_model()
 
+PUBLIC_ADS = Q(status='active', is_active=True)
+
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
     icon = models.ImageField(upload_to='icons/', blank=True, null=True)
+    icon_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
+    # Materialized path: '/root_id/.../self_id/' - descendant lar path__startswith bilan topiladi
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
+    # Faol e'lonlar soni: own - faqat shu kategoriyada, product_count - butun subtree bo'yicha
+    own_product_count = models.PositiveIntegerField(default=0, editable=False)
+    product_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -18,13 +33,96 @@ class Category(models.Model):
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ['name']  # ORDERING QO'SHILDI
+        indexes = [
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    COUNTER_FIELDS = ['own_product_count', 'product_count']
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.pk and self.parent_id and f'/{self.pk}/' in (self.parent.path or ''):
+            raise ValidationError({'parent': 'Category cannot be moved into its own subtree.'})
+
+    def save(self, *args, **kwargs):
+        old_path = None
+        if self.pk and not self._state.adding:
+            old_path = Category.objects.filter(pk=self.pk).values_list('path', flat=True).first()
+            # Sonlar faqat F() update lar orqali o'zgaradi - eski qiymatni qayta yozmaslik uchun
+            if kwargs.get('update_fields') is None:
+                kwargs['update_fields'] = [
+                    field.attname for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in self.COUNTER_FIELDS
+                ]
+            self.path = self.build_path()
+
+        super().save(*args, **kwargs)
+
+        if old_path is None:
+            self.path = self.build_path()
+            Category.objects.filter(pk=self.pk).update(path=self.path)
+        elif old_path and old_path != self.path:
+            # Ko'chirish: butun subtree path larini bitta UPDATE bilan yangilash
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr('path', len(old_path) + 1))
+            )
+
+    def build_path(self):
+        parent_path = self.parent.path if self.parent_id else '/'
+        if f'/{self.pk}/' in parent_path:
+            raise ValueError('Category cannot be moved into its own subtree.')
+        return f'{parent_path}{self.pk}/'
+
     @property
-    def product_count(self):
-        return self.ads.filter(is_active=True).count()
+    def ancestor_ids(self):
+        """Root dan boshlab o'zigacha bo'lgan id lar"""
+        return [int(part) for part in self.path.strip('/').split('/') if part]
+
+    @classmethod
+    def get_ancestor_ids(cls, category_id):
+        """Kategoriyaning o'zi va barcha ota kategoriyalari id lari"""
+        path = cls.objects.filter(id=category_id).values_list('path', flat=True).first()
+        return [int(part) for part in (path or '').strip('/').split('/') if part] or [category_id]
+
+    @classmethod
+    def get_descendant_ids(cls, category_ids):
+        """Berilgan kategoriyalar va ularning barcha subkategoriyalari id lari (path index orqali).
+
+        Ro'yxat sifatida qaytadi - e'lonlar category_id IN (...) bilan ad_public_category_idx dan olinadi
+        (categories bilan JOIN/subquery da planner -published_at index ini skan qiladi).
+        """
+        paths = cls.objects.filter(id__in=category_ids).values_list('path', flat=True)
+        condition = Q(pk__in=[])
+        for path in paths:
+            condition |= Q(path__startswith=path)
+        return list(cls.objects.filter(condition).values_list('id', flat=True))
+
+    @property
+    def breadcrumbs(self):
+        categories = Category.objects.in_bulk(self.ancestor_ids)
+        return [categories[pk] for pk in self.ancestor_ids if pk in categories]
+
+
+class AdQuerySet(models.QuerySet):
+    def public(self):
+        """Public endpointlarda ko'rinadigan e'lonlar (ad_public_* partial indexlar sharti bilan bir xil)"""
+        return self.filter(PUBLIC_ADS)
+
+    def with_list_data(self):
+        """Main photo va default address ni butun sahifa uchun oldindan yuklash (is_liked - likes.LikedSet)"""
+        return self.select_related('seller', 'category').prefetch_related(
+            Prefetch('photos', queryset=AdPhoto.objects.filter(is_main=True), to_attr='main_photos'),
+            Prefetch('seller__addresses', queryset=Address.objects.filter(is_default=True),
+                     to_attr='default_addresses'),
+        )
+
+    def favourited_by(self, **owner):
+        """Like bosilgan public e'lonlar - favourite_products bilan JOIN, favourited_at/favourite_id annotatsiyasi"""
+        return self.public().filter(**{f'favourites__{key}': value for key, value in owner.items()}).annotate(
+            favourited_at=F('favourites__created_at'), favourite_id=F('favourites__id'),
+        ).order_by('-favourited_at', '-favourite_id')
 
 
 class Ad(models.Model):
@@ -47,28 +145,74 @@ class Ad(models.Model):
     is_active = models.BooleanField(default=True)
     is_top = models.BooleanField(default=False)
     view_count = models.PositiveIntegerField(default=0)
+    # Sotuvchining default manzilidan denormalizatsiya (region/district filterlari uchun)
+    region = models.ForeignKey('common.Region', on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='+', db_index=False, editable=False)
+    district = models.ForeignKey('common.District', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='+', db_index=False, editable=False)
     published_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AdQuerySet.as_manager()
+
     class Meta:
         db_table = 'ads'
         verbose_name = 'Ad'
         verbose_name_plural = 'Ads'
         ordering = ['-published_at']
+        indexes = [
+            # Public e'lonlar (status='active', is_active) uchun partial indexlar - list/search ordering lari
+            models.Index(fields=['-published_at', '-id'], name='ad_public_recent_idx', condition=PUBLIC_ADS),
+            # -price (DESC NULLS LAST) uchun PostgreSQL da ad_public_price_desc_idx (migration 0017 da)
+            models.Index(fields=['price', 'id'], name='ad_public_price_idx', condition=PUBLIC_ADS),
+            models.Index(fields=['view_count', 'id'], name='ad_public_views_idx', condition=PUBLIC_ADS),
+            models.Index(fields=['-published_at'], name='ad_public_top_idx', condition=PUBLIC_ADS & Q(is_top=True)),
+            models.Index(fields=['category', '-published_at', '-id'], name='ad_public_category_idx',
+                         condition=PUBLIC_ADS),
+            # Slug allocator dagi LIKE 'base-%' prefix query si uchun (PostgreSQL)
+            models.Index(fields=['slug'], name='ad_slug_pattern_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['region', 'status', 'is_active', '-published_at'], name='ad_region_feed_idx'),
+            models.Index(fields=['district', 'status', 'is_active', '-published_at'], name='ad_district_feed_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name_uz or self.name_ru or f'ad-{uuid.uuid4().hex[:8]}')
-            self.slug = base_slug
-            counter = 1
-            while Ad.objects.filter(slug=self.slug).exists():
-                self.slug = f'{base_slug}-{counter}'
-                counter += 1
-        super().save(*args, **kwargs)
+        if self._state.adding and self.region_id is None and self.district_id is None:
+            self.region_id, self.district_id = Ad.get_seller_location(self.seller_id)
+        if self.slug:
+            return super().save(*args, **kwargs)
+        # Slug bitta prefix query bilan ajratiladi, to'qnashuvda (IntegrityError) qayta urinadi
+        save_with_unique_slug(self, lambda: super(Ad, self).save(*args, **kwargs), self.name_uz or self.name_ru,
+                              fallback='ad')
+
+    TRACKED_FIELDS = ['status', 'is_active', 'name_uz', 'name_ru', 'category_id']
 
     def __str__(self):
         return self.name_uz or self.name_ru or f'Ad #{self.id}'
 
+    @staticmethod
+    def get_seller_location(seller_id):
+        """Sotuvchi default manzilining (region_id, district_id) juftligi"""
+        location = Address.objects.filter(user_id=seller_id, is_default=True).values_list(
+            'region_id', 'district_id'
+        ).first()
+        return location or (None, None)
+
+    @classmethod
+    def sync_seller_location(cls, seller_id):
+        """Sotuvchining barcha e'lonlariga joriy default region/district ni bitta UPDATE bilan yozish"""
+        region_id, district_id = cls.get_seller_location(seller_id)
+        cls.objects.filter(seller_id=seller_id).exclude(region_id=region_id, district_id=district_id).update(
+            region_id=region_id, district_id=district_id
+        )
+
+    def get_tracked_state(self):
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
+    @staticmethod
+    def is_listed_state(state):
+        """E'lon public ro'yxatlarda ko'rinadimi (status='active' va is_active)"""
+        return bool(state) and state['status'] == 'active' and state['is_active']
+
     @property
     def name(self):
         return self.name_uz or self.name_ru
@@ -77,15 +221,34 @@ class Ad(models.Model):
     def description(self):
         return self.description_uz or self.description_ru
 
+    def get_main_photo(self):
+        if hasattr(self, 'main_photos'):
+            return self.main_photos[0] if self.main_photos else None
+        return self.photos.filter(is_main=True).first()
+
     @property
     def main_photo(self):
-        photo = self.photos.filter(is_main=True).first()
+        photo = self.get_main_photo()
         return photo.image.url if photo and photo.image else None
 
+    @property
+    def main_photo_variants(self):
+        photo = self.get_main_photo()
+        return photo.variant_urls if photo else None
+
+    @property
+    def seller_address(self):
+        if hasattr(self.seller, 'default_addresses'):
+            address = self.seller.default_addresses[0] if self.seller.default_addresses else None
+        else:
+            address = self.seller.addresses.filter(is_default=True).first()
+        return address.name if address else ""
+
 
 class AdPhoto(models.Model):
     ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name='photos')
-    image = models.ImageField(upload_to='ads/')
+    image = models.ImageField(upload_to='ads/', storage=ad_photo_storage)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_main = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -94,6 +257,9 @@ class AdPhoto(models.Model):
         verbose_name = 'Ad Photo'
         verbose_name_plural = 'Ad Photos'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['ad'], condition=Q(is_main=True), name='ad_photo_single_main'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.is_main:
@@ -101,6 +267,27 @@ class AdPhoto(models.Model):
             AdPhoto.objects.filter(ad=self.ad, is_main=True).update(is_main=False)
         super().save(*args, **kwargs)
 
+    @property
+    def variant_urls(self):
+        return get_variant_urls(self.image.name, self.image_variants, self.image.storage)
+
+    @classmethod
+    def add_photos(cls, ad, urls):
+        """Rasmlarni bitta bulk_create bilan qo'shish; main rasm bo'lmasa birinchisi main bo'ladi"""
+        if not urls:
+            return []
+        photos = cls.objects.bulk_create([cls(ad=ad, image=url) for url in urls])
+        cls.ensure_single_main(ad.id)
+        return photos
+
+    @classmethod
+    def ensure_single_main(cls, ad_id):
+        """Bitta UPDATE: mavjud main rasm (bo'lmasa eng birinchi qo'shilgani) main, qolganlari emas"""
+        main_id = cls.objects.filter(ad_id=ad_id).order_by('-is_main', 'created_at', 'id').values('id')[:1]
+        cls.objects.filter(ad_id=ad_id).update(
+            is_main=Case(When(id=Subquery(main_id), then=Value(True)), default=Value(False))
+        )
+
 
 class FavouriteProduct(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favourites', null=True, blank=True)
@@ -114,6 +301,10 @@ class FavouriteProduct(models.Model):
         verbose_name_plural = 'Favourite Products'
         unique_together = [['user', 'product'], ['device_id', 'product']]
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='favourite_user_created_idx'),
+            models.Index(fields=['device_id', '-created_at', '-id'], name='favourite_device_created_idx'),
+        ]
 
 
 class MySearch(models.Model):
@@ -132,18 +323,150 @@ class MySearch(models.Model):
         ordering = ['-created_at']
 
 
+class PopularSearchTermQuerySet(models.QuerySet):
+    def with_trending(self, moment=None):
+        """trending - half-life bo'yicha hozirgi vaqtga eskirtirilgan trending_score"""
+        from .counters import trending_hours
+        elapsed = Value(trending_hours(moment)) - F('trending_hours')
+        return self.annotate(trending=ExpressionWrapper(
+            F('trending_score') * Power(Value(0.5), elapsed / Value(float(settings.TRENDING_HALF_LIFE_HOURS))),
+            output_field=models.FloatField(),
+        ))
+
+
 class PopularSearchTerm(models.Model):
     name = models.CharField(max_length=255)
     icon = models.ImageField(upload_to='search_icons/', blank=True, null=True)
+    icon_variants = models.JSONField(default=dict, blank=True, editable=False)
     search_count = models.PositiveIntegerField(default=0)
+    # Eskiruvchi ball: trending_hours paytidagi qiymat (counters.SearchTermCounter yozadi)
+    trending_score = models.FloatField(default=0, editable=False)
+    trending_hours = models.FloatField(default=0, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
+    # Real qidiruvlardan olingan (search_log.mine_search_log) so'rov; '' - kategoriya hisoblagichi qatori
+    phrase = models.CharField(max_length=255, blank=True, default='', editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PopularSearchTermQuerySet.as_manager()
+
     class Meta:
         db_table = 'popular_search_terms'
         verbose_name = 'Popular Search Term'
         verbose_name_plural = 'Popular Search Terms'
         ordering = ['-search_count']
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'phrase'], condition=models.Q(category__isnull=False),
+                                    name='popular_search_term_unique_category'),
+            models.UniqueConstraint(fields=['phrase'],
+                                    condition=models.Q(category__isnull=True) & ~models.Q(phrase=''),
+                                    name='popular_search_term_unique_phrase'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class SearchSuggestion(models.Model):
+    KIND_CHOICES = [
+        ('category', 'Category'),
+        ('product', 'Product'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    phrase = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    # product: shu phrase li faol e'lonlardan biri (autocomplete javobida id sifatida qaytariladi)
+    ad = models.ForeignKey(Ad, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    weight = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'search_suggestions'
+        verbose_name = 'Search Suggestion'
+        verbose_name_plural = 'Search Suggestions'
+        constraints = [
+            models.UniqueConstraint(fields=['phrase'], condition=models.Q(kind='product'),
+                                    name='unique_product_suggestion_phrase'),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class SearchSuggestionPrefix(models.Model):
+    suggestion = models.ForeignKey(SearchSuggestion, on_delete=models.CASCADE, related_name='prefixes')
+    prefix = models.CharField(max_length=20)
+
+    class Meta:
+        db_table = 'search_suggestion_prefixes'
+        indexes = [
+            models.Index(fields=['prefix', 'suggestion'], name='suggestion_prefix_idx'),
+        ]
+
+
+class SavedSearchKey(models.Model):
+    """MySearch uchun teskari index (percolator): 0 / '' - shu o'lchov bo'yicha cheklov yo'q
+
+    Har bir saved search narx oralig'i qamragan har bir log2 narx bucket i uchun bitta qator oladi.
+    """
+    search = models.ForeignKey(MySearch, on_delete=models.CASCADE, related_name='keys')
+    category_key = models.PositiveIntegerField(default=0)
+    region_key = models.PositiveIntegerField(default=0)
+    price_bucket = models.PositiveSmallIntegerField(default=0)
+    token_key = models.CharField(max_length=3, blank=True, default='')
+
+    class Meta:
+        db_table = 'saved_search_keys'
+        indexes = [
+            models.Index(fields=['category_key', 'region_key', 'price_bucket', 'token_key'],
+                         name='saved_search_key_idx'),
+        ]
+
+
+class SavedSearchMatch(models.Model):
+    """Yangi faol e'lonning saved search ga mosligi - foydalanuvchiga yetkazish uchun navbat"""
+    search = models.ForeignKey(MySearch, on_delete=models.CASCADE, related_name='matches')
+    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name='saved_search_matches')
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'saved_search_matches'
+        verbose_name = 'Saved Search Match'
+        verbose_name_plural = 'Saved Search Matches'
+        constraints = [
+            models.UniqueConstraint(fields=['search', 'ad'], name='unique_saved_search_match'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], condition=models.Q(delivered_at__isnull=True),
+                         name='saved_search_match_pending_idx'),
+        ]
+
+
+class SearchQueryLog(models.Model):
+    """Sample langan qidiruvlar - worker buferidan (phrase, category) bo'yicha yig'ilib batch bilan yoziladi.
+
+    mine_search_log o'qigan qatorlar o'chiriladi, jadval faqat hali qayta ishlanmagan qismni saqlaydi.
+    """
+    phrase = models.CharField(max_length=255)
+    # Request parametridan olinadi, FK emas - mavjudligi mining paytida tekshiriladi
+    category_id = models.PositiveIntegerField(null=True, blank=True)
+    hits = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'search_query_log'
+
+
+class SearchTermSketch(models.Model):
+    """Kategoriya bo'yicha Space-Saving sketch hisoblagichlari (category=None - umumiy qidiruvlar)"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    phrase = models.CharField(max_length=255)
+    count = models.PositiveBigIntegerField(default=0)
+    error = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'search_term_sketches'
+        indexes = [
+            models.Index(fields=['category', '-count'], name='search_term_sketch_top_idx'),
+        ]
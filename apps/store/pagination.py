@@ -0,0 +1,178 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from functools import cached_property
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """(ordering field, id) bo'yicha keyset pagination - OFFSET va COUNT(*) siz"""
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+    # Tie-breaker: qatorni yagona aniqlovchi maydon (annotatsiya ham bo'lishi mumkin)
+    unique_field = 'id'
+
+    def get_ordering(self, request, view):
+        """Ordering maydoni va yo'nalishini view.ordering_fields asosida aniqlash"""
+        allowed = getattr(view, 'ordering_fields', None) or []
+        param = request.query_params.get(self.ordering_query_param, '')
+        for term in param.split(','):
+            term = term.strip()
+            if term.lstrip('-') in allowed:
+                return term.lstrip('-'), term.startswith('-')
+
+        default = (getattr(view, 'ordering', None) or ['-id'])[0]
+        return default.lstrip('-'), default.startswith('-')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = self.order_queryset(queryset, request, view)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(*cursor))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def order_queryset(self, queryset, request, view=None):
+        """Keyset ORDER BY (ordering maydoni, unique_field) - ad_public_* indexlar shu tartibga mos"""
+        self.field, self.descending = self.get_ordering(request, view)
+        self.model_field = self.get_model_field(queryset)
+        # NULLS LAST faqat nullable maydonlar uchun - qolganlarida oddiy ORDER BY index bilan mos keladi
+        nulls_last = True if self.model_field.null else None
+        if self.descending:
+            return queryset.order_by(F(self.field).desc(nulls_last=nulls_last), F(self.unique_field).desc())
+        return queryset.order_by(F(self.field).asc(nulls_last=nulls_last), F(self.unique_field).asc())
+
+    def get_model_field(self, queryset):
+        """Ordering maydoni - model maydoni yoki annotatsiyaning output_field i"""
+        annotation = queryset.query.annotations.get(self.field)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(self.field)
+
+    def get_keyset_filter(self, value, pk):
+        """Oxirgi ko'rilgan qatordan keyingi qatorlar uchun filter (NULL qiymatlar oxirida)"""
+        lookup = 'lt' if self.descending else 'gt'
+        unique_lookup = f'{self.unique_field}__{lookup}'
+        if value is None:
+            return Q(**{f'{self.field}__isnull': True, unique_lookup: pk})
+
+        keyset = Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value, unique_lookup: pk})
+        if self.model_field.null:
+            keyset |= Q(**{f'{self.field}__isnull': True})
+        return keyset
+
+    def get_ordering_key(self):
+        return f"{'-' if self.descending else ''}{self.field}"
+
+    def encode_cursor(self, obj):
+        value = getattr(obj, self.field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = json.dumps({'o': self.get_ordering_key(), 'v': value, 'id': getattr(obj, self.unique_field)})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if payload['o'] != self.get_ordering_key():
+                raise ValueError('Cursor ordering mismatch')
+            value = payload['v']
+            if value is not None:
+                value = self.model_field.to_python(value)
+            pk = int(payload['id'])
+        except (binascii.Error, KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AdFeedPagination(PageNumberPagination):
+    """Default holatda page number, ?cursor= berilganda keyset rejimi (infinite scroll uchun)"""
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.keyset_class.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Keyset cursor. Bo\'sh qiymat birinchi sahifani qaytaradi.',
+            'schema': {'type': 'string'},
+        })
+        return parameters
+
+
+class FavouriteKeysetPagination(KeysetPagination):
+    """Sevimlilar: like bosilgan vaqt bo'yicha (favourited_at, favourite_id) keyset"""
+    unique_field = 'favourite_id'
+
+
+class FavouriteFeedPagination(AdFeedPagination):
+    keyset_class = FavouriteKeysetPagination
+
+
+class CappedCountPaginator(Paginator):
+    """COUNT(*) butun natija bo'yicha emas, ko'pi bilan count_limit qatorgacha (SELECT COUNT(*) FROM (... LIMIT n))"""
+    count_limit = 1000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.count_limit].count()
+
+
+class SearchResultsPagination(PageNumberPagination):
+    """Qidiruv natijalari: count - taxminiy, CappedCountPaginator.count_limit dan oshmaydi"""
+    django_paginator_class = CappedCountPaginator
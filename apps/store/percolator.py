@@ -0,0 +1,93 @@
+from django.db import transaction
+
+from .models import Ad, MySearch, SavedSearchKey, SavedSearchMatch
+from .search import get_search_tokens
+
+ANY = 0
+TOKEN_KEY_LENGTH = 3
+# PositiveIntegerField < 2**31, demak bit_length() + 1 <= 32
+MAX_PRICE_BUCKET = 32
+
+
+def price_bucket(price):
+    """log2 narx bucket i: 0 -> 1, 1 -> 2, 2..3 -> 3, 4..7 -> 4, ... (0 - narx cheklovi yo'q)"""
+    return price.bit_length() + 1
+
+
+def search_key_values(category_id, region_id, price_min, price_max, search_query):
+    """Saved search uchun index kalitlari: [(category_key, region_key, price_bucket, token_key), ...]"""
+    tokens = get_search_tokens(search_query)
+    # Eng uzun so'z odatda eng kam uchraydigani - shu so'z boshi bilan kalitlanadi
+    token_key = max(tokens, key=len)[:TOKEN_KEY_LENGTH] if tokens else ''
+    if price_min is None and price_max is None:
+        buckets = [ANY]
+    else:
+        low = price_bucket(price_min or 0)
+        high = price_bucket(price_max) if price_max is not None else MAX_PRICE_BUCKET
+        buckets = range(low, high + 1)
+    return [(category_id or ANY, region_id or ANY, bucket, token_key) for bucket in buckets]
+
+
+@transaction.atomic
+def index_search(search):
+    """Saved search kalitlarini qayta yozish (yaratilganda va o'zgartirilganda)"""
+    search.keys.all().delete()
+    SavedSearchKey.objects.bulk_create([
+        SavedSearchKey(search=search, category_key=category_key, region_key=region_key,
+                       price_bucket=bucket, token_key=token_key)
+        for category_key, region_key, bucket, token_key in search_key_values(
+            search.category_id, search.region_id, search.price_min, search.price_max, search.search_query
+        )
+    ])
+
+
+def get_ad_tokens(ad):
+    return set(get_search_tokens(' '.join(
+        filter(None, [ad.name_uz, ad.name_ru, ad.description_uz, ad.description_ru])
+    )))
+
+
+def search_matches(search, ad, ad_tokens):
+    """Index topgan nomzodni aniq tekshirish: narx chegaralari va so'zlar (AdSearchFilter kabi prefix bo'yicha)"""
+    if search.price_min is not None and (ad.price is None or ad.price < search.price_min):
+        return False
+    if search.price_max is not None and (ad.price is None or ad.price > search.price_max):
+        return False
+    return all(
+        any(ad_token.startswith(token) for ad_token in ad_tokens)
+        for token in get_search_tokens(search.search_query)
+    )
+
+
+def find_matching_searches(ad):
+    """E'longa mos saved search lar - saved search lar soniga emas, mos kalitlar soniga bog'liq"""
+    # Ota kategoriya bo'yicha saqlangan qidiruv ichki kategoriyadagi e'lonlarga ham mos keladi
+    ancestor_ids = [int(pk) for pk in ad.category.path.strip('/').split('/') if pk] or [ad.category_id]
+    category_keys = [ANY] + ancestor_ids
+    region_keys = [ANY] + ([ad.region_id] if ad.region_id else [])
+    buckets = [ANY] + ([price_bucket(ad.price)] if ad.price is not None else [])
+    ad_tokens = get_ad_tokens(ad)
+    token_keys = [''] + sorted({token[:n] for token in ad_tokens for n in range(1, TOKEN_KEY_LENGTH + 1)})
+
+    candidates = MySearch.objects.filter(id__in=SavedSearchKey.objects.filter(
+        category_key__in=category_keys, region_key__in=region_keys,
+        price_bucket__in=buckets, token_key__in=token_keys,
+    ).values('search_id')).exclude(user_id=ad.seller_id)
+    return [search for search in candidates if search_matches(search, ad, ad_tokens)]
+
+
+@transaction.atomic
+def percolate_ad(ad_id):
+    """Faol bo'lgan e'lonni saved search larga moslab, natijani SavedSearchMatch ga yozish"""
+    ad = Ad.objects.public().select_related('category').filter(pk=ad_id).first()
+    if ad is None:
+        return []
+    searches = find_matching_searches(ad)
+    SavedSearchMatch.objects.bulk_create(
+        [SavedSearchMatch(search=search, ad=ad) for search in searches], ignore_conflicts=True
+    )
+    return searches
+
+
+def schedule_percolation(ad_id):
+    transaction.on_commit(lambda: percolate_ad(ad_id))
@@ -0,0 +1,201 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, CharField, F, FloatField, IntegerField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, NullIf
+from rest_framework import filters
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# PostgreSQL: nom (A) va tavsif (B) ustunlaridan generated tsvector + GIN index
+POSTGRES_INSTALL_SQL = [
+    """
+    ALTER TABLE ads ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name_uz, '') || ' ' || coalesce(name_ru, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description_uz, '') || ' ' || coalesce(description_ru, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ads_search_vector_gin ON ads USING gin (search_vector)",
+]
+
+POSTGRES_UNINSTALL_SQL = [
+    "DROP INDEX IF EXISTS ads_search_vector_gin",
+    "ALTER TABLE ads DROP COLUMN IF EXISTS search_vector",
+]
+
+# SQLite: ads jadvaliga bog'langan (external content) FTS5 jadval va triggerlar
+SQLITE_FTS_TABLE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS ads_fts USING fts5(
+        name_uz, name_ru, description_uz, description_ru,
+        content='ads', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+SQLITE_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS ads_fts_insert AFTER INSERT ON ads BEGIN
+        INSERT INTO ads_fts (rowid, name_uz, name_ru, description_uz, description_ru)
+        VALUES (new.id, new.name_uz, new.name_ru, new.description_uz, new.description_ru);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS ads_fts_delete AFTER DELETE ON ads BEGIN
+        INSERT INTO ads_fts (ads_fts, rowid, name_uz, name_ru, description_uz, description_ru)
+        VALUES ('delete', old.id, old.name_uz, old.name_ru, old.description_uz, old.description_ru);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS ads_fts_update AFTER UPDATE OF name_uz, name_ru, description_uz, description_ru
+    ON ads BEGIN
+        INSERT INTO ads_fts (ads_fts, rowid, name_uz, name_ru, description_uz, description_ru)
+        VALUES ('delete', old.id, old.name_uz, old.name_ru, old.description_uz, old.description_ru);
+        INSERT INTO ads_fts (rowid, name_uz, name_ru, description_uz, description_ru)
+        VALUES (new.id, new.name_uz, new.name_ru, new.description_uz, new.description_ru);
+    END
+    """,
+]
+
+SQLITE_UNINSTALL_SQL = [
+    "DROP TRIGGER IF EXISTS ads_fts_insert",
+    "DROP TRIGGER IF EXISTS ads_fts_delete",
+    "DROP TRIGGER IF EXISTS ads_fts_update",
+    "DROP TABLE IF EXISTS ads_fts",
+]
+
+
+def install_search_backend(connection, rebuild=True):
+    """Bazaga mos full-text search strukturasini yaratish"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRES_INSTALL_SQL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(SQLITE_FTS_TABLE_SQL)
+            for sql in SQLITE_TRIGGERS_SQL:
+                cursor.execute(sql)
+            if rebuild:
+                cursor.execute("INSERT INTO ads_fts (ads_fts) VALUES ('rebuild')")
+
+
+def uninstall_search_backend(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRES_UNINSTALL_SQL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            for sql in SQLITE_UNINSTALL_SQL:
+                cursor.execute(sql)
+
+
+def ensure_search_triggers(sender, using='default', **kwargs):
+    """post_migrate: SQLite jadvalni qayta yaratganda (table remake) o'chgan triggerlarni tiklash"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ads_fts'")
+        if cursor.fetchone() is None:
+            return
+    install_search_backend(connection, rebuild=False)
+
+
+def get_search_tokens(query):
+    return TOKEN_RE.findall((query or '').lower())
+
+
+def search_ads(queryset, tokens):
+    """Full-text filter va search_rank annotatsiyasi: PostgreSQL da tsvector + GIN, SQLite da FTS5
+
+    Boshqa bazalarda None - chaqiruvchi icontains ga qaytadi.
+    """
+    vendor = connections[queryset.db].vendor
+    table = queryset.model._meta.db_table
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        return queryset.filter(
+            RawSQL(f"{table}.search_vector @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({table}.search_vector, to_tsquery('simple', %s))", [tsquery], output_field=FloatField()
+            )
+        )
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return queryset.filter(
+            id__in=RawSQL('SELECT rowid FROM ads_fts WHERE ads_fts MATCH %s', [match])
+        ).annotate(
+            # bm25: kichik qiymat = yaxshiroq moslik; nom ustunlari tavsifdan og'irroq
+            search_rank=RawSQL(
+                f'SELECT -bm25(ads_fts, 10.0, 10.0, 1.0, 1.0) FROM ads_fts '
+                f'WHERE ads_fts MATCH %s AND ads_fts.rowid = "{table}"."id"',
+                [match], output_field=FloatField()
+            )
+        )
+    return None
+
+
+class AdSearchFilter(filters.SearchFilter):
+    """search param uchun full-text search (search_ads)"""
+
+    def filter_queryset(self, request, queryset, view):
+        tokens = get_search_tokens(request.query_params.get(self.search_param, ''))
+        if not tokens:
+            return queryset
+        result = search_ads(queryset, tokens)
+        if result is not None:
+            return result
+        return super().filter_queryset(request, queryset, view)
+
+
+class AdOrderingFilter(filters.OrderingFilter):
+    """ordering berilmagan qidiruvda natijalarni relevance bo'yicha tartiblash"""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank'] + list(self.get_default_ordering(view) or [])
+        return super().get_ordering(request, queryset, view)
+
+
+def search_catalog(query):
+    """Kategoriya va e'lonlarni bitta UNION ALL so'rovda saralash: avval mos kategoriyalar, keyin e'lonlar relevance bo'yicha
+
+    Qatorlar: id, result_name, result_type, result_icon (kategoriya icon i JOIN orqali), priority, score.
+    Natija lazy queryset - sahifalash LIMIT/OFFSET bilan bazada bajariladi.
+    """
+    from .models import Ad, Category
+
+    tokens = get_search_tokens(query)
+    if not tokens:
+        return Category.objects.none()
+
+    category_filter = Q(is_active=True)
+    for token in tokens:
+        category_filter &= Q(name__icontains=token)
+    categories = Category.objects.filter(category_filter).annotate(
+        result_name=F('name'),
+        result_type=Value('category', output_field=CharField()),
+        result_icon=F('icon'),
+        priority=Value(0, output_field=IntegerField()),
+        score=Cast(F('product_count'), FloatField()),
+    )
+
+    ads = Ad.objects.public()
+    ranked = search_ads(ads, tokens)
+    if ranked is None:
+        name_filter = Q()
+        for token in tokens:
+            name_filter &= Q(name_uz__icontains=token) | Q(name_ru__icontains=token)
+        ranked = ads.filter(name_filter).annotate(search_rank=Value(0.0, output_field=FloatField()))
+    products = ranked.annotate(
+        result_name=Coalesce(NullIf(F('name_uz'), Value('')), F('name_ru'), output_field=CharField()),
+        result_type=Value('product', output_field=CharField()),
+        result_icon=F('category__icon'),
+        priority=Value(1, output_field=IntegerField()),
+        score=F('search_rank'),
+    )
+
+    columns = ['id', 'result_name', 'result_type', 'result_icon', 'priority', 'score']
+    return categories.order_by().values(*columns).union(products.order_by().values(*columns), all=True).order_by(
+        'priority', '-score', 'id'
+    )
@@ -0,0 +1,160 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+
+from apps.common.stamps import bump_stamp
+from .caches import POPULAR_SEARCH_STAMP
+from .counters import BufferedCounter
+from .models import Category, PopularSearchTerm, SearchQueryLog, SearchTermSketch
+from .suggestions import normalize_phrase
+
+SEARCH_PHRASE_MIN_LENGTH = 2
+SKETCH_CAPACITY = 100
+POPULAR_TERMS_PER_CATEGORY = 10
+MINE_CHUNK_SIZE = 5000
+
+
+class SearchLogBuffer(BufferedCounter):
+    """(category_id, phrase) -> hits; flush da bitta bulk INSERT (qatorlar worker ichida birlashtiriladi)"""
+
+    def __init__(self, interval_setting):
+        super().__init__('store.SearchQueryLog', 'hits', interval_setting)
+
+    def write(self, pending):
+        self.model.objects.bulk_create([
+            self.model(category_id=category_id, phrase=phrase, hits=hits)
+            for (category_id, phrase), hits in pending.items()
+        ])
+
+
+search_log = SearchLogBuffer('SEARCH_LOG_FLUSH_INTERVAL')
+
+
+def record_search(query, category_id=None):
+    """Qidiruvni SEARCH_LOG_SAMPLE_RATE ehtimol bilan buferga yozish; hits sample ulushiga ko'paytiriladi"""
+    rate = settings.SEARCH_LOG_SAMPLE_RATE
+    if rate <= 0 or random.random() >= rate:
+        return
+    phrase = normalize_phrase(query)[:255]
+    if len(phrase) < SEARCH_PHRASE_MIN_LENGTH:
+        return
+    search_log.increment((category_id, phrase), max(1, round(1 / rate)))
+
+
+class SearchLogMixin:
+    """Qidiruv parametrini search log ga yozish uchun mixin (cache dan javob berilganda ham ishlaydi)"""
+    search_log_param = 'q'
+
+    def get_search_log_category(self):
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        query = request.query_params.get(self.search_log_param)
+        if query:
+            record_search(query, self.get_search_log_category())
+
+
+class SpaceSaving:
+    """Space-Saving top-K sketch: ko'pi bilan capacity ta hisoblagich, count - error <= haqiqiy son <= count"""
+
+    def __init__(self, capacity, counters=None):
+        self.capacity = capacity
+        self.counters = dict(counters or {})
+
+    def add(self, item, weight=1):
+        if item in self.counters:
+            count, error = self.counters[item]
+            self.counters[item] = (count + weight, error)
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = (weight, 0)
+        else:
+            # Eng kichik hisoblagich yangi elementga beriladi, uning qiymati xato chegarasi bo'ladi
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            minimum = self.counters.pop(victim)[0]
+            self.counters[item] = (minimum + weight, minimum)
+
+    def top(self, k):
+        return sorted(self.counters.items(), key=lambda item: (-item[1][0], item[0]))[:k]
+
+
+def _load_sketches(category_ids, capacity):
+    sketches = {category_id: SpaceSaving(capacity) for category_id in category_ids}
+    queryset = SearchTermSketch.objects.filter(category_id__in=[pk for pk in category_ids if pk is not None])
+    if None in category_ids:
+        queryset |= SearchTermSketch.objects.filter(category__isnull=True)
+    for category_id, phrase, count, error in queryset.values_list('category_id', 'phrase', 'count', 'error'):
+        sketches[category_id].counters[phrase] = (count, error)
+    return sketches
+
+
+def _save_sketches(sketches):
+    # category_id=None -> IS NULL (umumiy sketch)
+    for category_id in sketches:
+        SearchTermSketch.objects.filter(category_id=category_id).delete()
+    SearchTermSketch.objects.bulk_create([
+        SearchTermSketch(category_id=category_id, phrase=phrase, count=count, error=error)
+        for category_id, sketch in sketches.items()
+        for phrase, (count, error) in sketch.counters.items()
+    ])
+
+
+def _rebuild_popular_terms(sketches, top_k):
+    """Sketch top-K si bo'yicha PopularSearchTerm (phrase != '') qatorlarini yangilash; admin icon lari saqlanadi"""
+    for category_id, sketch in sketches.items():
+        mined = PopularSearchTerm.objects.exclude(phrase='').filter(category_id=category_id)
+        existing = {term.phrase: term for term in mined}
+        top = {phrase: count for phrase, (count, _) in sketch.top(top_k)}
+
+        mined.exclude(phrase__in=list(top)).delete()
+        changed = []
+        for phrase, count in top.items():
+            term = existing.get(phrase)
+            if term is not None and term.search_count != count:
+                term.search_count = count
+                changed.append(term)
+        PopularSearchTerm.objects.bulk_update(changed, ['search_count'])
+        PopularSearchTerm.objects.bulk_create([
+            PopularSearchTerm(name=phrase, phrase=phrase, category_id=category_id, search_count=count)
+            for phrase, count in top.items() if phrase not in existing
+        ])
+
+
+def mine_search_log(chunk_size=MINE_CHUNK_SIZE, capacity=SKETCH_CAPACITY, top_k=POPULAR_TERMS_PER_CATEGORY):
+    """Yangi log qatorlarini sketch larga qo'shib, o'zgargan kategoriyalar PopularSearchTerm larini qayta qurish
+
+    Faqat oxirgi ishga tushishdan keyin yozilgan qatorlar o'qiladi (ular o'chiriladi) - butun tarix skan qilinmaydi.
+    """
+    last_id = SearchQueryLog.objects.aggregate(last=Max('id'))['last']
+    if last_id is None:
+        return 0
+    first_id = SearchQueryLog.objects.order_by('id').values_list('id', flat=True).first()
+
+    processed = 0
+    for start in range(first_id - 1, last_id, chunk_size):
+        end = min(start + chunk_size, last_id)
+        # Yig'ish va o'chirish bitta tranzaksiyada, aynan qulflangan qatorlar bo'yicha - orada to'xtasa
+        # qatorlar keyingi ishga tushishda ikki marta sanalmaydi
+        with transaction.atomic():
+            ids = list(SearchQueryLog.objects.select_for_update().filter(id__gt=start, id__lte=end).values_list(
+                'id', flat=True
+            ))
+            if not ids:
+                continue
+            chunk = SearchQueryLog.objects.filter(id__in=ids)
+            rows = list(chunk.values('category_id', 'phrase').annotate(total=Sum('hits')).order_by())
+            category_ids = set(Category.objects.filter(
+                id__in={row['category_id'] for row in rows if row['category_id']}
+            ).values_list('id', flat=True))
+            rows = [row for row in rows if row['category_id'] is None or row['category_id'] in category_ids]
+            sketches = _load_sketches({row['category_id'] for row in rows}, capacity)
+            for row in rows:
+                sketches[row['category_id']].add(row['phrase'], row['total'])
+            _save_sketches(sketches)
+            _rebuild_popular_terms(sketches, top_k)
+            chunk.delete()
+            bump_stamp(POPULAR_SEARCH_STAMP)
+        processed += len(rows)
+    return processed
@@ -1,31 +1,42 @@
+from django.db import transaction
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .counters import view_counter
+from .likes import LIKED_IDS_MAX, SYNC_OPERATIONS_MAX, LikedFieldMixin, LikedListSerializer
 from .models import Category, Ad, AdPhoto, FavouriteProduct, MySearch, PopularSearchTerm
 from drf_spectacular.utils import extend_schema_field
 
+from apps.common.images import get_field_storage
+from apps.common.serializers import ImageVariantsField
+
 
 User = get_user_model()
 
 
+def format_product_count(count):
+    return f"{count:,}" if count > 999 else str(count)
+
+
 class CategoryListSerializer(serializers.ModelSerializer):
     product_count = serializers.SerializerMethodField()
+    icon_variants = ImageVariantsField(source='icon')
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'icon', 'product_count']
+        fields = ['id', 'name', 'icon', 'icon_variants', 'product_count']
 
     @extend_schema_field(serializers.CharField)
     def get_product_count(self, obj) -> str:
-        count = obj.product_count
-        return f"{count:,}" if count > 999 else str(count)
+        return format_product_count(obj.product_count)
 
 
 class CategoryWithChildrenSerializer(serializers.ModelSerializer):
     children = serializers.SerializerMethodField()
+    icon_variants = ImageVariantsField(source='icon')
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'icon', 'children']
+        fields = ['id', 'name', 'icon', 'icon_variants', 'children']
 
     @extend_schema_field(CategoryListSerializer(many=True))
     def get_children(self, obj):
@@ -34,9 +45,11 @@ class CategoryWithChildrenSerializer(serializers.ModelSerializer):
 
 
 class SellerSerializer(serializers.ModelSerializer):
+    profile_photo_variants = ImageVariantsField(source='profile_photo')
+
     class Meta:
         model = User
-        fields = ['id', 'full_name', 'phone_number', 'profile_photo']
+        fields = ['id', 'full_name', 'phone_number', 'profile_photo', 'profile_photo_variants']
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -45,9 +58,10 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 
-class AdListSerializer(serializers.ModelSerializer):
+class AdListSerializer(LikedFieldMixin, serializers.ModelSerializer):
     seller = SellerSerializer(read_only=True)
     photo = serializers.SerializerMethodField()
+    photo_variants = serializers.SerializerMethodField()
     address = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     updated_time = serializers.DateTimeField(source='updated_at', read_only=True)
@@ -55,8 +69,9 @@ class AdListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ad
-        fields = ['id', 'name', 'slug', 'price', 'photo', 'published_at', 'address', 'seller', 'is_liked',
-                  'updated_time']
+        fields = ['id', 'name', 'slug', 'price', 'photo', 'photo_variants', 'published_at', 'address', 'seller',
+                  'is_liked', 'updated_time']
+        list_serializer_class = LikedListSerializer
 
     @extend_schema_field(serializers.CharField)
     def get_name(self, obj) -> str:
@@ -66,33 +81,32 @@ class AdListSerializer(serializers.ModelSerializer):
     def get_photo(self, obj) -> str:
         return obj.main_photo
 
+    @extend_schema_field(ImageVariantsField)
+    def get_photo_variants(self, obj):
+        return obj.main_photo_variants
+
     @extend_schema_field(serializers.CharField)
     def get_address(self, obj) -> str:
-        address = obj.seller.addresses.filter(is_default=True).first()
-        return address.name if address else ""
-
-    @extend_schema_field(serializers.BooleanField)
-    def get_is_liked(self, obj) -> bool:
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.favourites.filter(user=request.user).exists()
-        return False
+        return obj.seller_address
 
 
-class AdDetailSerializer(serializers.ModelSerializer):
+class AdDetailSerializer(LikedFieldMixin, serializers.ModelSerializer):
     seller = SellerSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
+    breadcrumbs = serializers.SerializerMethodField()
     photos = serializers.SerializerMethodField()
+    photo_variants = serializers.SerializerMethodField()
     address = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
+    view_count = serializers.SerializerMethodField()
     updated_time = serializers.DateTimeField(source='updated_at', read_only=True)
     name = serializers.SerializerMethodField()
     description = serializers.SerializerMethodField()
 
     class Meta:
         model = Ad
-        fields = ['id', 'name', 'slug', 'description', 'price', 'photos', 'published_at', 'address', 'seller',
-                  'category', 'is_liked', 'view_count', 'updated_time']
+        fields = ['id', 'name', 'slug', 'description', 'price', 'photos', 'photo_variants', 'published_at', 'address',
+                  'seller', 'category', 'breadcrumbs', 'is_liked', 'view_count', 'updated_time']
 
     @extend_schema_field(serializers.CharField)
     def get_name(self, obj) -> str:
@@ -102,21 +116,26 @@ class AdDetailSerializer(serializers.ModelSerializer):
     def get_description(self, obj) -> str:
         return obj.description_uz or obj.description_ru or ""
 
+    @extend_schema_field(CategorySerializer(many=True))
+    def get_breadcrumbs(self, obj):
+        return CategorySerializer(obj.category.breadcrumbs, many=True).data
+
     @extend_schema_field(serializers.ListField(child=serializers.URLField()))
     def get_photos(self, obj) -> list:
         return [photo.image.url for photo in obj.photos.all()]
 
+    @extend_schema_field(serializers.ListField(child=ImageVariantsField()))
+    def get_photo_variants(self, obj) -> list:
+        return [photo.variant_urls for photo in obj.photos.all()]
+
     @extend_schema_field(serializers.CharField)
     def get_address(self, obj) -> str:
-        address = obj.seller.addresses.filter(is_default=True).first()
-        return address.name if address else ""
+        return obj.seller_address
 
-    @extend_schema_field(serializers.BooleanField)
-    def get_is_liked(self, obj) -> bool:
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.favourites.filter(user=request.user).exists()
-        return False
+    @extend_schema_field(serializers.IntegerField)
+    def get_view_count(self, obj) -> int:
+        # Bazadagi qiymat + hali yozilmagan (buffer dagi) ko'rishlar
+        return obj.view_count + view_counter.pending(obj.id)
 
 
 class AdCreateSerializer(serializers.ModelSerializer):
@@ -126,24 +145,24 @@ class AdCreateSerializer(serializers.ModelSerializer):
         model = Ad
         fields = ['name_uz', 'name_ru', 'category', 'description_uz', 'description_ru', 'price', 'photos']
 
+    @transaction.atomic
     def create(self, validated_data):
         photos_data = validated_data.pop('photos', [])
         validated_data['seller'] = self.context['request'].user
         ad = super().create(validated_data)
 
-        # Create photo objects
-        for i, photo_url in enumerate(photos_data):
-            AdPhoto.objects.create(
-                ad=ad,
-                image=photo_url,
-                is_main=(i == 0)
-            )
+        # Yangi e'lon: rasmlar bitta INSERT, birinchisi main
+        AdPhoto.objects.bulk_create([
+            AdPhoto(ad=ad, image=photo_url, is_main=(i == 0))
+            for i, photo_url in enumerate(photos_data)
+        ])
 
         return ad
 
 
 class MyAdSerializer(serializers.ModelSerializer):
     photo = serializers.SerializerMethodField()
+    photo_variants = serializers.SerializerMethodField()
     address = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     updated_time = serializers.DateTimeField(source='updated_at', read_only=True)
@@ -151,8 +170,8 @@ class MyAdSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ad
-        fields = ['id', 'name', 'slug', 'price', 'photo', 'published_at', 'address', 'status', 'view_count', 'is_liked',
-                  'updated_time']
+        fields = ['id', 'name', 'slug', 'price', 'photo', 'photo_variants', 'published_at', 'address', 'status',
+                  'view_count', 'is_liked', 'updated_time']
 
     def get_name(self, obj):
         return obj.name_uz or obj.name_ru or f'Ad #{obj.id}'
@@ -160,9 +179,11 @@ class MyAdSerializer(serializers.ModelSerializer):
     def get_photo(self, obj):
         return obj.main_photo
 
+    def get_photo_variants(self, obj):
+        return obj.main_photo_variants
+
     def get_address(self, obj):
-        address = obj.seller.addresses.filter(is_default=True).first()
-        return address.name if address else ""
+        return obj.seller_address
 
     def get_is_liked(self, obj):
         return False  # For my ads, this is always false
@@ -198,6 +219,7 @@ class AdUpdateSerializer(serializers.ModelSerializer):
         model = Ad
         fields = ['name', 'category', 'description', 'price', 'new_photos']
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         new_photos = validated_data.pop('new_photos', [])
         name = validated_data.pop('name', None)
@@ -219,13 +241,7 @@ class AdUpdateSerializer(serializers.ModelSerializer):
         instance.save()
 
         # Add new photos if provided
-        if new_photos:
-            for photo_url in new_photos:
-                AdPhoto.objects.create(
-                    ad=instance,
-                    image=photo_url,
-                    is_main=False
-                )
+        AdPhoto.add_photos(instance, new_photos)
 
         return instance
 
@@ -253,6 +269,7 @@ class MyFavouriteProductSerializer(serializers.ModelSerializer):
     slug = serializers.CharField()
     description = serializers.SerializerMethodField()
     photo = serializers.SerializerMethodField()
+    photo_variants = serializers.SerializerMethodField()
     address = serializers.SerializerMethodField()
     seller = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
@@ -261,7 +278,7 @@ class MyFavouriteProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ad
         fields = ['id', 'name', 'slug', 'description', 'price', 'published_at', 'address', 'seller', 'photo',
-                  'is_liked', 'updated_time']
+                  'photo_variants', 'is_liked', 'updated_time']
 
     def get_name(self, obj):
         return obj.name_uz or obj.name_ru or f'Ad #{obj.id}'
@@ -272,9 +289,11 @@ class MyFavouriteProductSerializer(serializers.ModelSerializer):
     def get_photo(self, obj):
         return obj.main_photo
 
+    def get_photo_variants(self, obj):
+        return obj.main_photo_variants
+
     def get_address(self, obj):
-        address = obj.seller.addresses.filter(is_default=True).first()
-        return address.name if address else ""
+        return obj.seller_address
 
     def get_seller(self, obj):
         return obj.seller.full_name
@@ -321,22 +340,78 @@ class ProductImageCreateSerializer(serializers.ModelSerializer):
 
 
 class SearchResultSerializer(serializers.Serializer):
+    """search.search_catalog qatorlari uchun"""
     id = serializers.IntegerField()
-    name = serializers.CharField()
-    type = serializers.CharField()
-    icon = serializers.URLField(required=False)
+    name = serializers.CharField(source='result_name')
+    type = serializers.CharField(source='result_type')
+    icon = serializers.SerializerMethodField()
+
+    def get_icon(self, obj) -> str:
+        # result_icon - har ikki tomonda ham Category.icon
+        return get_field_storage(Category, 'icon').url(obj['result_icon']) if obj['result_icon'] else None
+
+
+class AdImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+
+    def validate(self, attrs):
+        if 'format' not in attrs:
+            extension = attrs['file'].name.rsplit('.', 1)[-1].lower()
+            if extension not in ('csv', 'jsonl'):
+                raise serializers.ValidationError({'format': "Fayl formatini aniqlab bo'lmadi (csv yoki jsonl)"})
+            attrs['format'] = extension
+        return attrs
+
+
+class AdImportResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    error_count = serializers.IntegerField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
+class LikedIdsQuerySerializer(serializers.Serializer):
+    ids = serializers.CharField(help_text="Vergul bilan ajratilgan e'lon id lari")
+
+    def validate_ids(self, value):
+        try:
+            ids = [int(item) for item in value.split(',') if item.strip()]
+        except ValueError:
+            raise serializers.ValidationError("id lar butun son bo'lishi kerak")
+        if len(ids) > LIKED_IDS_MAX:
+            raise serializers.ValidationError(f"Ko'pi bilan {LIKED_IDS_MAX} ta id yuborish mumkin")
+        return ids
+
+
+class LikedIdsSerializer(serializers.Serializer):
+    liked = serializers.ListField(child=serializers.IntegerField())
+
+
+class FavouriteSyncOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['add', 'remove'])
+    product = serializers.IntegerField(min_value=1)
+
+
+class FavouriteSyncSerializer(serializers.Serializer):
+    """Offline client navbati: operatsiyalar yuborilgan tartibda, e'lon bo'yicha oxirgisi hisobga olinadi"""
+    device_id = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    operations = FavouriteSyncOperationSerializer(many=True, allow_empty=True, max_length=SYNC_OPERATIONS_MAX)
 
 
 class SearchCompleteSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     name = serializers.CharField()
+    type = serializers.CharField()
     icon = serializers.URLField(required=False)
 
 
 class PopularSearchTermSerializer(serializers.ModelSerializer):
+    icon_variants = ImageVariantsField(source='icon')
+    trending = serializers.FloatField(read_only=True, default=0)
+
     class Meta:
         model = PopularSearchTerm
-        fields = ['id', 'name', 'icon', 'search_count']
+        fields = ['id', 'name', 'icon', 'icon_variants', 'search_count', 'trending']
 
 
 class PopularSearchIncreaseSerializer(serializers.ModelSerializer):
@@ -0,0 +1,156 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+
+from apps.accounts.models import Address, User
+from apps.common.stamps import bump_stamp
+from .caches import ADS_STAMP
+from .counters import update_category_counts, move_category_counts
+from .likes import merge_device_favourites
+from apps.common.images import variants_generated
+from .models import Ad, Category, MySearch
+from .percolator import index_search, schedule_percolation
+from .suggestions import update_ad_suggestions, update_category_suggestion, delete_category_suggestion
+
+
+def remember_ad_state(sender, instance, raw=False, **kwargs):
+    """Saqlashdan oldingi holat - index va sonlarni faqat farq bo'yicha yangilash uchun"""
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = Ad.objects.filter(pk=instance.pk).values(*Ad.TRACKED_FIELDS).first()
+
+
+def ad_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous, current = getattr(instance, '_previous_state', None), instance.get_tracked_state()
+    update_ad_suggestions(instance.pk, previous, current)
+    update_category_counts(previous, current)
+    if Ad.is_listed_state(current) and not Ad.is_listed_state(previous):
+        schedule_percolation(instance.pk)
+    instance._previous_state = None
+
+
+def ad_deleted(sender, instance, **kwargs):
+    previous = instance.get_tracked_state()
+    update_ad_suggestions(instance.pk, previous, None)
+    update_category_counts(previous, None)
+
+
+def remember_category_parent(sender, instance, raw=False, **kwargs):
+    # Son bazadan o'qiladi - eski yuklangan instance dagi product_count eskirgan bo'lishi mumkin
+    instance._previous_parent_id, instance._stored_product_count = None, 0
+    if instance.pk and not raw:
+        instance._previous_parent_id, instance._stored_product_count = Category.objects.filter(
+            pk=instance.pk
+        ).values_list('parent_id', 'product_count').first() or (None, 0)
+
+
+def category_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    update_category_suggestion(instance)
+    if not created:
+        move_category_counts(instance, instance._previous_parent_id, instance._stored_product_count)
+
+
+def category_deleting(sender, instance, **kwargs):
+    delete_category_suggestion(instance)
+
+
+ADDRESS_LOCATION_FIELDS = ('is_default', 'region_id', 'district_id')
+# Ro'yxat javoblarida ko'rinadigan sotuvchi ma'lumotlari (AdListSerializer.address va SellerSerializer)
+ADDRESS_LIST_FIELDS = ADDRESS_LOCATION_FIELDS + ('name',)
+SELLER_LIST_FIELDS = ('full_name', 'phone_number', 'profile_photo')
+
+
+def remember_address_location(sender, instance, raw=False, **kwargs):
+    instance._previous_location = None
+    if instance.pk and not raw:
+        instance._previous_location = Address.objects.filter(pk=instance.pk).values_list(
+            *ADDRESS_LIST_FIELDS
+        ).first()
+
+
+def sync_seller_ads_location(user_id):
+    Ad.sync_seller_location(user_id)
+    bump_stamp(ADS_STAMP)
+
+
+def seller_ads_changed(user_id):
+    # E'lonlari bo'lmagan foydalanuvchi o'zgarishi ad cache larini bekorga yangilamasligi kerak
+    if Ad.objects.filter(seller_id=user_id).exists():
+        bump_stamp(ADS_STAMP)
+
+
+def address_saved(sender, instance, raw=False, **kwargs):
+    # Faqat default manzil (yoki default bayrog'i) o'zgarganda: joylashuv o'zgarsa e'lonlardagi region/district
+    # yangilanadi, faqat nomi o'zgarsa cache lanagan ro'yxatlar yangilanadi
+    if raw:
+        return
+    previous = getattr(instance, '_previous_location', None)
+    current = tuple(getattr(instance, field) for field in ADDRESS_LIST_FIELDS)
+    was_default = bool(previous and previous[0])
+    if current == previous or not (instance.is_default or was_default):
+        return
+    location_fields = len(ADDRESS_LOCATION_FIELDS)
+    if previous is None or current[:location_fields] != previous[:location_fields]:
+        sync_seller_ads_location(instance.user_id)
+    else:
+        seller_ads_changed(instance.user_id)
+
+
+def address_deleted(sender, instance, **kwargs):
+    if instance.is_default:
+        sync_seller_ads_location(instance.user_id)
+
+
+def remember_seller_profile(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_profile = None
+    if update_fields is not None and not set(update_fields) & set(SELLER_LIST_FIELDS):
+        return  # masalan login dagi last_login yozuvi
+    if instance.pk and not raw:
+        instance._previous_profile = User.objects.filter(pk=instance.pk).values_list(*SELLER_LIST_FIELDS).first()
+
+
+def seller_profile_saved(sender, instance, created=False, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_profile', None)
+    if raw or created or previous is None:
+        return
+    if tuple(getattr(instance, field) for field in SELLER_LIST_FIELDS) != previous:
+        seller_ads_changed(instance.pk)
+
+
+def seller_photo_variants_generated(sender, pks, **kwargs):
+    if Ad.objects.filter(seller_id__in=pks).exists():
+        bump_stamp(ADS_STAMP)
+
+
+def search_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_search(instance)
+
+
+def merge_guest_favourites(sender, request, user, **kwargs):
+    """Login/register da yuborilgan device_id ning like lari akkauntga o'tkaziladi"""
+    data = getattr(request, 'data', None) or {}
+    device_id = data.get('device_id') if hasattr(data, 'get') else None
+    if device_id:
+        merge_device_favourites(user, device_id)
+
+
+def connect_signals():
+    pre_save.connect(remember_ad_state, sender=Ad, dispatch_uid='store_remember_ad_state')
+    post_save.connect(ad_saved, sender=Ad, dispatch_uid='store_ad_saved')
+    post_delete.connect(ad_deleted, sender=Ad, dispatch_uid='store_ad_deleted')
+    pre_save.connect(remember_category_parent, sender=Category, dispatch_uid='store_remember_category_parent')
+    post_save.connect(category_saved, sender=Category, dispatch_uid='store_category_saved')
+    pre_delete.connect(category_deleting, sender=Category, dispatch_uid='store_category_deleting')
+    pre_save.connect(remember_address_location, sender=Address, dispatch_uid='store_remember_address_location')
+    post_save.connect(address_saved, sender=Address, dispatch_uid='store_address_saved')
+    post_delete.connect(address_deleted, sender=Address, dispatch_uid='store_address_deleted')
+    pre_save.connect(remember_seller_profile, sender=User, dispatch_uid='store_remember_seller_profile')
+    post_save.connect(seller_profile_saved, sender=User, dispatch_uid='store_seller_profile_saved')
+    variants_generated.connect(seller_photo_variants_generated, sender=User,
+                               dispatch_uid='store_seller_photo_variants_generated')
+    post_save.connect(search_saved, sender=MySearch, dispatch_uid='store_search_saved')
+    user_logged_in.connect(merge_guest_favourites, dispatch_uid='store_merge_guest_favourites')
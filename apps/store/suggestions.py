@@ -0,0 +1,167 @@
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import Ad, Category, SearchSuggestion, SearchSuggestionPrefix
+from .search import get_search_tokens, search_ads
+
+PREFIX_MAX_LENGTH = 20
+PREFIX_MAX_WORDS = 8
+REPLACEMENT_CANDIDATES = 50
+
+
+def normalize_phrase(text):
+    return ' '.join(get_search_tokens(text))
+
+
+def build_prefixes(phrase):
+    """Har bir so'z boshidan boshlanuvchi edge n-gramlar: 'iphone 15' -> i, ip, ..., iphone 15, 1, 15"""
+    words = phrase.split(' ')
+    prefixes = set()
+    for i in range(min(len(words), PREFIX_MAX_WORDS)):
+        tail = ' '.join(words[i:])[:PREFIX_MAX_LENGTH]
+        prefixes.update(tail[:n] for n in range(1, len(tail) + 1) if not tail[:n].endswith(' '))
+    return prefixes
+
+
+def _prefix_rows(suggestion):
+    return [SearchSuggestionPrefix(suggestion=suggestion, prefix=prefix) for prefix in build_prefixes(suggestion.phrase)]
+
+
+def get_ad_phrases(state):
+    """Faol e'lon nomlaridan {phrase: display name}; faol bo'lmagan e'lon hech narsa bermaydi"""
+    if not Ad.is_listed_state(state):
+        return {}
+    phrases = {}
+    for field in ('name_uz', 'name_ru'):
+        phrase = normalize_phrase(state[field])
+        if phrase:
+            phrases.setdefault(phrase[:255], state[field].strip()[:255])
+    return phrases
+
+
+def find_phrase_ad_id(phrase, exclude_id=None):
+    """Nomi shu phrase ga mos boshqa faol e'lon id si (full-text index orqali nomzodlar, keyin aniq tekshiruv)"""
+    tokens = phrase.split(' ')
+    queryset = Ad.objects.public().exclude(id=exclude_id)
+    candidates = search_ads(queryset, tokens)
+    if candidates is None:
+        candidates = queryset.filter(Q(name_uz__icontains=tokens[0]) | Q(name_ru__icontains=tokens[0]))
+    for ad_id, name_uz, name_ru in candidates.values_list('id', 'name_uz', 'name_ru')[:REPLACEMENT_CANDIDATES]:
+        if phrase in (normalize_phrase(name_uz)[:255], normalize_phrase(name_ru)[:255]):
+            return ad_id
+    return None
+
+
+@transaction.atomic
+def update_ad_suggestions(ad_id, previous, current):
+    """E'lon holati o'zgarganda faqat farq qilgan phrase larning weight ini yangilash
+
+    Product taklifi o'sha phrase li faol e'lonlardan biriga (ad) ishora qiladi - autocomplete javobidagi id.
+    """
+    old_phrases = get_ad_phrases(previous)
+    new_phrases = get_ad_phrases(current)
+
+    removed = old_phrases.keys() - new_phrases.keys()
+    if removed:
+        removed_suggestions = SearchSuggestion.objects.filter(kind='product', phrase__in=removed)
+        removed_suggestions.filter(weight__gt=0).update(weight=F('weight') - 1)
+        # Faol e'loni qolmagan takliflar (prefix lari bilan) o'chiriladi
+        removed_suggestions.filter(weight=0).delete()
+        # E'lon o'chirilganda ad_id SET_NULL bilan allaqachon bo'shatilgan bo'ladi
+        for suggestion in removed_suggestions.filter(Q(ad_id=ad_id) | Q(ad__isnull=True)):
+            suggestion.ad_id = find_phrase_ad_id(suggestion.phrase, exclude_id=ad_id)
+            suggestion.save(update_fields=['ad'])
+
+    for phrase in new_phrases.keys() - old_phrases.keys():
+        suggestion, created = SearchSuggestion.objects.get_or_create(
+            kind='product', phrase=phrase,
+            defaults={'name': new_phrases[phrase], 'category_id': current['category_id']}
+        )
+        if created:
+            SearchSuggestionPrefix.objects.bulk_create(_prefix_rows(suggestion))
+        SearchSuggestion.objects.filter(id=suggestion.id).update(
+            weight=F('weight') + 1, category_id=current['category_id'], ad_id=ad_id
+        )
+
+
+@transaction.atomic
+def update_category_suggestion(category):
+    phrase = normalize_phrase(category.name)[:255]
+    suggestion = SearchSuggestion.objects.filter(kind='category', category=category).first()
+    if suggestion is None:
+        suggestion = SearchSuggestion.objects.create(
+            kind='category', phrase=phrase, name=category.name, category=category
+        )
+        SearchSuggestionPrefix.objects.bulk_create(_prefix_rows(suggestion))
+    elif suggestion.phrase != phrase or suggestion.name != category.name:
+        suggestion.phrase = phrase
+        suggestion.name = category.name
+        suggestion.save(update_fields=['phrase', 'name'])
+        suggestion.prefixes.all().delete()
+        SearchSuggestionPrefix.objects.bulk_create(_prefix_rows(suggestion))
+
+
+def delete_category_suggestion(category):
+    SearchSuggestion.objects.filter(kind='category', category=category).delete()
+
+
+@transaction.atomic
+def rebuild_suggestions(batch_size=1000):
+    """Butun indexni ads va categories jadvallaridan qayta qurish"""
+    SearchSuggestion.objects.all().delete()
+
+    suggestions = [
+        SearchSuggestion(kind='category', phrase=normalize_phrase(category.name)[:255], name=category.name,
+                         category=category)
+        for category in Category.objects.all()
+    ]
+
+    products = {}
+    active_ads = Ad.objects.filter(status='active', is_active=True).values('id', *Ad.TRACKED_FIELDS)
+    for state in active_ads.iterator(chunk_size=batch_size):
+        for phrase, name in get_ad_phrases(state).items():
+            suggestion = products.get(phrase)
+            if suggestion is None:
+                suggestion = products[phrase] = SearchSuggestion(
+                    kind='product', phrase=phrase, name=name, category_id=state['category_id'], ad_id=state['id']
+                )
+            suggestion.weight += 1
+    suggestions.extend(products.values())
+
+    for start in range(0, len(suggestions), batch_size):
+        batch = SearchSuggestion.objects.bulk_create(suggestions[start:start + batch_size])
+        prefixes = [row for suggestion in batch for row in _prefix_rows(suggestion)]
+        SearchSuggestionPrefix.objects.bulk_create(prefixes, batch_size=batch_size)
+    return len(suggestions)
+
+
+def complete(query, limit=10):
+    """Prefix index bo'yicha saralangan, takrorlanmas takliflar"""
+    phrase = normalize_phrase(query)
+    if not phrase:
+        return []
+
+    candidates = SearchSuggestion.objects.filter(
+        Q(kind='product', weight__gt=0) | Q(kind='category', category__is_active=True),
+        prefixes__prefix=phrase[:PREFIX_MAX_LENGTH],
+    ).select_related('category').order_by('kind', '-weight', 'name')  # kind: 'category' < 'product'
+    if len(phrase) > PREFIX_MAX_LENGTH:
+        candidates = candidates.filter(phrase__contains=phrase)
+
+    results = []
+    seen = set()
+    for suggestion in candidates[:limit * 2]:
+        if suggestion.phrase in seen:
+            continue
+        seen.add(suggestion.phrase)
+        category = suggestion.category
+        results.append({
+            # product: shu nomdagi faol e'lonlardan birining id si (ochish uchun)
+            'id': suggestion.category_id if suggestion.kind == 'category' else suggestion.ad_id,
+            'name': suggestion.name,
+            'type': suggestion.kind,
+            'icon': category.icon.url if category and category.icon else None,
+        })
+        if len(results) == limit:
+            break
+    return results
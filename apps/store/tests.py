@@ -1,11 +1,44 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
-from .models import Category, Ad, AdPhoto, FavouriteProduct, MySearch, PopularSearchTerm
-from apps.common.models import Region, District
+from PIL import Image
+from .models import (
+    Category, Ad, AdPhoto, FavouriteProduct, MySearch, PopularSearchTerm, SavedSearchMatch, SearchQueryLog,
+    SearchSuggestion, SearchSuggestionPrefix, SearchTermSketch,
+)
+from .caches import ADS_STAMP
+from .counters import BufferedCounter, search_counter, view_counter
+from .imports import import_ads
+from .likes import merge_device_favourites
+from .pagination import CappedCountPaginator, FavouriteKeysetPagination, KeysetPagination
+from .percolator import MAX_PRICE_BUCKET, percolate_ad, price_bucket, search_key_values
+from .search_log import SpaceSaving, mine_search_log, record_search, search_log
+from .serializers import CategoryListSerializer
+from .views import AdListView
+from apps.common.models import ChangeStamp, Region, District, Setting, StaticPage, StoredFile
+from apps.common.images import generate_variants, process_image
+from apps.common.utils import allocate_slugs, generate_slug, next_free_slug
 
 User = get_user_model()
 
@@ -80,6 +113,7 @@ class CategoryAPITest(APITestCase):
             parent=self.category,
             is_active=True
         )
+        cache.clear()
 
     def test_category_list(self):
         """Category list API testi"""
@@ -133,6 +167,7 @@ class AdAPITest(APITestCase):
 
     def test_ad_detail_public(self):
         """Public ad detail testi"""
+        self.addCleanup(view_counter.flush)
         url = reverse('store:ad-detail', kwargs={'slug': self.ad.slug})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -242,6 +277,7 @@ class SearchAPITest(APITestCase):
             price=1000000,
             status='active'
         )
+        self.addCleanup(search_log.flush)
 
     def test_search_category_product(self):
         """Category va product qidiruv testi"""
@@ -269,3 +305,1659 @@ class SearchAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data['results']), 1)
+
+
+class AdListQueryCountTest(APITestCase):
+    """Ad list query soni testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Test Category')
+        self.customer = User.objects.create_user(
+            phone_number='+998903333333',
+            password='customerpass123',
+            full_name='Test Customer'
+        )
+
+    def _create_ads(self, count):
+        for i in range(count):
+            seller = User.objects.create_user(
+                phone_number=f'+99890100{Ad.objects.count():04d}',
+                password='sellerpass123',
+                role='seller'
+            )
+            seller.addresses.create(name=f'Address {i}', is_default=True)
+            ad = Ad.objects.create(
+                seller=seller,
+                category=self.category,
+                name_uz=f'Mahsulot {i}',
+                price=1000 * (i + 1),
+                status='active'
+            )
+            AdPhoto.objects.create(ad=ad, image=f'ads/photo-{ad.id}.jpg', is_main=True)
+            FavouriteProduct.objects.create(user=self.customer, product=ad)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_ad_list_query_count_is_constant(self):
+        """Ad list sahifa hajmiga bog'liq bo'lmagan query soni testi"""
+        refresh = RefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        url = reverse('store:ad-list')
+
+        self._create_ads(2)
+        small_count, _ = self._count_queries(url)
+        self._create_ads(5)
+        large_count, response = self._count_queries(url)
+
+        self.assertEqual(small_count, large_count)
+        first = response.data['results'][0]
+        self.assertTrue(first['is_liked'])
+        self.assertTrue(first['photo'])
+        self.assertTrue(first['address'])
+
+    def test_my_favourites_query_count_is_constant(self):
+        """Sevimlilar ro'yxati query soni testi"""
+        refresh = RefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        url = reverse('store:my-favourite-list')
+
+        self._create_ads(2)
+        small_count, _ = self._count_queries(url)
+        self._create_ads(5)
+        large_count, _ = self._count_queries(url)
+
+        self.assertEqual(small_count, large_count)
+
+
+class AdKeysetPaginationTest(APITestCase):
+    """Ad feed keyset pagination testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user(
+            phone_number='+998901234567',
+            password='testpass123',
+            role='seller'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.ads = [
+            Ad.objects.create(
+                seller=self.seller,
+                category=self.category,
+                name_uz=f'Mahsulot {i}',
+                price=price,
+                status='active'
+            )
+            for i, price in enumerate([300, None, 100, 300, None, 200])
+        ]
+
+    def _walk(self, params):
+        url = reverse('store:ad-list')
+        ids = []
+        params = dict(params, cursor='')
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+            ids.extend(item['id'] for item in response.data['results'])
+            url, params = response.data['next'], None
+        return ids
+
+    @patch.object(KeysetPagination, 'page_size', 2)
+    def test_price_ordering_with_nulls_last(self):
+        """Price bo'yicha keyset pagination, NULL narxlar oxirida"""
+        ids = self._walk({'ordering': 'price'})
+        expected = sorted(self.ads, key=lambda ad: (ad.price is None, ad.price or 0, ad.id))
+        self.assertEqual(ids, [ad.id for ad in expected])
+
+        ids = self._walk({'ordering': '-price'})
+        expected = sorted(self.ads, key=lambda ad: (ad.price is None, -(ad.price or 0), -ad.id))
+        self.assertEqual(ids, [ad.id for ad in expected])
+
+    @patch.object(KeysetPagination, 'page_size', 4)
+    def test_default_published_at_ordering(self):
+        """Default -published_at ordering bo'yicha keyset pagination"""
+        ids = self._walk({})
+        expected = sorted(self.ads, key=lambda ad: (ad.published_at, ad.id), reverse=True)
+        self.assertEqual(ids, [ad.id for ad in expected])
+
+    def test_invalid_cursor(self):
+        """Noto'g'ri cursor 404 qaytarishi testi"""
+        response = self.client.get(reverse('store:ad-list'), {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+class AdViewCounterTest(APITestCase):
+    """Write-behind view counter testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        view_counter.flush()
+        self.seller = User.objects.create_user(
+            phone_number='+998901234567',
+            password='testpass123',
+            role='seller'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.ad = Ad.objects.create(
+            seller=self.seller,
+            category=self.category,
+            name_uz='Test mahsulot',
+            status='active',
+            view_count=10
+        )
+
+    def test_detail_does_not_write(self):
+        """Detail GET bazaga yozmasligi va pending deltani ko'rsatishi testi"""
+        url = reverse('store:ad-detail', kwargs={'slug': self.ad.slug})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in context.captured_queries))
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['view_count'], 12)
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.view_count, 10)
+
+    def test_flush_batches_updates(self):
+        """Flush bitta UPDATE bilan barcha deltalarni yozishi testi"""
+        other = Ad.objects.create(seller=self.seller, category=self.category, name_uz='Boshqa', status='active')
+        for ad_id in [self.ad.id, self.ad.id, other.id]:
+            view_counter.increment(ad_id)
+
+        with self.assertNumQueries(1):
+            view_counter.flush()
+
+        self.ad.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.ad.view_count, 12)
+        self.assertEqual(other.view_count, 1)
+        self.assertEqual(view_counter.pending(self.ad.id), 0)
+
+    def test_idle_flush_when_due(self):
+        """Fon thread chaqiradigan flush_if_due interval o'tgandagina yozishi testi"""
+        view_counter.increment(self.ad.id)
+        self.assertEqual(view_counter.flush_if_due(), 0)
+        with override_settings(VIEW_COUNT_FLUSH_INTERVAL=0):
+            self.assertEqual(view_counter.flush_if_due(), 1)
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.view_count, 11)
+
+    @override_settings(COUNTER_FLUSH_THREAD=True)
+    def test_flusher_thread_started_once(self):
+        """Birinchi increment da bitta daemon flush thread ishga tushishi testi"""
+        counter = BufferedCounter('store.Ad', 'view_count', 'VIEW_COUNT_FLUSH_INTERVAL')
+        with patch.object(BufferedCounter, '_run_flusher', lambda self: time.sleep(0.5)):
+            counter.increment(self.ad.id)
+            flusher = counter._flusher
+            counter.increment(self.ad.id)
+        self.assertTrue(flusher.daemon and flusher.is_alive())
+        self.assertIs(counter._flusher, flusher)
+
+
+class AdFullTextSearchTest(APITestCase):
+    """Ad full-text search testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('store:ad-list')
+        self.seller = User.objects.create_user(
+            phone_number='+998901234567',
+            password='testpass123',
+            role='seller'
+        )
+        self.category = Category.objects.create(name='Electronics')
+        self.description_match = Ad.objects.create(
+            seller=self.seller,
+            category=self.category,
+            name_uz='Samsung Galaxy',
+            description_uz='iPhone dan arzon telefon',
+            status='active'
+        )
+        self.name_match = Ad.objects.create(
+            seller=self.seller,
+            category=self.category,
+            name_uz='iPhone 15',
+            name_ru='Айфон 15',
+            description_ru='Новый телефон',
+            status='active'
+        )
+        self.other = Ad.objects.create(
+            seller=self.seller,
+            category=self.category,
+            name_uz='Velosiped',
+            status='active'
+        )
+        self.addCleanup(search_log.flush)
+
+    def _search(self, query, **params):
+        response = self.client.get(self.url, {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_ranks_name_matches_first(self):
+        """Nomdagi moslik tavsifdagidan yuqori turishi testi"""
+        self.assertEqual(self._search('iphone'), [self.name_match.id, self.description_match.id])
+
+    def test_search_prefix_and_russian(self):
+        """Prefix va rus tilidagi qidiruv testi"""
+        self.assertEqual(self._search('айф'), [self.name_match.id])
+        self.assertEqual(self._search('velo'), [self.other.id])
+        self.assertEqual(self._search('iphone telefon', ordering='published_at'),
+                         [self.description_match.id])
+
+    def test_search_index_follows_updates(self):
+        """Nom o'zgarganda va o'chirilganda index yangilanishi testi"""
+        self.other.name_uz = 'Skuter'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.save()
+        self.assertEqual(self._search('velo'), [])
+        self.assertEqual(self._search('skuter'), [self.other.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertEqual(self._search('skuter'), [])
+
+
+class SearchSuggestionTest(APITestCase):
+    """Autocomplete suggestion index testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('store:search-complete')
+        self.seller = User.objects.create_user(
+            phone_number='+998901234567',
+            password='testpass123',
+            role='seller'
+        )
+        self.category = Category.objects.create(name='Smartfonlar')
+        self.ads = [
+            Ad.objects.create(
+                seller=self.seller,
+                category=self.category,
+                name_uz='iPhone 15 Pro',
+                status='active'
+            )
+            for _ in range(2)
+        ]
+        Ad.objects.create(seller=self.seller, category=self.category, name_uz='iPhone 13', status='active')
+        self.addCleanup(search_log.flush)
+
+    def _complete(self, query):
+        response = self.client.get(self.url, {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['type'], item['name']) for item in response.data['results']]
+
+    def test_ranked_and_deduplicated(self):
+        """Takliflar takrorlanmasligi va weight bo'yicha saralanishi testi"""
+        self.assertEqual(self._complete('iph'), [('product', 'iPhone 15 Pro'), ('product', 'iPhone 13')])
+        self.assertEqual(self._complete('15 p'), [('product', 'iPhone 15 Pro')])
+        self.assertEqual(self._complete('smart'), [('category', 'Smartfonlar')])
+
+    def test_index_follows_ad_changes(self):
+        """E'lon o'chirilganda va deaktiv qilinganda index yangilanishi testi"""
+        self.ads[0].is_active = False
+        self.ads[0].save()
+        self.assertIn(('product', 'iPhone 15 Pro'), self._complete('iphone'))
+
+        self.ads[1].delete()
+        self.assertEqual(self._complete('iphone'), [('product', 'iPhone 13')])
+
+        self.ads[0].is_active = True
+        self.ads[0].name_uz = 'Galaxy S24'
+        self.ads[0].save()
+        self.assertEqual(self._complete('gal'), [('product', 'Galaxy S24')])
+
+    def test_product_id_is_active_ad(self):
+        """Product taklifi id si faol e'lon id si bo'lishi, e'lon chiqib ketsa boshqasiga o'tishi testi"""
+        response = self.client.get(self.url, {'q': 'iphone 15'})
+        ad_id = response.data['results'][0]['id']
+        self.assertIn(ad_id, [ad.id for ad in self.ads])
+
+        Ad.objects.get(id=ad_id).delete()
+        remaining = next(ad for ad in self.ads if ad.id != ad_id)
+        response = self.client.get(self.url, {'q': 'iphone 15'})
+        self.assertEqual(response.data['results'][0]['id'], remaining.id)
+
+    def test_unused_suggestions_deleted(self):
+        """Faol e'loni qolmagan product takliflari o'chirilishi testi"""
+        for ad in self.ads:
+            ad.status = 'inactive'
+            ad.save()
+        self.assertFalse(SearchSuggestion.objects.filter(kind='product', phrase='iphone 15 pro').exists())
+        self.assertFalse(SearchSuggestionPrefix.objects.filter(prefix='iphone 15 p').exists())
+
+    def test_rebuild_matches_incremental_index(self):
+        """rebuild_search_suggestions buyrug'i bir xil natija berishi testi"""
+        expected = self._complete('i')
+        call_command('rebuild_search_suggestions', stdout=StringIO())
+        self.assertEqual(self._complete('i'), expected)
+
+    def test_constant_query_count(self):
+        """Bitta query bilan javob berish testi"""
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'q': 'iphone'})
+
+
+class CategoryProductCountTest(APITestCase):
+    """Kategoriya product_count sonlari testlari"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            phone_number='+998901234567',
+            password='testpass123',
+            role='seller'
+        )
+        self.root = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.root)
+        self.other_root = Category.objects.create(name='Transport')
+
+    def _create_ad(self, category, **kwargs):
+        return Ad.objects.create(seller=self.seller, category=category, name_uz='Mahsulot',
+                                 **{'status': 'active', **kwargs})
+
+    def _counts(self, category):
+        category.refresh_from_db()
+        return category.own_product_count, category.product_count
+
+    def test_counts_follow_ad_lifecycle(self):
+        """Yaratish, status o'zgarishi, deaktivatsiya va o'chirishda sonlar testi"""
+        ad = self._create_ad(self.phones)
+        self._create_ad(self.phones, status='pending')
+        self.assertEqual(self._counts(self.phones), (1, 1))
+        self.assertEqual(self._counts(self.root), (0, 1))
+
+        ad.is_active = False
+        ad.save()
+        self.assertEqual(self._counts(self.root), (0, 0))
+
+        ad.is_active = True
+        ad.category = self.root
+        ad.save()
+        self.assertEqual(self._counts(self.phones), (0, 0))
+        self.assertEqual(self._counts(self.root), (1, 1))
+
+        ad.delete()
+        self.assertEqual(self._counts(self.root), (0, 0))
+
+    def test_moving_category_moves_subtree_count(self):
+        """Kategoriya ko'chirilganda subtree soni ko'chishi testi"""
+        self._create_ad(self.phones)
+        self._create_ad(self.phones)
+        phones = Category.objects.get(id=self.phones.id)
+        phones.parent = self.other_root
+        phones.save()
+        self.assertEqual(self._counts(self.root), (0, 0))
+        self.assertEqual(self._counts(self.other_root), (0, 2))
+        self.assertEqual(self._counts(self.phones), (2, 2))
+
+    def test_moving_stale_instance_uses_stored_count(self):
+        """E'lonlar qo'shilishidan oldin yuklangan instance ko'chirilganda ham bazadagi son ko'chishi testi"""
+        stale = Category.objects.get(id=self.phones.id)
+        for _ in range(3):
+            self._create_ad(self.phones)
+        stale.parent = self.other_root
+        stale.save()
+        self.assertEqual(self._counts(self.root), (0, 0))
+        self.assertEqual(self._counts(self.other_root), (0, 3))
+        self.assertEqual(self._counts(self.phones), (3, 3))
+
+    def test_reconcile_command_repairs_drift(self):
+        """reconcile_category_counts drift ni tuzatishi testi"""
+        self._create_ad(self.phones)
+        Category.objects.filter(id__in=[self.root.id, self.phones.id]).update(product_count=7, own_product_count=3)
+        call_command('reconcile_category_counts', stdout=StringIO())
+        self.assertEqual(self._counts(self.phones), (1, 1))
+        self.assertEqual(self._counts(self.root), (0, 1))
+
+    def test_category_list_single_query(self):
+        """Category list sonlar uchun qo'shimcha query qilmasligi testi"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_ad(self.phones)
+        url = reverse('store:category-list')
+        with self.assertNumQueries(3):  # change stamp (ETag), count, sahifa
+            response = self.client.get(url)
+        counts = {item['id']: item['product_count'] for item in response.data['results']}
+        self.assertEqual(counts[self.root.id], '1')
+
+
+class CategoryTreeCacheTest(APITestCase):
+    """Kategoriya daraxti cache testlari"""
+
+    def setUp(self):
+        self.url = reverse('store:categories-with-children')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.root = Category.objects.create(name='Electronics')
+            self.phones = Category.objects.create(name='Phones', parent=self.root)
+            Category.objects.create(name='Laptops', parent=self.root)
+            Category.objects.create(name='Hidden', parent=self.root, is_active=False)
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        cache.clear()
+
+    def test_tree_built_with_one_query_and_cached(self):
+        """Daraxt bitta query bilan qurilishi va keyin cache dan (faqat stamp tekshiruvi bilan) berilishi testi"""
+        with self.assertNumQueries(2):  # stamp, daraxt
+            response = self.client.get(self.url)
+        root = response.data['results'][0]
+        self.assertEqual([child['name'] for child in root['children']], ['Laptops', 'Phones'])
+
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_count_change_refreshes_tree(self):
+        """E'lon sonlari (queryset.update) o'zgarganda daraxt yangilanishi testi"""
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ad.objects.create(seller=self.seller, category=self.phones, name_uz='Telefon', status='active')
+
+        with patch('apps.common.cache.run_in_background', side_effect=lambda refresh: refresh()):
+            self.client.get(self.url)
+        phones = self.client.get(self.url).data['results'][0]['children'][1]
+        self.assertEqual(phones['product_count'], '1')
+
+    def test_stale_while_revalidate_after_change(self):
+        """O'zgarishdan keyin stale javob va fon yangilanishi testi"""
+        self.client.get(self.url)
+        self.phones.name = 'Smartphones'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phones.save()
+
+        scheduled = []
+        with patch('apps.common.cache.run_in_background', side_effect=scheduled.append):
+            response = self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertEqual(len(scheduled), 1)
+        self.assertIn('Phones', [child['name'] for child in response.data['results'][0]['children']])
+
+        scheduled[0]()
+        response = self.client.get(self.url)
+        self.assertIn('Smartphones', [child['name'] for child in response.data['results'][0]['children']])
+
+
+class CategoryPathTest(APITestCase):
+    """Kategoriya materialized path testlari"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            phone_number='+998901234567',
+            password='testpass123',
+            role='seller'
+        )
+        self.root = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.root)
+        self.smartphones = Category.objects.create(name='Smartphones', parent=self.phones)
+        self.transport = Category.objects.create(name='Transport')
+        self.ad = Ad.objects.create(seller=self.seller, category=self.smartphones, name_uz='iPhone',
+                                    status='active')
+        self.car = Ad.objects.create(seller=self.seller, category=self.transport, name_uz='Cobalt',
+                                     status='active')
+
+    def test_path_built_on_create(self):
+        """Yaratilganda path to'g'ri qurilishi testi"""
+        self.smartphones.refresh_from_db()
+        self.assertEqual(self.smartphones.path, f'/{self.root.id}/{self.phones.id}/{self.smartphones.id}/')
+        self.assertEqual(self.smartphones.ancestor_ids, [self.root.id, self.phones.id, self.smartphones.id])
+
+    def test_category_filter_includes_descendants(self):
+        """Ota kategoriya bo'yicha filter subkategoriyalardagi e'lonlarni ham qaytarishi testi"""
+        response = self.client.get(reverse('store:ad-list'), {'category_ids': str(self.root.id)})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.ad.id])
+
+    def test_move_updates_subtree_paths(self):
+        """Kategoriya ko'chirilganda subtree path lari yangilanishi testi"""
+        self.phones.parent = self.transport
+        self.phones.save()
+        self.smartphones.refresh_from_db()
+        self.assertEqual(self.smartphones.path, f'/{self.transport.id}/{self.phones.id}/{self.smartphones.id}/')
+
+        transport = Category.objects.get(id=self.transport.id)
+        transport.parent = Category.objects.get(id=self.smartphones.id)
+        with self.assertRaises(ValueError):
+            transport.save()
+
+    def test_breadcrumbs_in_ad_detail(self):
+        """Ad detail breadcrumbs testi"""
+        self.addCleanup(view_counter.flush)
+        response = self.client.get(reverse('store:ad-detail', kwargs={'slug': self.ad.slug}))
+        self.assertEqual([item['name'] for item in response.data['breadcrumbs']],
+                         ['Electronics', 'Phones', 'Smartphones'])
+
+
+class AdSellerLocationTest(APITestCase):
+    """E'londagi denormalizatsiya qilingan sotuvchi manzili testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tashkent = Region.objects.create(name='Toshkent shahar')
+        self.chilonzor = District.objects.create(region=self.tashkent, name='Chilonzor')
+        self.samarkand = Region.objects.create(name='Samarqand')
+        self.seller = User.objects.create_user(
+            phone_number='+998901234567',
+            password='testpass123',
+            role='seller'
+        )
+        self.home = self.seller.addresses.create(name='Uy', region=self.tashkent, district=self.chilonzor,
+                                                 is_default=True)
+        self.office = self.seller.addresses.create(name='Ofis', region=self.samarkand)
+        self.category = Category.objects.create(name='Test Category')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ad = Ad.objects.create(seller=self.seller, category=self.category, name_uz='Mahsulot',
+                                        status='active')
+
+    def _filter(self, **params):
+        response = self.client.get(reverse('store:ad-list'), params)
+        return [item['id'] for item in response.data['results']]
+
+    def test_location_copied_on_create(self):
+        """Yaratilganda default manzil e'longa ko'chirilishi testi"""
+        self.assertEqual((self.ad.region_id, self.ad.district_id), (self.tashkent.id, self.chilonzor.id))
+        self.assertEqual(self._filter(region_id=self.tashkent.id), [self.ad.id])
+        self.assertEqual(self._filter(district_id=self.chilonzor.id), [self.ad.id])
+
+    def test_location_follows_default_address_switch(self):
+        """Profil orqali default manzil almashtirilganda e'lonlar yangilanishi testi"""
+        refresh = RefreshToken.for_user(self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.patch(reverse('accounts:user-profile-edit'), {'address': self.office.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.ad.refresh_from_db()
+        self.assertEqual((self.ad.region_id, self.ad.district_id), (self.samarkand.id, None))
+        self.assertEqual(self._filter(region_id=self.tashkent.id), [])
+        self.assertEqual(self._filter(region_id=self.samarkand.id), [self.ad.id])
+
+    def test_non_default_address_changes_skip_ads(self):
+        """Default bo'lmagan manzil o'zgarishi e'lonlarni yangilamasligi va ad stamp ni oshirmasligi testi"""
+        version = ChangeStamp.objects.get(key=ADS_STAMP).version
+        with CaptureQueriesContext(connection) as context, self.captureOnCommitCallbacks(execute=True):
+            self.office.region = self.tashkent
+            self.office.save()
+            self.seller.addresses.create(name='Dacha', region=self.samarkand)
+            self.office.delete()
+        self.assertFalse(any('UPDATE "ads"' in query['sql'] for query in context.captured_queries))
+        self.assertEqual(ChangeStamp.objects.get(key=ADS_STAMP).version, version)
+
+        self.home.district = None
+        self.home.save()
+        self.ad.refresh_from_db()
+        self.assertEqual((self.ad.region_id, self.ad.district_id), (self.tashkent.id, None))
+
+        self.home.delete()
+        self.ad.refresh_from_db()
+        self.assertEqual((self.ad.region_id, self.ad.district_id), (None, None))
+
+    def test_region_filter_is_single_table(self):
+        """Region filter addresses jadvaliga join qilmasligi testi"""
+        with CaptureQueriesContext(connection) as context:
+            self._filter(region_id=self.tashkent.id)
+        count_sql = next(query['sql'] for query in context.captured_queries if 'COUNT(' in query['sql'])
+        self.assertNotIn('addresses', count_sql)
+
+
+class PublicAdIndexTest(TestCase):
+    """Public e'lon so'rovlari partial indexlardan foydalanishi (EXPLAIN) testlari"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(6)]
+        cls.category = categories[0]
+        Ad.objects.bulk_create([
+            Ad(seller=seller, category=categories[i % len(categories)], name_uz=f'Mahsulot {i}',
+               slug=f'mahsulot-{i}', price=i * 1000, status='active' if i % 3 else 'pending', is_top=i % 5 == 0)
+            for i in range(120)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _feed(self, keyset=True, **params):
+        """AdListView ning o'zi qaytaradigan queryset (filterlar, ordering va keyset ORDER BY bilan)"""
+        view = AdListView()
+        django_request = APIRequestFactory().get(reverse('store:ad-list'), params)
+        view.setup(django_request)
+        view.request = view.initialize_request(django_request)
+        view.format_kwarg = None
+        queryset = view.filter_queryset(view.get_queryset())
+        if keyset:
+            queryset = KeysetPagination().order_queryset(queryset, view.request, view)
+        return queryset[:KeysetPagination.page_size + 1]
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_recent_feed(self):
+        """-published_at bo'yicha feed testi (page number va keyset)"""
+        self.assertUsesIndex(self._feed(keyset=False), 'ad_public_recent_idx')
+        self.assertUsesIndex(self._feed(), 'ad_public_recent_idx')
+
+    def test_price_and_view_count_ordering(self):
+        """price (nullable, NULLS LAST) va view_count keyset ordering testi"""
+        self.assertUsesIndex(self._feed(ordering='price'), 'ad_public_price_idx')
+        price_desc_idx = 'ad_public_price_desc_idx' if connection.vendor == 'postgresql' else 'ad_public_price_idx'
+        self.assertUsesIndex(self._feed(ordering='-price'), price_desc_idx)
+        self.assertUsesIndex(self._feed(ordering='-view_count'), 'ad_public_views_idx')
+
+    def test_top_and_category_feeds(self):
+        """is_top va category bo'yicha feed testi"""
+        self.assertUsesIndex(self._feed(keyset=False, is_top='true'), 'ad_public_top_idx')
+        # category_ids subkategoriyalari bilan id ro'yxatiga aylantiriladi - category_id IN (...) bo'yicha index
+        self.assertUsesIndex(self._feed(keyset=False, category_ids=str(self.category.id)), 'ad_public_category_idx')
+        self.assertUsesIndex(self._feed(category_ids=str(self.category.id)), 'ad_public_category_idx')
+
+
+class SlugAllocatorTest(TestCase):
+    """Slug allocator testlari"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.category = Category.objects.create(name='Test Category')
+
+    def _create_ad(self, name, **kwargs):
+        return Ad.objects.create(seller=self.seller, category=self.category, name_uz=name, **kwargs)
+
+    def test_next_suffix_with_single_query(self):
+        """Keyingi suffix bitta query bilan topilishi testi"""
+        self._create_ad('iPhone 13')
+        for i in range(1, 11):
+            self._create_ad('iPhone 13 Pro', slug=f'iphone-13-{i}')
+        self._create_ad('iPhone 13 Pro Max', slug='iphone-13-pro')
+
+        with self.assertNumQueries(1):
+            slug = next_free_slug(Ad, 'iphone-13')
+        self.assertEqual(slug, 'iphone-13-11')
+        self.assertEqual(generate_slug('Samsung', Ad), 'samsung')
+
+    def test_retry_on_integrity_error(self):
+        """Parallel insert da slug band bo'lsa qayta urinish testi"""
+        self._create_ad('Velosiped')
+        with patch('apps.common.utils.next_free_slug', side_effect=['velosiped', 'velosiped-1']):
+            ad = self._create_ad('Velosiped')
+        self.assertEqual(ad.slug, 'velosiped-1')
+
+    def test_bulk_allocation(self):
+        """Ko'p e'lon uchun slug ajratish testi"""
+        self._create_ad('Stol')
+        self._create_ad('Stul', slug='stul-4')
+        slugs = allocate_slugs(Ad, ['Stol', 'Stol', 'Stul', 'Divan', 'Divan', ''], fallback='ad')
+        self.assertEqual(slugs[:5], ['stol-1', 'stol-2', 'stul-5', 'divan', 'divan-1'])
+        self.assertTrue(slugs[5].startswith('ad-'))
+
+
+class AdImportTest(APITestCase):
+    """E'lonlarni ommaviy import qilish testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tashkent = Region.objects.create(name='Toshkent shahar')
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.seller.addresses.create(name='Uy', region=self.tashkent, is_default=True)
+        self.category = Category.objects.create(name='Elektronika')
+        self.inactive = Category.objects.create(name='Arxiv', is_active=False)
+        Ad.objects.create(seller=self.seller, category=self.category, name_uz='Telefon')
+
+    def _csv(self, rows):
+        header = 'name_uz,name_ru,category,price,photos\n'
+        return header + ''.join(f'{row}\n' for row in rows)
+
+    def test_import_csv_in_batches(self):
+        """CSV import: batch lar, slug lar, rasmlar va qator xatolari testi"""
+        content = self._csv([
+            f'Telefon,,{self.category.id},100,https://example.com/1.jpg|https://example.com/2.jpg',
+            f'Telefon,,{self.category.id},200,',
+            f',,{self.category.id},300,',
+            f'Kitob,,{self.inactive.id},50,',
+            f'Noutbuk,Ноутбук,{self.category.id},abc,',
+            f'Noutbuk,Ноутбук,{self.category.id},900,',
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            result = import_ads(StringIO(content), self.seller, file_format='csv', batch_size=3)
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual([error['row'] for error in result['errors']], [4, 5, 6])
+        self.assertIn('price', result['errors'][2]['errors'])
+        self.assertLess(len(queries), 20)
+
+        imported = Ad.objects.exclude(name_uz='Telefon', slug='telefon').order_by('id')
+        self.assertEqual(list(imported.values_list('slug', flat=True)), ['telefon-1', 'telefon-2', 'noutbuk'])
+        self.assertTrue(all(ad.region_id == self.tashkent.id and ad.status == 'pending' for ad in imported))
+        photos = AdPhoto.objects.filter(ad=imported[0]).order_by('id')
+        self.assertEqual([photo.is_main for photo in photos], [True, False])
+
+    def test_import_endpoint_jsonl(self):
+        """JSONL fayl endpoint orqali import qilinishi testi"""
+        url = reverse('store:ad-import')
+        lines = [
+            {'name_uz': 'Velosiped', 'category': self.category.id, 'photos': ['https://example.com/v.jpg']},
+            {'name_uz': 'Samokat'},
+        ]
+        upload = SimpleUploadedFile(
+            'ads.jsonl', '\n'.join(json.dumps(line) for line in lines).encode() + b'\nnot json\n'
+        )
+
+        response = self.client.post(url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        refresh = RefreshToken.for_user(self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        upload.seek(0)
+        response = self.client.post(url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['error_count'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertTrue(Ad.objects.filter(slug='velosiped', photos__is_main=True).exists())
+
+    def test_import_endpoint_rejects_non_utf8(self):
+        """UTF-8 bo'lmagan (CP1251) fayl 500 emas, 400 qaytarishi testi"""
+        refresh = RefreshToken.for_user(self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        upload = SimpleUploadedFile('ads.csv', self._csv([f'Ноутбук,,{self.category.id},900,']).encode('cp1251'))
+        response = self.client.post(reverse('store:ad-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file', response.data)
+        self.assertEqual(response.data['created'], 0)
+
+    def test_import_command(self):
+        """import_ads management command testi"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(self._csv([f'Stol,,{self.category.id},10,']))
+        self.addCleanup(os.remove, handle.name)
+
+        out = StringIO()
+        call_command('import_ads', handle.name, seller=self.seller.phone_number, stdout=out)
+        self.assertIn('Imported 1 ads', out.getvalue())
+        self.assertTrue(Ad.objects.filter(slug='stol', seller=self.seller).exists())
+
+
+class AdPhotoWriteTest(APITestCase):
+    """E'lon rasmlarini atomik va batch lab yozish testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.category = Category.objects.create(name='Test Category')
+        refresh = RefreshToken.for_user(self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def _photos(self, count, prefix='photo'):
+        return [f'https://example.com/{prefix}-{i}.jpg' for i in range(count)]
+
+    def _create(self, photos):
+        return self.client.post(reverse('store:ad-create'), {
+            'name_uz': 'Telefon', 'category': self.category.id, 'price': 100, 'photos': photos,
+        }, format='json')
+
+    def test_create_query_count_is_constant(self):
+        """Rasmlar soni query lar soniga ta'sir qilmasligi testi"""
+        self._create(self._photos(1))
+        with CaptureQueriesContext(connection) as one_photo:
+            self._create(self._photos(1))
+        with CaptureQueriesContext(connection) as ten_photos:
+            response = self._create(self._photos(10))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(ten_photos), len(one_photo))
+        ad = Ad.objects.latest('id')
+        self.assertEqual(ad.photos.count(), 10)
+        self.assertEqual(ad.photos.get(is_main=True).image.name, 'https://example.com/photo-0.jpg')
+
+    def test_create_rolls_back_on_photo_failure(self):
+        """Rasm yozishda xato bo'lsa e'lon ham saqlanmasligi testi"""
+        with patch.object(AdPhoto.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._create(self._photos(3))
+        self.assertFalse(Ad.objects.exists())
+
+    def test_update_keeps_single_main_photo(self):
+        """Yangi rasmlar qo'shilganda faqat bitta main rasm qolishi testi"""
+        ad = Ad.objects.create(seller=self.seller, category=self.category, name_uz='Telefon')
+        url = reverse('store:my-ad-detail', kwargs={'pk': ad.id})
+
+        response = self.client.patch(url, {'name': 'Telefon', 'new_photos': self._photos(3, 'a')}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(ad.photos.filter(is_main=True).values_list('image', flat=True)),
+                         ['https://example.com/a-0.jpg'])
+
+        self.client.patch(url, {'name': 'Telefon', 'new_photos': self._photos(2, 'b')}, format='json')
+        self.assertEqual(ad.photos.count(), 5)
+        self.assertEqual(list(ad.photos.filter(is_main=True).values_list('image', flat=True)),
+                         ['https://example.com/a-0.jpg'])
+
+
+class SyncExecutor:
+    def submit(self, func, *args):
+        func(*args)
+
+
+@override_settings(IMAGE_VARIANT_FORMAT='WEBP')
+class ImageVariantTest(APITestCase):
+    """Rasm variantlari (thumb/card/full) pipeline testlari"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+
+    def _upload(self, name='icon.png', size=(1000, 500)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_generates_variants(self):
+        """Yuklangan rasm uchun commit dan keyin variantlar yaratilishi testi"""
+        with patch('apps.common.images.get_executor', return_value=SyncExecutor()), \
+                patch('apps.common.images._run_job', generate_variants):
+            with self.captureOnCommitCallbacks(execute=True):
+                category = Category.objects.create(name='Elektronika', icon=self._upload())
+
+        category.refresh_from_db()
+        self.assertEqual(category.icon_variants['source'], category.icon.name)
+        with default_storage.open(category.icon_variants['thumb']) as thumb:
+            image = Image.open(thumb)
+            self.assertEqual((image.format, image.size), ('WEBP', (200, 100)))
+
+        data = CategoryListSerializer(category).data
+        self.assertTrue(data['icon_variants']['card'].endswith('icons/variants/icon_card.webp'))
+
+    def test_pending_and_external_images(self):
+        """Variant tayyor bo'lmaganda original URL, tashqi URL rasm qayta ishlanmasligi testi"""
+        category = Category.objects.create(name='Transport')
+        ad = Ad.objects.create(seller=self.seller, category=category, name_uz='Mashina')
+        with patch('apps.common.images.schedule_variants') as schedule:
+            photo = AdPhoto.objects.create(ad=ad, image='https://example.com/car.jpg', is_main=True)
+            category.icon = self._upload()
+            category.save()
+
+        schedule.assert_called_once_with(Category, category.id, 'icon')
+        self.assertEqual(set(photo.variant_urls.values()), {photo.image.url})
+        self.assertEqual(CategoryListSerializer(category).data['icon_variants']['thumb'], category.icon.url)
+
+    def test_backfill_command(self):
+        """Mavjud rasmlar uchun variantlarni backfill qilish testi (pool siz, --parallel bilan ham ishlaydi)"""
+        category = Category.objects.create(name='Transport')
+        ad = Ad.objects.create(seller=self.seller, category=category, name_uz='Mashina')
+        photo = AdPhoto.objects.create(ad=ad, image=self._upload('car.png', (2000, 2000)), is_main=True)
+        self.seller.profile_photo = self._upload('avatar.png', (100, 100))
+        self.seller.save()
+
+        out = StringIO()
+        call_command('generate_image_variants', workers=1, stdout=out)
+        self.assertIn('store.AdPhoto.image: 1 images processed, 0 failed', out.getvalue())
+
+        photo.refresh_from_db()
+        self.seller.refresh_from_db()
+        self.assertEqual(set(photo.image_variants), {'source', 'thumb', 'card', 'full'})
+        self.assertTrue(self.seller.profile_photo_variants['full'].endswith('avatar_full.webp'))
+        self.assertTrue(Ad.objects.get(id=ad.id).main_photo_variants['thumb'].endswith('_thumb.webp'))
+
+        out = StringIO()
+        call_command('generate_image_variants', workers=0, stdout=out)
+        self.assertIn('store.AdPhoto.image: nothing to do', out.getvalue())
+
+
+class ContentAddressedStorageTest(TestCase):
+    """Content-addressed (sha256, shard li) rasm storage testlari"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        category = Category.objects.create(name='Test Category')
+        self.ad = Ad.objects.create(seller=seller, category=category, name_uz='Telefon')
+        self.storage = AdPhoto._meta.get_field('image').storage
+
+    def _photo(self, content=b'same-bytes', name='photo.JPG'):
+        return AdPhoto.objects.create(ad=self.ad, image=SimpleUploadedFile(name, content))
+
+    def test_identical_uploads_are_stored_once(self):
+        """Bir xil fayl bir marta saqlanishi va murojaatlar sanalishi testi"""
+        first = self._photo()
+        second = self._photo(name='copy.jpg')
+        other = self._photo(b'other-bytes')
+
+        digest = hashlib.sha256(b'same-bytes').hexdigest()
+        self.assertEqual(first.image.name, f'ads/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(os.listdir(os.path.dirname(self.storage.path(first.image.name))), [f'{digest}.jpg'])
+        self.assertEqual(StoredFile.objects.get(name=first.image.name).ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.storage.exists(second.image.name))
+        self.assertEqual(StoredFile.objects.get(name=second.image.name).ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ad.delete()
+        self.assertFalse(self.storage.exists(second.image.name))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_upload_racing_last_delete(self):
+        """Oxirgi murojaat o'chirilib, fayl hali o'chmagan paytdagi bir xil yuklash faylni yo'qotmasligi testi"""
+        first = self._photo()
+        name = first.image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+        second = self._photo()
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+
+        # save() fayl bor deb ko'rgandan keyin o'chirilgan bo'lsa - murojaat olishda lock ostida qayta yoziladi
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.storage.exists(name))
+        self.storage.retain(name, ContentFile(b'same-bytes'))
+        with self.storage.open(name) as restored:
+            self.assertEqual(restored.read(), b'same-bytes')
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+
+    def test_rolled_back_photo_takes_no_reference(self):
+        """Yozuv rollback bo'lsa murojaat sanalmasligi testi"""
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self._photo()
+            raise RuntimeError
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_duplicate_upload_reuses_variants(self):
+        """Bir xil fayl uchun variantlar bir marta yaratilib, StoredFile orqali (ad_photos skan qilinmasdan) olinishi"""
+        buffer = BytesIO()
+        Image.new('RGB', (800, 400), 'blue').save(buffer, format='PNG')
+        first, second = self._photo(buffer.getvalue(), 'a.png'), self._photo(buffer.getvalue(), 'b.png')
+
+        with patch('apps.common.images.process_image', wraps=process_image) as process:
+            generate_variants(AdPhoto, first.id, 'image')
+            with CaptureQueriesContext(connection) as queries:
+                generate_variants(AdPhoto, second.id, 'image')
+
+        process.assert_called_once_with(first.image.name, storage=self.storage)
+        second.refresh_from_db()
+        self.assertEqual(second.image_variants, StoredFile.objects.get(name=first.image.name).variants)
+        self.assertEqual(second.image_variants['source'], first.image.name)
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT') and '"ad_photos"."image" =' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_migrate_existing_photos(self):
+        """Eski (flat) rasmlarni content-addressed storage ga ko'chirish testi"""
+        default_storage.save('ads/old.png', ContentFile(b'legacy'))
+        AdPhoto.objects.create(ad=self.ad, image='ads/old.png', is_main=True)
+        AdPhoto.objects.create(ad=self.ad, image='ads/old.png')
+        AdPhoto.objects.create(ad=self.ad, image='https://example.com/remote.jpg')
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('migrate_ad_photo_storage', stdout=out)
+        self.assertIn('Moved 1 files', out.getvalue())
+
+        names = set(AdPhoto.objects.values_list('image', flat=True))
+        digest = hashlib.sha256(b'legacy').hexdigest()
+        new_name = f'ads/{digest[:2]}/{digest[2:4]}/{digest}.png'
+        self.assertEqual(names, {new_name, 'https://example.com/remote.jpg'})
+        self.assertEqual(StoredFile.objects.get(name=new_name).ref_count, 2)
+        self.assertFalse(default_storage.exists('ads/old.png'))
+
+
+class ConditionalGetTest(APITestCase):
+    """ETag / Last-Modified va 304 Not Modified testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.customer = User.objects.create_user(phone_number='+998901234568', password='testpass123')
+        self.category = Category.objects.create(name='Elektronika')
+        self.ad = Ad.objects.create(seller=self.seller, category=self.category, name_uz='Telefon', status='active')
+        view_counter.flush()
+        self.addCleanup(view_counter.flush)
+
+    def _revalidate(self, url, response, **extra):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **extra)
+
+    @override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+    def test_ad_detail_not_modified(self):
+        """E'lon o'zgarmaganda 304, o'zgarganda va like bosilganda yangi javob testi"""
+        url = reverse('store:ad-detail', kwargs={'slug': self.ad.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            cached = self._revalidate(url, response)
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(view_counter.pending(self.ad.id), 2)
+
+        self.ad.price = 500
+        self.ad.save()
+        response = self._revalidate(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['price'], 500)
+
+        refresh = RefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(url)
+        FavouriteProduct.objects.create(user=self.customer, product=self.ad)
+        response = self._revalidate(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_liked'])
+
+    def test_ad_detail_photo_changes(self):
+        """Rasm qo'shilganda, main almashganda va variantlar tayyor bo'lganda ETag yangilanishi testi"""
+        url = reverse('store:ad-detail', kwargs={'slug': self.ad.slug})
+        response = self.client.get(url)
+
+        photo = AdPhoto.objects.create(ad=self.ad, image='ads/photo.jpg')
+        response = self._revalidate(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['photos']), 1)
+        self.assertEqual(self._revalidate(url, response).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        AdPhoto.objects.filter(pk=photo.pk).update(is_main=True)
+        response = self._revalidate(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        AdPhoto.objects.filter(pk=photo.pk).update(image_variants={'source': 'ads/photo.jpg', 'thumb': 'a.webp',
+                                                                   'card': 'b.webp', 'full': 'c.webp'})
+        self.assertEqual(self._revalidate(url, response).status_code, status.HTTP_200_OK)
+
+    def test_ad_detail_address_changes(self):
+        """Sotuvchining default manzili o'zgarganda ETag yangilanishi testi"""
+        address = self.seller.addresses.create(name='Chilonzor', is_default=True)
+        url = reverse('store:ad-detail', kwargs={'slug': self.ad.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.data['address'], 'Chilonzor')
+        self.assertEqual(self._revalidate(url, response).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        address.name = 'Yunusobod'
+        address.save()
+        response = self._revalidate(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['address'], 'Yunusobod')
+
+    def test_category_list_stamp(self):
+        """Kategoriya qo'shilganda va e'lonlar soni o'zgarganda ETag yangilanishi testi"""
+        url = reverse('store:category-list')
+        response = self.client.get(url)
+        self.assertEqual(self._revalidate(url, response).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ad.objects.create(seller=self.seller, category=self.category, name_uz='Planshet', status='active')
+        response = self._revalidate(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['product_count'], '2')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Transport')
+        self.assertEqual(self._revalidate(url, response).status_code, status.HTTP_200_OK)
+
+    def test_common_endpoints(self):
+        """Region, statik sahifa va sozlamalar uchun conditional GET testi"""
+        page = StaticPage.objects.create(slug='about', title='Biz haqimizda')
+        Setting.objects.create(id=1)
+        urls = [reverse('common:regions-with-districts'), reverse('common:static-page-detail', kwargs={'slug': page.slug}),
+                reverse('common:setting')]
+        responses = [self.client.get(url) for url in urls]
+        for url, response in zip(urls, responses):
+            self.assertEqual(self._revalidate(url, response).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.assertIn('Last-Modified', responses[1])
+        cached = self.client.get(urls[1], HTTP_IF_MODIFIED_SINCE=responses[1]['Last-Modified'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Region.objects.create(name='Buxoro')
+        self.assertEqual(self._revalidate(urls[0], responses[0]).status_code, status.HTTP_200_OK)
+
+
+class ResponseCacheTest(APITestCase):
+    """Anonim list/search javoblari versiyali cache testlari"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.category = Category.objects.create(name='Elektronika')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ad = Ad.objects.create(seller=self.seller, category=self.category, name_uz='Telefon', price=100,
+                                        status='active')
+        self.addCleanup(search_log.flush)
+
+    def test_normalized_query_hits_cache(self):
+        """Parametrlar tartibi, bo'sh va no-op parametrlar cache kalitiga ta'sir qilmasligi testi"""
+        url = reverse('store:ad-list')
+        response = self.client.get(url, {'ordering': 'price', 'category': '', 'page': 1})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(f'{url}?utm_source=telegram&ordering=price&_=123')
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(json.loads(cached.content), json.loads(response.content))
+        self.assertEqual(self.client.get(url, {'ordering': '-price'})['X-Cache'], 'MISS')
+
+    def test_model_changes_invalidate(self):
+        """Ad, Category va PopularSearchTerm o'zgarganda cache yangilanishi testi"""
+        urls = {
+            'ads': reverse('store:ad-list'),
+            'search': f"{reverse('store:search-category-product')}?q=tel",
+            'populars': reverse('store:search-populars'),
+        }
+        for url in urls.values():
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ad.objects.create(seller=self.seller, category=self.category, name_uz='Televizor', status='active')
+            PopularSearchTerm.objects.create(name='Telefon', category=self.category)
+
+        for name, url in urls.items():
+            response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS', name)
+            self.assertEqual(len(response.data['results']), 2 if name in ('ads', 'search') else 1, name)
+
+    def test_seller_changes_invalidate(self):
+        """Default manzil nomi va sotuvchi profili o'zgarganda cache yangilanishi testi"""
+        url = reverse('store:ad-list')
+        with self.captureOnCommitCallbacks(execute=True):
+            home = self.seller.addresses.create(name='Chilonzor', is_default=True)
+            office = self.seller.addresses.create(name='Ofis')
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            office.name = 'Ofis 2'
+            office.save()
+            self.seller.last_login = timezone.now()
+            self.seller.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            home.name = 'Yunusobod'
+            home.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['address'], 'Yunusobod')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.full_name = 'Ali Valiyev'
+            self.seller.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['seller']['full_name'], 'Ali Valiyev')
+
+    def test_stamp_bumped_after_commit(self):
+        """Stamp yozuvchi tranzaksiya ichida emas, commit dan keyin oshirilishi testi"""
+        version = ChangeStamp.objects.get(key=ADS_STAMP).version
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as context:
+                Ad.objects.create(seller=self.seller, category=self.category, name_uz='Televizor', status='active')
+            self.assertFalse(any('change_stamps' in query['sql'] for query in context.captured_queries))
+        self.assertEqual(ChangeStamp.objects.get(key=ADS_STAMP).version, version + 1)
+
+    def test_authenticated_users_bypass_cache(self):
+        """Tizimga kirgan foydalanuvchi javobi (is_liked) cache lanmasligi testi"""
+        refresh = RefreshToken.for_user(self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        url = reverse('store:ad-list')
+        self.client.get(url)
+        self.assertNotIn('X-Cache', self.client.get(url))
+
+
+class LikedSetTest(APITestCase):
+    """So'rov egasining like lari (user va device_id) testlari"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.customer = User.objects.create_user(phone_number='+998901234568', password='testpass123')
+        self.category = Category.objects.create(name='Test Category')
+        self.ads = [
+            Ad.objects.create(seller=self.seller, category=self.category, name_uz=f'Mahsulot {i}', status='active')
+            for i in range(4)
+        ]
+        FavouriteProduct.objects.create(device_id='device-1', product=self.ads[0])
+        FavouriteProduct.objects.create(user=self.customer, product=self.ads[1])
+        self.addCleanup(view_counter.flush)
+
+    def _liked(self, response):
+        return {item['id'] for item in response.data['results'] if item['is_liked']}
+
+    def test_list_uses_one_query_for_device_likes(self):
+        """Ro'yxatda device_id like lari bitta query bilan aniqlanishi testi"""
+        url = reverse('store:ad-list')
+        self.client.get(url, {'device_id': 'device-1'})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'device_id': 'device-1'})
+        self.assertEqual(self._liked(response), {self.ads[0].id})
+        self.assertNotIn('X-Cache', response)
+        favourite_queries = [q for q in context.captured_queries if 'favourite_products' in q['sql']]
+        self.assertEqual(len(favourite_queries), 1)
+
+        refresh = RefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(url, {'device_id': 'device-1'})
+        self.assertEqual(self._liked(response), {self.ads[0].id, self.ads[1].id})
+
+    def test_detail_device_like(self):
+        """E'lon sahifasida device_id bo'yicha is_liked testi"""
+        url = reverse('store:ad-detail', kwargs={'slug': self.ads[0].slug})
+        self.assertFalse(self.client.get(url).data['is_liked'])
+        self.assertTrue(self.client.get(url, {'device_id': 'device-1'}).data['is_liked'])
+
+    def test_liked_ids_endpoint(self):
+        """Batch 'qaysilari like bosilgan' endpoint testi"""
+        url = reverse('store:favourite-liked-ids')
+        ids = ','.join(str(ad.id) for ad in reversed(self.ads))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'ids': ids, 'device_id': 'device-1'})
+        self.assertEqual(response.data, {'liked': [self.ads[0].id]})
+
+        refresh = RefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(url, {'ids': ids})
+        self.assertEqual(response.data, {'liked': [self.ads[1].id]})
+
+        self.assertEqual(self.client.get(url, {'ids': '1,x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        too_many = ','.join(str(i) for i in range(201))
+        self.assertEqual(self.client.get(url, {'ids': too_many}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FavouriteSyncTest(APITestCase):
+    """Like larni paket bilan sinxronlash va device -> akkaunt birlashtirish testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.customer = User.objects.create_user(phone_number='+998901234568', password='testpass123')
+        self.category = Category.objects.create(name='Test Category')
+        self.ads = [
+            Ad.objects.create(seller=self.seller, category=self.category, name_uz=f'Mahsulot {i}', status='active')
+            for i in range(4)
+        ]
+        self.url = reverse('store:favourite-sync')
+
+    def test_device_sync(self):
+        """device_id uchun add/remove paketi, takroriy qo'shish va mavjud bo'lmagan e'lon testi"""
+        FavouriteProduct.objects.create(device_id='device-1', product=self.ads[0])
+        FavouriteProduct.objects.create(device_id='device-1', product=self.ads[1])
+        operations = [
+            {'action': 'add', 'product': self.ads[0].id},
+            {'action': 'add', 'product': self.ads[2].id},
+            {'action': 'remove', 'product': self.ads[1].id},
+            {'action': 'add', 'product': self.ads[3].id},
+            {'action': 'remove', 'product': self.ads[3].id},
+            {'action': 'add', 'product': 999999},
+        ]
+        response = self.client.post(self.url, {'device_id': 'device-1', 'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'liked': [self.ads[0].id, self.ads[2].id]})
+        self.assertEqual(FavouriteProduct.objects.filter(device_id='device-1').count(), 2)
+
+    def test_user_sync_requires_owner(self):
+        """Foydalanuvchi uchun sinxronlash va egasiz so'rov rad etilishi testi"""
+        operations = [{'action': 'add', 'product': self.ads[1].id}]
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        refresh = RefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.data, {'liked': [self.ads[1].id]})
+        favourite = FavouriteProduct.objects.get(product=self.ads[1])
+        self.assertEqual((favourite.user, favourite.device_id), (self.customer, None))
+
+    def test_login_merges_device_favourites(self):
+        """Login da device_id like lari bitta UPDATE bilan akkauntga o'tishi testi"""
+        FavouriteProduct.objects.create(device_id='device-1', product=self.ads[0])
+        FavouriteProduct.objects.create(device_id='device-1', product=self.ads[1])
+        FavouriteProduct.objects.create(user=self.customer, product=self.ads[1])
+
+        self.assertEqual(merge_device_favourites(self.customer, None), 0)
+        with self.assertNumQueries(1):
+            merged = merge_device_favourites(self.customer, 'device-1')
+        self.assertEqual(merged, 1)
+        self.assertEqual(
+            set(FavouriteProduct.objects.filter(user=self.customer).values_list('product_id', flat=True)),
+            {self.ads[0].id, self.ads[1].id},
+        )
+
+        FavouriteProduct.objects.create(device_id='device-2', product=self.ads[2])
+        response = self.client.post(reverse('accounts:login'), {
+            'phone_number': '+998901234568', 'password': 'testpass123', 'device_id': 'device-2',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(FavouriteProduct.objects.get(product=self.ads[2]).user, self.customer)
+
+
+class FavouriteFeedTest(APITestCase):
+    """Sevimlilar ro'yxati: like bosilgan vaqt tartibi va keyset pagination testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.customer = User.objects.create_user(phone_number='+998901234568', password='testpass123')
+        self.category = Category.objects.create(name='Test Category')
+        self.ads = [
+            Ad.objects.create(seller=self.seller, category=self.category, name_uz=f'Mahsulot {i}', status='active')
+            for i in range(5)
+        ]
+        self.ads[4].status = 'inactive'
+        self.ads[4].save()
+        # Like tartibi e'lon tartibidan farq qiladi
+        for ad in [self.ads[2], self.ads[0], self.ads[4], self.ads[3], self.ads[1]]:
+            FavouriteProduct.objects.create(user=self.customer, product=ad)
+            FavouriteProduct.objects.create(device_id='device-1', product=ad)
+        self.expected = [self.ads[1].id, self.ads[3].id, self.ads[0].id, self.ads[2].id]
+
+    def test_ordered_by_favourited_at(self):
+        """Oxirgi like birinchi, faol bo'lmagan e'lon ko'rinmasligi testi"""
+        refresh = RefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(reverse('store:my-favourite-list'))
+        self.assertEqual([item['id'] for item in response.data['results']], self.expected)
+        self.assertEqual(response.data['count'], 4)
+
+    def test_keyset_pages(self):
+        """device_id bo'yicha keyset sahifalar takrorsiz va tartibda kelishi testi"""
+        url = reverse('store:my-favourite-by-id-list')
+        params = {'device_id': 'device-1', 'cursor': ''}
+        seen = []
+        with patch.object(FavouriteKeysetPagination, 'page_size', 3):
+            while url:
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertLessEqual(len(context.captured_queries), 3)
+                self.assertNotIn('IN (SELECT', context.captured_queries[0]['sql'].upper())
+                seen += [item['id'] for item in response.data['results']]
+                url, params = response.data['next'], None
+        self.assertEqual(seen, self.expected)
+
+        self.assertEqual(self.client.get(reverse('store:my-favourite-by-id-list')).data['results'], [])
+
+
+class SavedSearchPercolatorTest(TestCase):
+    """Saved search larni yangi faol e'lonlarga moslash (percolator) testlari"""
+
+    def setUp(self):
+        self.tashkent = Region.objects.create(name='Toshkent shahar')
+        self.samarkand = Region.objects.create(name='Samarqand')
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.seller.addresses.create(name='Uy', region=self.tashkent, is_default=True)
+        self.customer = User.objects.create_user(phone_number='+998901234568', password='testpass123')
+        self.electronics = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.electronics)
+        self.other = Category.objects.create(name='Kiyim')
+
+    def _search(self, **fields):
+        return MySearch.objects.create(user=self.customer, **fields)
+
+    def _approve(self, **fields):
+        ad = Ad.objects.create(seller=self.seller, category=self.phones, status='pending', **fields)
+        with self.captureOnCommitCallbacks(execute=True):
+            ad.status = 'active'
+            ad.save()
+        return ad
+
+    def test_price_bucket_keys(self):
+        """Narx oralig'i log2 bucket larga yoyilishi testi"""
+        self.assertEqual(search_key_values(None, None, None, None, ''), [(0, 0, 0, '')])
+        keys = search_key_values(5, 7, 100, 1000, 'Samsung s24')
+        self.assertEqual([key[2] for key in keys], [price_bucket(100), 9, 10, price_bucket(1000)])
+        self.assertEqual({key[3] for key in keys}, {'sam'})
+        self.assertEqual(search_key_values(None, None, 1000, None, '')[-1][2], MAX_PRICE_BUCKET)
+
+    def test_matches_recorded_on_approval(self):
+        """E'lon faol bo'lganda mos saved search lar yozilishi testi"""
+        matching = [
+            self._search(),
+            self._search(category=self.electronics),
+            self._search(category=self.phones, region_id=self.tashkent.id, price_min=500, price_max=1500),
+            self._search(search_query='samsung galaxy'),
+            self._search(search_query='sams'),
+        ]
+        self._search(category=self.other)
+        self._search(region_id=self.samarkand.id)
+        self._search(price_max=999)
+        self._search(price_min=1001)
+        self._search(search_query='samsung iphone')
+        MySearch.objects.create(user=self.seller)
+
+        ad = self._approve(name_uz='Samsung Galaxy S24', price=1000)
+        self.assertEqual(
+            set(SavedSearchMatch.objects.filter(ad=ad).values_list('search_id', flat=True)),
+            {search.id for search in matching},
+        )
+
+        # Qayta saqlash takroriy moslik yaratmaydi
+        ad.name_uz = 'Samsung Galaxy S24 Ultra'
+        ad.save()
+        self.assertEqual(SavedSearchMatch.objects.filter(ad=ad).count(), len(matching))
+
+    def test_lookup_cost_independent_of_search_count(self):
+        """Mos kelmaydigan saved search lar soni query va nomzodlar soniga ta'sir qilmasligi testi"""
+        self._search(category=self.phones, search_query='samsung')
+        ad = self._approve(name_uz='Samsung Galaxy', price=1000)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(len(percolate_ad(ad.id)), 1)
+
+        for i in range(30):
+            self._search(category=self.other, search_query=f'kurtka {i}')
+            self._search(category=self.phones, search_query='iphone', price_min=10 ** 6)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(len(percolate_ad(ad.id)), 1)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        with patch('apps.store.percolator.search_matches', return_value=True) as check:
+            percolate_ad(ad.id)
+        self.assertEqual(check.call_count, 1)
+
+
+@override_settings(SEARCH_COUNT_FLUSH_INTERVAL=3600, TRENDING_HALF_LIFE_HOURS=24)
+class SearchCountBufferTest(APITestCase):
+    """Qidiruv sonlari buferi, upsert flush va trending ball testlari"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.phones = Category.objects.create(name='Phones')
+        self.cars = Category.objects.create(name='Cars')
+        PopularSearchTerm.objects.create(name='Telefonlar', category=self.phones, search_count=10)
+        self.addCleanup(search_counter.flush)
+
+    def _increase(self, category_id):
+        return self.client.get(reverse('store:search-count-increase', kwargs={'id': category_id}))
+
+    def test_increments_buffered_and_upserted(self):
+        """So'rovlar bitta query, flush bitta INSERT ... ON CONFLICT bilan yozilishi testi"""
+        for expected in (11, 12, 13):
+            with self.assertNumQueries(1):
+                response = self._increase(self.phones.id)
+            self.assertEqual(response.data['search_count'], expected)
+        self._increase(self.cars.id)
+        self.assertEqual(self._increase(self.cars.id).data['search_count'], 2)
+        self.assertEqual(self._increase(999999).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(PopularSearchTerm.objects.get(category=self.phones).search_count, 10)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(search_counter.flush(), 2)
+        inserts = [q for q in context.captured_queries if 'popular_search_terms' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            dict(PopularSearchTerm.objects.values_list('category_id', 'search_count')),
+            {self.phones.id: 13, self.cars.id: 2},
+        )
+        self.assertEqual(PopularSearchTerm.objects.get(category=self.phones).name, 'Telefonlar')
+        self.assertEqual(PopularSearchTerm.objects.get(category=self.cars).name, f'Category {self.cars.id}')
+
+    def test_trending_decays(self):
+        """Trending ball half-life bo'yicha eskirishi va ordering=-trending testi"""
+        start = timezone.now()
+        with patch('apps.store.counters.timezone.now', return_value=start):
+            search_counter.increment(self.phones.id, 4)
+            search_counter.flush()
+        later = start + timedelta(hours=24)
+        with patch('apps.store.counters.timezone.now', return_value=later):
+            search_counter.increment(self.phones.id, 2)
+            search_counter.increment(self.cars.id, 5)
+            search_counter.flush()
+
+        trending = dict(PopularSearchTerm.objects.with_trending(later).values_list('category_id', 'trending'))
+        self.assertAlmostEqual(trending[self.phones.id], 4)
+        self.assertAlmostEqual(trending[self.cars.id], 5)
+        trending = dict(
+            PopularSearchTerm.objects.with_trending(later + timedelta(hours=24)).values_list('category_id', 'trending')
+        )
+        self.assertAlmostEqual(trending[self.phones.id], 2)
+
+        url = reverse('store:search-populars')
+        cars = f'Category {self.cars.id}'
+        response = self.client.get(url, {'ordering': '-trending'})
+        self.assertEqual([item['name'] for item in response.data['results']], [cars, 'Telefonlar'])
+        response = self.client.get(url)
+        self.assertEqual([item['name'] for item in response.data['results']], ['Telefonlar', cars])
+
+
+@override_settings(SEARCH_LOG_SAMPLE_RATE=1.0, SEARCH_LOG_FLUSH_INTERVAL=3600)
+class SearchLogMiningTest(APITestCase):
+    """Real qidiruvlar logi va Space-Saving orqali popular so'rovlarni yig'ish testlari"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.phones = Category.objects.create(name='Phones')
+        self.addCleanup(search_log.flush)
+
+    def test_space_saving_keeps_heavy_hitters(self):
+        """Sig'im to'lganda ham ko'p uchraydigan elementlar saqlanishi testi"""
+        sketch = SpaceSaving(10)
+        for item in ['a'] * 50 + ['b'] * 30 + [f'rare {i}' for i in range(40)] + ['c'] * 20:
+            sketch.add(item)
+        top = dict(sketch.top(2))
+        self.assertEqual(list(top), ['a', 'b'])
+        self.assertEqual(top['a'], (50, 0))
+        self.assertLessEqual(len(sketch.counters), 10)
+
+    def test_searches_logged_and_mined(self):
+        """Qidiruvlar buferdan log ga, log dan PopularSearchTerm ga o'tishi testi"""
+        for _ in range(3):
+            self.client.get(reverse('store:search-category-product'), {'q': 'iPhone 15'})
+        self.client.get(reverse('store:search-category-product'), {'q': 'iphone  15 '})
+        self.client.get(reverse('store:search-category-product'), {'q': 'samsung'})
+        for prefix in ('sa', 'sam', 'sams'):
+            self.client.get(reverse('store:search-complete'), {'q': prefix})
+        self.client.get(reverse('store:ad-list'), {'search': 'Redmi', 'category_ids': self.phones.id})
+        self.client.get(reverse('store:ad-list'), {'search': 'Redmi', 'category_ids': 999999})
+        self.client.get(reverse('store:ad-list'), {'search': 'x'})
+
+        with self.assertNumQueries(1):
+            search_log.flush()
+        self.assertEqual(
+            {(row.category_id, row.phrase): row.hits for row in SearchQueryLog.objects.all()},
+            {(None, 'iphone 15'): 4, (None, 'samsung'): 1, (self.phones.id, 'redmi'): 1, (999999, 'redmi'): 1},
+        )
+
+        call_command('mine_search_terms', stdout=StringIO())
+        self.assertFalse(SearchQueryLog.objects.exists())
+        mined = {(term.category_id, term.phrase): term.search_count
+                 for term in PopularSearchTerm.objects.exclude(phrase='')}
+        self.assertEqual(mined, {(None, 'iphone 15'): 4, (None, 'samsung'): 1, (self.phones.id, 'redmi'): 1})
+
+        # Keyingi ishga tushish faqat yangi qatorlarni qo'shadi
+        record_search('Samsung')
+        record_search('Samsung')
+        search_log.flush()
+        mine_search_log()
+        self.assertEqual(PopularSearchTerm.objects.get(phrase='samsung').search_count, 3)
+        self.assertEqual(SearchTermSketch.objects.get(phrase='iphone 15').count, 4)
+
+    def test_failed_chunk_not_counted_twice(self):
+        """Chunk o'rtasida xato bo'lsa sketch ham, log ham o'zgarmasligi, qayta ishga tushishda bir marta sanalishi"""
+        record_search('Samsung')
+        record_search('Samsung')
+        search_log.flush()
+
+        with patch('apps.store.search_log._rebuild_popular_terms', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                mine_search_log()
+        self.assertEqual(SearchQueryLog.objects.get().hits, 2)
+        self.assertFalse(SearchTermSketch.objects.exists())
+
+        mine_search_log()
+        self.assertEqual(PopularSearchTerm.objects.get(phrase='samsung').search_count, 2)
+        self.assertFalse(SearchQueryLog.objects.exists())
+
+    def test_top_k_per_category(self):
+        """Har bir kategoriya uchun faqat top-K so'rov qolishi testi"""
+        for i in range(5):
+            for _ in range(i + 1):
+                record_search(f'query {i}', self.phones.id)
+        search_log.flush()
+        mine_search_log(top_k=2)
+        self.assertEqual(
+            list(PopularSearchTerm.objects.filter(category=self.phones).order_by('-search_count')
+                 .values_list('phrase', flat=True)),
+            ['query 4', 'query 3'],
+        )
+
+
+class SearchCatalogTest(APITestCase):
+    """Kategoriya va e'lonlarni bitta saralangan so'rovda qidirish testlari"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('store:search-category-product')
+        self.seller = User.objects.create_user(phone_number='+998901234567', password='testpass123', role='seller')
+        self.phones = Category.objects.create(name='Telefonlar', icon='categories/phones.png')
+        self.cases = Category.objects.create(name='Telefon gilof', parent=self.phones)
+        Category.objects.create(name='Telefon eski', is_active=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.best = Ad.objects.create(seller=self.seller, category=self.phones,
+                                          name_uz='Telefon Samsung telefon', status='active')
+            self.ads = [
+                Ad.objects.create(seller=self.seller, category=self.cases, name_uz=f'Gilof {i}',
+                                  description_uz='telefon uchun', status='active')
+                for i in range(25)
+            ]
+            Ad.objects.create(seller=self.seller, category=self.phones, name_uz='Telefon', status='pending')
+        self.addCleanup(search_log.flush)
+
+    def test_ranked_pages(self):
+        """Kategoriyalar birinchi, e'lonlar relevance bo'yicha va real sahifalash testi"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {'q': 'telef'})
+        first = response.data
+        self.assertEqual(first['count'], 28)
+        self.assertEqual([(item['type'], item['id']) for item in first['results'][:3]],
+                         [('category', self.phones.id), ('category', self.cases.id), ('product', self.best.id)])
+        self.assertTrue(first['results'][0]['icon'].endswith('categories/phones.png'))
+        self.assertTrue(first['results'][2]['icon'].endswith('categories/phones.png'))
+        self.assertIsNone(first['results'][3]['icon'])
+        self.assertEqual(len(first['results']), 20)
+        # stamp lar + count + sahifa; natijalar soniga bog'liq emas
+        self.assertLessEqual(len(context.captured_queries), 3)
+
+        second = self.client.get(first['next']).data
+        self.assertEqual(len(second['results']), 8)
+        ids = [(item['type'], item['id']) for item in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 28)
+
+    def test_empty_and_capped_count(self):
+        """Bo'sh so'rov va taxminiy count chegarasi testi"""
+        self.assertEqual(self.client.get(self.url).data['count'], 0)
+        with patch.object(CappedCountPaginator, 'count_limit', 5):
+            response = self.client.get(self.url, {'q': 'gilof'})
+        self.assertEqual(response.data['count'], 5)
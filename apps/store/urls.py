@@ -9,6 +9,7 @@ urlpatterns = [
 
     # Ads
     path('ads/', views.AdCreateView.as_view(), name='ad-create'),
+    path('ads/import/', views.AdImportView.as_view(), name='ad-import'),
     path('ads/<slug:slug>/', views.AdDetailView.as_view(), name='ad-detail'),
     path('list/ads/', views.AdListView.as_view(), name='ad-list'),
 
@@ -23,6 +24,8 @@ urlpatterns = [
     path('favourite-product/<int:id>/delete/', views.favourite_product_delete, name='favourite-delete'),
     path('favourite-product-by-id/<int:id>/delete/', views.favourite_product_by_id_delete,
          name='favourite-delete-by-id'),
+    path('favourite-product/liked-ids/', views.LikedProductIdsView.as_view(), name='favourite-liked-ids'),
+    path('favourite-product/sync/', views.FavouriteSyncView.as_view(), name='favourite-sync'),
     path('my-favourite-product/', views.MyFavouriteProductListView.as_view(), name='my-favourite-list'),
     path('my-favourite-product-by-id/', views.MyFavouriteProductByIdListView.as_view(), name='my-favourite-by-id-list'),
 
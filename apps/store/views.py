@@ -1,22 +1,73 @@
-from rest_framework import generics, status, filters
+import codecs
+import csv
+import hashlib
+
+from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, F
+from django.db.models import Count, FilteredRelation, Max, OuterRef, Q, Subquery
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 
 from .models import Category, Ad, AdPhoto, FavouriteProduct, MySearch, PopularSearchTerm
 from .serializers import *
+from .caches import ADS_STAMP, CATEGORIES_STAMP, POPULAR_SEARCH_STAMP, category_tree_cache
+from .counters import search_counter, view_counter
 from .filters import AdFilter
+from .imports import AdImporter
+from .likes import LikedSet, sync_favourites
+from .pagination import AdFeedPagination, FavouriteFeedPagination, SearchResultsPagination
+from .search import AdSearchFilter, AdOrderingFilter, search_catalog
+from .search_log import SearchLogMixin
+from . import suggestions
+from apps.accounts.models import Address
 from apps.accounts.permissions import IsSeller, IsOwnerOrAdmin, IsSellerOrReadOnly
-
-
-class CategoryListView(generics.ListAPIView):
+from apps.common.mixins import ConditionalGetMixin, VersionedCacheMixin
+from apps.common.stamps import stamp_validators, stamp_version
+from apps.common.utils import conditional_response, set_validators
+
+
+def get_ad_validators(request, queryset, slug):
+    """(ad_id, etag) bitta yengil query bilan: e'lon, sotuvchi, manzil, rasmlar, kategoriyalar versiyasi va like"""
+    liked_set = LikedSet.for_request(request)
+    fields = ['id', 'updated_at', 'seller__updated_at', 'categories_version', 'address_id', 'address_name',
+              'photo_count', 'photos_created_at', 'photo_variants_ready', 'main_photo_id']
+    # Javobdagi address - sotuvchining default manzili (Ad.seller_address bilan bir xil tanlov); u o'zgarganda
+    # Ad ham, sotuvchi ham updated_at ni yangilamaydi
+    default_address = Address.objects.filter(user=OuterRef('seller_id'), is_default=True)
+    # Rasm qo'shilishi/o'chirilishi, main almashishi va variantlar tayyor bo'lishi Ad.updated_at ga tegmaydi
+    queryset = queryset.filter(slug=slug).annotate(
+        categories_version=stamp_version(CATEGORIES_STAMP),
+        address_id=Subquery(default_address.values('id')[:1]),
+        address_name=Subquery(default_address.values('name')[:1]),
+        photo_count=Count('photos'),
+        photos_created_at=Max('photos__created_at'),
+        photo_variants_ready=Count('photos', filter=Q(photos__image_variants__has_key='source')),
+        main_photo_id=Max('photos__id', filter=Q(photos__is_main=True)),
+    )
+    if not liked_set.is_empty:
+        queryset = queryset.annotate(is_liked=liked_set.annotation())
+        fields.append('is_liked')
+    row = queryset.values(*fields).first()
+    if row is None:
+        return None, None
+    liked_set.remember(row['id'], row.get('is_liked', False))
+    parts = [row[field] for field in fields] + [request.user.pk, liked_set.device_id]
+    return row['id'], hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+class CategoryListView(ConditionalGetMixin, VersionedCacheMixin, generics.ListAPIView):
     queryset = Category.objects.filter(is_active=True, parent__isnull=True)
     serializer_class = CategoryListSerializer
     permission_classes = [AllowAny]
+    cache_stamps = [CATEGORIES_STAMP]
+
+    def get_validators(self, request, *args, **kwargs):
+        return stamp_validators(CATEGORIES_STAMP, self.get_cache_stamps())
 
 
 class CategoryWithChildrenView(generics.ListAPIView):
@@ -24,6 +75,17 @@ class CategoryWithChildrenView(generics.ListAPIView):
     serializer_class = CategoryWithChildrenSerializer
     permission_classes = [AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        # Daraxt cache dan olinadi (stale-while-revalidate), root icon lar serializer kabi absolute URL
+        tree = [
+            {**root, 'icon': request.build_absolute_uri(root['icon']) if root['icon'] else None}
+            for root in category_tree_cache.get()
+        ]
+        page = self.paginate_queryset(tree)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(tree)
+
 
 class SubCategoryListView(generics.ListAPIView):
     serializer_class = CategoryListSerializer
@@ -43,30 +105,66 @@ class AdCreateView(generics.CreateAPIView):
         serializer.save(seller=self.request.user)
 
 
+class AdImportView(generics.GenericAPIView):
+    """CSV yoki JSONL fayldan e'lonlarni ommaviy import qilish"""
+    serializer_class = AdImportSerializer
+    permission_classes = [IsSeller]
+    parser_classes = [MultiPartParser]
+
+    @extend_schema(responses={201: AdImportResultSerializer})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Fayl qatorma-qator o'qiladi, batch lab yoziladi
+        lines = codecs.iterdecode(serializer.validated_data['file'], 'utf-8-sig')
+        importer = AdImporter(request.user)
+        try:
+            result = importer.run(lines, serializer.validated_data['format'])
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # Xatogacha o'qilgan batch lar allaqachon yozilgan - ularning soni ham qaytariladi
+            return Response({
+                'file': [f"Fayl UTF-8 kodlangan {serializer.validated_data['format'].upper()} emas: {exc}"],
+                'created': importer.created,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(AdImportResultSerializer(result).data, status=status.HTTP_201_CREATED)
+
+
 class AdDetailView(generics.RetrieveAPIView):
-    queryset = Ad.objects.filter(status='active', is_active=True)
+    queryset = Ad.objects.public().select_related('seller', 'category')
     serializer_class = AdDetailSerializer
     lookup_field = 'slug'
     permission_classes = [AllowAny]
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        Ad.objects.filter(id=instance.id).update(view_count=F('view_count') + 1)
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        ad_id, etag = get_ad_validators(request, self.get_queryset(), kwargs['slug'])
+        if ad_id is not None:
+            view_counter.increment(ad_id)
+        response = conditional_response(request, etag)
+        if response is None:
+            serializer = self.get_serializer(self.get_object())
+            response = Response(serializer.data)
+        return set_validators(response, etag, private=True)
 
 
-class AdListView(generics.ListAPIView):
+class AdListView(SearchLogMixin, VersionedCacheMixin, generics.ListAPIView):
     serializer_class = AdListSerializer
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    cache_stamps = [ADS_STAMP, CATEGORIES_STAMP]
+    cache_bypass_params = ['device_id']  # is_liked device ga bog'liq
+    pagination_class = AdFeedPagination
+    filter_backends = [DjangoFilterBackend, AdSearchFilter, AdOrderingFilter]
     filterset_class = AdFilter
     search_fields = ['name_uz', 'name_ru', 'description_uz', 'description_ru']
     ordering_fields = ['published_at', 'price', 'view_count']
     ordering = ['-published_at']
+    search_log_param = 'search'
+
+    def get_search_log_category(self):
+        category_ids = self.request.query_params.get('category_ids', '').strip()
+        return int(category_ids) if category_ids.isdigit() else None
 
     def get_queryset(self):
-        return Ad.objects.filter(status='active', is_active=True).select_related('seller', 'category')
+        return Ad.objects.public().with_list_data()
 
 
 class MyAdListView(generics.ListAPIView):
@@ -78,7 +176,7 @@ class MyAdListView(generics.ListAPIView):
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Ad.objects.none()
-        return Ad.objects.filter(seller=self.request.user)
+        return Ad.objects.filter(seller=self.request.user).with_list_data()
 
 
 class MyAdDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -154,32 +252,72 @@ def favourite_product_by_id_delete(request, id):
 
 
 class MyFavouriteProductListView(generics.ListAPIView):
+    """Like bosilgan vaqt bo'yicha (yangilari birinchi); ?cursor= bilan keyset rejimi"""
     serializer_class = MyFavouriteProductSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FavouriteFeedPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['category']
+    ordering = ['-favourited_at']
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Ad.objects.none()
+        return Ad.objects.favourited_by(user=self.request.user).with_list_data()
 
-        favourites = FavouriteProduct.objects.filter(user=self.request.user)
-        return Ad.objects.filter(id__in=favourites.values_list('product_id', flat=True))
 
-
-class MyFavouriteProductByIdListView(generics.ListAPIView):
-    serializer_class = MyFavouriteProductSerializer
+class MyFavouriteProductByIdListView(MyFavouriteProductListView):
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['device_id']
+
+    @extend_schema(parameters=[OpenApiParameter(name='device_id', type=str, location=OpenApiParameter.QUERY)])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Ad.objects.none()
         device_id = self.request.query_params.get('device_id')
         if device_id:
-            favourites = FavouriteProduct.objects.filter(device_id=device_id)
-        else:
-            favourites = FavouriteProduct.objects.filter(user=self.request.user)
-        return Ad.objects.filter(id__in=favourites.values_list('product_id', flat=True))
+            return Ad.objects.favourited_by(device_id=device_id).with_list_data()
+        if self.request.user.is_authenticated:
+            return Ad.objects.favourited_by(user=self.request.user).with_list_data()
+        return Ad.objects.none()
+
+
+class LikedProductIdsView(generics.GenericAPIView):
+    """Berilgan e'lonlardan qaysilari like bosilgan (JWT user va/yoki device_id) - client cache lari uchun"""
+    serializer_class = LikedIdsSerializer
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='ids', type=str, location=OpenApiParameter.QUERY, required=True),
+            OpenApiParameter(name='device_id', type=str, location=OpenApiParameter.QUERY),
+        ],
+        responses={200: LikedIdsSerializer},
+    )
+    def get(self, request):
+        query = LikedIdsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        liked = LikedSet.for_request(request).filter(query.validated_data['ids'])
+        return Response({'liked': liked})
+
+
+class FavouriteSyncView(generics.GenericAPIView):
+    """add/remove operatsiyalar paketini bitta tranzaksiyada qo'llash; javobda barcha like bosilgan id lar"""
+    serializer_class = FavouriteSyncSerializer
+    permission_classes = [AllowAny]
+
+    @extend_schema(responses={200: LikedIdsSerializer, 400: OpenApiResponse(description='Invalid data')})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        liked_set = LikedSet(request.user, serializer.validated_data.get('device_id'))
+        if liked_set.is_empty:
+            return Response({'device_id': ["Login qiling yoki device_id yuboring"]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        liked = sync_favourites(liked_set, serializer.validated_data['operations'])
+        return Response({'liked': liked})
 
 
 class MySearchCreateView(generics.CreateAPIView):
@@ -231,85 +369,33 @@ class ProductImageCreateView(generics.CreateAPIView):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def product_download(request, slug):
-    ad = get_object_or_404(Ad, slug=slug)
-    serializer = AdDetailSerializer(ad, context={'request': request})
-    return Response(serializer.data)
+    ad_id, etag = get_ad_validators(request, Ad.objects.all(), slug)
+    response = conditional_response(request, etag)
+    if response is None:
+        ad = get_object_or_404(Ad, slug=slug)
+        serializer = AdDetailSerializer(ad, context={'request': request})
+        response = Response(serializer.data)
+    return set_validators(response, etag, private=True)
 
 
-class SearchCategoryProductView(generics.ListAPIView):
+class SearchCategoryProductView(SearchLogMixin, VersionedCacheMixin, generics.ListAPIView):
+    """Kategoriya va e'lonlar bitta saralangan UNION so'rovda (search.search_catalog), sahifalash bazada"""
     serializer_class = SearchResultSerializer
     permission_classes = [AllowAny]
+    pagination_class = SearchResultsPagination
+    cache_stamps = [ADS_STAMP, CATEGORIES_STAMP]
 
     def get_queryset(self):
-        query = self.request.query_params.get('q', '')
-        results = []
-
-        if query:
-            categories = Category.objects.filter(
-                Q(name__icontains=query) & Q(is_active=True)
-            )[:5]
-
-            for category in categories:
-                results.append({
-                    'id': category.id,
-                    'name': category.name,
-                    'type': 'category',
-                    'icon': category.icon.url if category.icon else None
-                })
-
-            ads = Ad.objects.filter(
-                Q(name_uz__icontains=query) | Q(name_ru__icontains=query),
-                status='active', is_active=True
-            )[:5]
-
-            for ad in ads:
-                results.append({
-                    'id': ad.id,
-                    'name': ad.name,
-                    'type': 'product',
-                    'icon': ad.category.icon.url if ad.category.icon else None
-                })
-
-        return results
-
-    def list(self, request, *args, **kwargs):
-        results = self.get_queryset()
-        page = self.paginate_queryset(results)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(results, many=True)
-        return Response({
-            'count': len(results),
-            'next': None,
-            'previous': None,
-            'results': serializer.data
-        })
+        return search_catalog(self.request.query_params.get('q', ''))
 
 
 class SearchCompleteView(generics.ListAPIView):
+    # Har bir harf uchun chaqiriladi - prefikslar search log ga yozilmaydi (faqat list/search so'rovlari)
     serializer_class = SearchCompleteSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        query = self.request.query_params.get('q', '')
-        results = []
-
-        if query:
-            ads = Ad.objects.filter(
-                Q(name_uz__icontains=query) | Q(name_ru__icontains=query),
-                status='active', is_active=True
-            )[:10]
-
-            for ad in ads:
-                results.append({
-                    'id': ad.id,
-                    'name': ad.name,
-                    'icon': ad.category.icon.url if ad.category.icon else None
-                })
-
-        return results
+        return suggestions.complete(self.request.query_params.get('q', ''))
 
     def list(self, request, *args, **kwargs):
         results = self.get_queryset()
@@ -331,22 +417,32 @@ class SearchCompleteView(generics.ListAPIView):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def search_count_increase(request, id):
-    try:
-        search_term, created = PopularSearchTerm.objects.get_or_create(
-            category_id=id,
-            defaults={'name': f'Category {id}', 'search_count': 0}
-        )
-        search_term.search_count = F('search_count') + 1
-        search_term.save()
-        search_term.refresh_from_db()
-
-        serializer = PopularSearchIncreaseSerializer(search_term)
-        return Response(serializer.data)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-
-class PopularSearchTermsView(generics.ListAPIView):
-    queryset = PopularSearchTerm.objects.all().order_by('-search_count')
+    """Qidiruv buferga yoziladi (search_counter, davriy upsert); javobdagi son taxminiy - bazadagi + yozilmagan"""
+    row = Category.objects.filter(pk=id).annotate(
+        term=FilteredRelation('popularsearchterm', condition=Q(popularsearchterm__phrase=''))
+    ).values('term__id', 'term__search_count', 'term__updated_at').first()
+    if row is None:
+        return Response({'error': 'Category not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+    search_counter.increment(id)
+    search_term = PopularSearchTerm(
+        id=row['term__id'],
+        category_id=id,
+        search_count=(row['term__search_count'] or 0) + search_counter.pending(id),
+        updated_at=row['term__updated_at'],
+    )
+    serializer = PopularSearchIncreaseSerializer(search_term)
+    return Response(serializer.data)
+
+
+class PopularSearchTermsView(VersionedCacheMixin, generics.ListAPIView):
+    """?ordering=-trending - so'nggi qidiruvlar bo'yicha (half-life TRENDING_HALF_LIFE_HOURS)"""
     serializer_class = PopularSearchTermSerializer
     permission_classes = [AllowAny]
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['search_count', 'trending']
+    ordering = ['-search_count']
+    cache_stamps = [POPULAR_SEARCH_STAMP]
+
+    def get_queryset(self):
+        return PopularSearchTerm.objects.with_trending()
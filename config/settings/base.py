@@ -101,6 +101,13 @@ if static_dir.exists():
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    # E'lon rasmlari: sha256 bo'yicha nomlanadi, shard lanadi va takrorlanmaydi
+    'media': {'BACKEND': 'apps.common.storage.ContentAddressedStorage'},
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework - STANDART JWT
@@ -121,6 +128,31 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Ad view_count write-behind buffer flush interval (seconds)
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=5, cast=int)
+# Buferlarni worker bo'sh turganda ham yozuvchi fon thread; o'chirilsa deltalar faqat keyingi increment
+# va atexit da yoziladi. Worker SIGKILL/OOM bilan o'lsa oxirgi ~2 * interval soniyadagi deltalar yo'qoladi.
+COUNTER_FLUSH_THREAD = config('COUNTER_FLUSH_THREAD', default=True, cast=bool)
+
+# Popular search: kategoriya qidiruvlari buferi va trending ball half-life i (soat)
+SEARCH_COUNT_FLUSH_INTERVAL = config('SEARCH_COUNT_FLUSH_INTERVAL', default=5, cast=int)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+
+# Real qidiruvlar logi: sample ulushi va worker buferini yozish oralig'i (soniya)
+SEARCH_LOG_SAMPLE_RATE = config('SEARCH_LOG_SAMPLE_RATE', default=1.0, cast=float)
+SEARCH_LOG_FLUSH_INTERVAL = config('SEARCH_LOG_FLUSH_INTERVAL', default=10, cast=int)
+
+# Region/district worker xotirasidagi nusxasi: boshqa worker o'zgarishlarini tekshirish oralig'i (soniya)
+REGION_CACHE_CHECK_INTERVAL = config('REGION_CACHE_CHECK_INTERVAL', default=60, cast=int)
+
+# Anonim list/search javoblari cache i (model versiyalari bilan invalidatsiya qilinadi)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=60 * 10, cast=int)
+
+# Image variants (thumb/card/full) - upload dan keyin worker pool da yaratiladi
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+IMAGE_VARIANT_FORMAT = config('IMAGE_VARIANT_FORMAT', default='WEBP')
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', default=82, cast=int)
+
 # JWT Settings
 from datetime import timedelta
 
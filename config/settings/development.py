@@ -22,6 +22,9 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# SQLite da fon thread yozuvlari so'rov tranzaksiyalari bilan to'qnashadi - buferlar increment va atexit da yoziladi
+COUNTER_FLUSH_THREAD = False
+
 # Email backend for development
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 